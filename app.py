@@ -1,6 +1,9 @@
 import streamlit as st
-from src.pipeline import run_rag_pipeline
-from src.postprocess import spacy_polish
+from src.config import COURSE_MAP_FILE
+from src.courses import group_by_course, load_course_map
+from src.registry import get_registry
+from src.postprocess import spacy_polish_stream
+from src.tracing import start_trace
 
 st.set_page_config(page_title="Educational RAG QA", page_icon="📚")
 st.title("📚 Educational RAG Question Answering")
@@ -14,17 +17,23 @@ st.title("📚 Educational RAG Question Answering")
 
 PDF_FILES = ["data/ML_course_content_1.pdf"]  # <-- Change to your file(s)
 
-# in case dropdown is enabled
-# if "semantic_rag_chain" not in st.session_state or st.session_state.get("last_llm_choice") != llm_choice:
-#     with st.spinner("Setting up the RAG pipeline..."):
-#         st.session_state.semantic_rag_chain = run_rag_pipeline(PDF_FILES, llm_backend=llm_choice)
-#         st.session_state.last_llm_choice = llm_choice
+# in case dropdown is enabled (each backend is its own registry entry, built once per process)
+# with st.spinner("Setting up the RAG pipeline..."):
+#     pipeline = get_registry().get(PDF_FILES, llm_backend=llm_choice)
 
-# Pipeline ONCE per session
-if "semantic_rag_chain" not in st.session_state:
-    with st.spinner("Setting up the RAG pipeline..."):
-        st.session_state.semantic_rag_chain = run_rag_pipeline(PDF_FILES, llm_backend="groq")
-    st.success("RAG pipeline is ready! Ask your questions below.")
+# Documents are indexed per course (data/courses.json); a session searches only its course's partition
+COURSES = list(group_by_course(PDF_FILES, load_course_map(COURSE_MAP_FILE)))
+course = st.selectbox("Course:", options=["All courses"] + COURSES) if len(COURSES) > 1 else None
+# The course is a per-question filter, so one partitioned pipeline serves every course
+chain_config = {"configurable": {"search_filter": {"course": course}}} if course and course != "All courses" else None
+
+# Pipeline ONCE per process, shared read-only by every session (rebuilt in the background if the PDFs change)
+with st.spinner("Setting up the RAG pipeline..."):
+    pipeline = get_registry().get(PDF_FILES, llm_backend="groq", course_map=COURSE_MAP_FILE)
+semantic_rag_chain = pipeline.chain
+if "pipeline_ready_shown" not in st.session_state:
+    st.success(f"RAG pipeline is ready (initialized in {pipeline.init_seconds:.1f}s)! Ask your questions below.")
+    st.session_state.pipeline_ready_shown = True
 
 # Always use a key and control value via session_state
 if "user_question" not in st.session_state:
@@ -50,11 +59,12 @@ with col2:
     clear = st.button("Clear Input", on_click=clear_question)
 
 if ask and st.session_state.user_question.strip():
-    with st.spinner("Retrieving answer..."):
-        raw_answer = st.session_state.semantic_rag_chain.invoke(st.session_state.user_question)
-        answer = spacy_polish(raw_answer)
-        st.markdown("**Answer:**")
-        st.success(answer)
+    st.markdown("**Answer:**")
+    # Stream tokens as they arrive; completed sentences are polished incrementally.
+    # The whole answer, polishing included, is one trace in the logs.
+    with start_trace(st.session_state.user_question):
+        token_stream = semantic_rag_chain.stream(st.session_state.user_question, chain_config)
+        answer = st.write_stream(spacy_polish_stream(token_stream))
 
 # No rerun needed—input box will clear, and the value is always from session_state
 
@@ -0,0 +1,80 @@
+# batch_qa.py
+
+import argparse
+from src.config import COURSE_MAP_FILE
+from src.pipeline import IndexSettings, build_index, build_partitioned_index, get_pipeline_retriever
+from src.llms import LLM_BACKENDS, get_chat_model
+from src.batch import read_questions, run_batch_qa
+from src.context import get_context_packer
+from src.logger import get_logger
+
+logger = get_logger()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with the RAG pipeline")
+    parser.add_argument("--questions", required=True, help='JSONL input, one {"id": ..., "question": ...} per line')
+    parser.add_argument("--output", default="outputs/batch_answers.jsonl", help="JSONL output (appended; reruns resume)")
+    parser.add_argument("--pdf", nargs="+", default=["data/[01] Introduction.pdf"], help="Documents (PDF, DOCX, TXT) to index")
+    parser.add_argument("--chroma-dir", default="outputs/chroma_semantic_allpdfs_v2")
+    parser.add_argument("--backend", default="groq", choices=LLM_BACKENDS)
+    parser.add_argument("--embedding-model", default="BAAI/bge-base-en-v1.5", help="'fake' for offline runs")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4, help="Max LLM requests in flight")
+    parser.add_argument("--rps", type=float, default=None, help="Max LLM requests started per second")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for ingestion")
+    parser.add_argument("--context-budget", type=int, default=None, help="Context token budget (default: per backend)")
+    parser.add_argument("--no-pack-context", action="store_true", help="Concatenate retrieved chunks as-is")
+    parser.add_argument("--retrieval-mode", default="dense", choices=["dense", "hybrid"], help="hybrid: dense + BM25 with rank fusion")
+    parser.add_argument("--rerank", action="store_true", help="Rerank retrieved candidates with a cross-encoder")
+    parser.add_argument("--rerank-candidates", type=int, default=20)
+    parser.add_argument(
+        "--course", action="append", default=None,
+        help="Only index and search this course's documents (see data/courses.json); repeatable"
+    )
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    index_settings = IndexSettings(
+        chroma_persist_dir=args.chroma_dir,
+        embedding_model=args.embedding_model,
+        workers=args.workers,
+        keyword_index=args.retrieval_mode == "hybrid",
+    )
+    if args.course:
+        rag_index = build_partitioned_index(args.pdf, COURSE_MAP_FILE, index_settings, courses=args.course)
+    else:
+        rag_index = build_index(args.pdf, index_settings)
+    # Plain dense top-k uses the bulk search path; anything else goes through the pipeline's retriever
+    retriever = None
+    if args.retrieval_mode != "dense" or args.rerank or args.course:
+        retriever = get_pipeline_retriever(
+            rag_index,
+            top_k=args.top_k,
+            retrieval_mode=args.retrieval_mode,
+            rerank=args.rerank,
+            rerank_candidates=args.rerank_candidates,
+        )
+    chat_model = get_chat_model(args.backend)
+    context_packer = None
+    if not args.no_pack_context:
+        context_packer = get_context_packer(args.backend, token_budget=args.context_budget)
+    questions = read_questions(args.questions)
+    summary = run_batch_qa(
+        questions,
+        rag_index.embed_model,
+        getattr(rag_index, "vectorstore", None),
+        chat_model,
+        args.output,
+        k=args.top_k,
+        concurrency=args.concurrency,
+        requests_per_second=args.rps,
+        context_packer=context_packer,
+        retriever=retriever,
+    )
+    if context_packer is not None:
+        summary["context"] = context_packer.stats()
+    print(summary)
+
+if __name__ == "__main__":
+    main()
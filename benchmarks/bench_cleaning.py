@@ -0,0 +1,132 @@
+# benchmarks/bench_cleaning.py
+#
+# Per-chunk cost of chunk cleaning and per-answer cost of answer polishing, before and after
+# the str-builtin cleaner (src/cleaning.py) and the sentencizer-only spaCy pipeline.
+# Chunks are cut from the documents in data/; answers are built from their sentences.
+#
+#   python benchmarks/bench_cleaning.py
+#   python benchmarks/bench_cleaning.py --files data/*.pdf --repeat 10 --answers 500
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.cleaning import _CHAR_MAP, clean_text, clean_texts, strip_page_furniture
+from src.loaders import load_document
+from src.postprocess import get_nlp, spacy_polish, spacy_polish_many
+
+
+def legacy_clean_text(text):
+    """
+    The previous src/utils.final_clean_text: three re.sub passes per chunk.
+    """
+    text = re.sub(r'-\n', '', text)
+    text = re.sub(r'\n+', ' ', text)
+    text = re.sub(r' +', ' ', text)
+    return text.strip()
+
+
+_ONE_PASS_RE = re.compile(r"-\n|\s+|[" + "".join(_CHAR_MAP) + "]")
+_ONE_PASS_MAP = {**_CHAR_MAP, "-\n": ""}
+
+
+def one_pass_clean_text(text):
+    """
+    clean_text as a single regex pass with a replacement callback, for comparison.
+    """
+    return _ONE_PASS_RE.sub(lambda m: _ONE_PASS_MAP.get(m.group(), " "), text).strip()
+
+
+def legacy_polish(nlp, text):
+    """
+    The previous src/postprocess.spacy_polish: full pipeline, then two regex passes.
+    """
+    clean = " ".join(sent.text.strip() for sent in nlp(text).sents)
+    clean = re.sub(r'[\n\t]+', ' ', clean)
+    clean = re.sub(r' +', ' ', clean)
+    return clean.strip()
+
+
+def per_item_us(func, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(items)
+    return round((time.perf_counter() - start) / repeat / max(1, len(items)) * 1e6, 2)
+
+
+def make_answers(chunks, n):
+    """
+    Answer-like texts: 2-6 sentences with the line breaks and double spaces LLMs produce.
+    """
+    sentences = [s for chunk in chunks for s in re.split(r"(?<=[.!?])\s+", " ".join(chunk.split())) if len(s) > 30]
+    answers = []
+    for i in range(n):
+        size = 2 + i % 5
+        picked = [sentences[(i * 7 + j) % len(sentences)] for j in range(size)]
+        answers.append("\n".join(picked) if i % 2 else "  ".join(picked))
+    return answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of chunk cleaning and answer polishing")
+    parser.add_argument("--files", nargs="+", default=sorted(glob.glob(os.path.join(ROOT, "data", "*.pdf"))))
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--answers", type=int, default=200)
+    parser.add_argument("--output", default="outputs/bench/cleaning.json")
+    args = parser.parse_args()
+
+    chunks = []
+    for path in args.files:
+        for record in strip_page_furniture(load_document(path)):
+            text = record["text"]
+            chunks.extend(text[i:i + args.chunk_size] for i in range(0, len(text), args.chunk_size))
+    print(f"{len(chunks)} chunks of up to {args.chunk_size} chars from {len(args.files)} files")
+
+    report = {"chunks": len(chunks)}
+    report["clean_us_per_chunk"] = {
+        "legacy (3x re.sub)": per_item_us(lambda items: [legacy_clean_text(t) for t in items], chunks, args.repeat),
+        "one regex pass (callback)": per_item_us(lambda items: [one_pass_clean_text(t) for t in items], chunks, args.repeat),
+        "clean_text": per_item_us(lambda items: [clean_text(t) for t in items], chunks, args.repeat),
+        "clean_texts (batch)": per_item_us(clean_texts, chunks, args.repeat),
+    }
+    report["clean_outputs_changed"] = sum(legacy_clean_text(t) != clean_text(t) for t in chunks)
+
+    answers = make_answers(chunks, args.answers)
+    polish = {}
+    try:
+        import spacy
+
+        full = spacy.load("en_core_web_sm")
+        polish["legacy (en_core_web_sm)"] = per_item_us(lambda items: [legacy_polish(full, t) for t in items], answers, 1)
+    except OSError:
+        print("en_core_web_sm is not installed; skipping the legacy polish baseline.")
+    get_nlp()
+    polish["spacy_polish (sentencizer)"] = per_item_us(lambda items: [spacy_polish(t) for t in items], answers, args.repeat)
+    polish["spacy_polish_many (nlp.pipe)"] = per_item_us(spacy_polish_many, answers, args.repeat)
+    report["answers"] = len(answers)
+    report["polish_us_per_answer"] = polish
+
+    for title, key in (("Chunk cleaning", "clean_us_per_chunk"), ("Answer polishing", "polish_us_per_answer")):
+        print(f"\n{title} (µs per item)")
+        baseline = next(iter(report[key].values()))
+        for name, us in report[key].items():
+            print(f"  {name:<32}{us:>10.2f}  ({baseline / us:.1f}x)")
+    print(f"\n{report['clean_outputs_changed']}/{len(chunks)} cleaned chunks differ from the legacy cleaner (ligatures, glyph bullets, tabs, odd spaces).")
+
+    output = os.path.join(ROOT, args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_embeddings.py
+#
+# Query embedding under concurrent load: every client thread embeds its own questions, either
+# straight on the model (each request on its own thread, as before) or through the shared
+# micro-batching executor (src/embeddings.BatchingEmbeddings). Reports queries/s and p50/p95/p99.
+#
+#   python benchmarks/bench_embeddings.py --embedding-model BAAI/bge-base-en-v1.5 --clients 8
+#   python benchmarks/bench_embeddings.py --simulate-ms 8,0.5     # offline: fake model with an ONNX-like cost
+#
+# --simulate-ms FIXED,PER_TEXT gives the fake embedder a per-call and a per-text cost that, like an
+# ONNX session using every core, cannot overlap with other calls.
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from langchain_core.embeddings import Embeddings
+from src.embeddings import BatchingEmbeddings, get_embedding_model
+from src.metrics import LatencyHistogram
+
+
+class SimulatedCostEmbeddings(Embeddings):
+    """
+    The fake embedder with the cost profile of a CPU model: calls are serialized (they compete
+    for the same cores) and each costs fixed_ms + per_text_ms * len(texts).
+    Like FastEmbed, it offers batched query embedding as model.query_embed.
+    """
+
+    def __init__(self, base, fixed_ms, per_text_ms):
+        self.base = base
+        self.fixed = fixed_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self._cpu = threading.Lock()
+        self.model = self
+
+    def query_embed(self, texts):
+        import numpy as np
+
+        return [np.asarray(vector) for vector in self.embed_documents(texts)]
+
+    def embed_documents(self, texts):
+        with self._cpu:
+            time.sleep(self.fixed + self.per_text * len(texts))
+            return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def run_clients(embed_query, questions, clients):
+    histogram = LatencyHistogram()
+
+    def client(part):
+        for question in part:
+            start = time.perf_counter()
+            embed_query(question)
+            histogram.record(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(questions[i::clients],)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    return {"seconds": round(seconds, 3), "qps": round(len(questions) / seconds, 2), **histogram.summary()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent query embedding: direct vs micro-batched")
+    parser.add_argument("--embedding-model", default="fake")
+    parser.add_argument("--simulate-ms", default="8,0.5", help="FIXED,PER_TEXT cost for the fake model ('' for none)")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=2)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=None, help="ONNX intra-op threads (FastEmbed)")
+    parser.add_argument("--output", default="outputs/bench/embeddings.json")
+    args = parser.parse_args()
+
+    model = get_embedding_model(args.embedding_model, threads=args.threads)
+    if args.embedding_model == "fake" and args.simulate_ms:
+        fixed, per_text = (float(x) for x in args.simulate_ms.split(","))
+        model = SimulatedCostEmbeddings(model, fixed, per_text)
+    model.embed_query("warm-up")
+
+    report = {"settings": vars(args), "runs": []}
+    print(f"{'clients':>8}{'mode':>10}{'q/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'batch':>8}")
+    for clients in args.clients:
+        # Distinct questions per run, so nothing is served from a cache
+        questions = [f"What does lecture {i % 12} say about topic {i} (run {clients})?" for i in range(args.queries)]
+        direct = run_clients(model.embed_query, questions, clients)
+        batcher = BatchingEmbeddings(
+            model, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms, workers=args.workers
+        )
+        batched = run_clients(batcher.embed_query, questions, clients)
+        batched["mean_batch_size"] = batcher.stats()["mean_batch_size"]
+        batcher.close()
+        for mode, result in (("direct", direct), ("batched", batched)):
+            print(f"{clients:>8}{mode:>10}{result['qps']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                  f"{result['p99_ms']:>10}{result.get('mean_batch_size', 1):>8}")
+            report["runs"].append({"clients": clients, "mode": mode, **result})
+
+    output = os.path.join(ROOT, args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
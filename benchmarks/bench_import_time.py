@@ -0,0 +1,110 @@
+# benchmarks/bench_import_time.py
+#
+# Measures cold import time of the entry points in fresh interpreters.
+# Compare against an older commit with --compare <git-ref> to see before/after numbers:
+#
+#   python benchmarks/bench_import_time.py --compare HEAD~1
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# app.py runs Streamlit calls at import time, so its startup is measured as the imports it performs
+TARGETS = {
+    "main.py": "import main",
+    "app.py (src imports)": "import src.registry, src.postprocess",
+    "src.pipeline": "import src.pipeline",
+}
+
+
+def time_import(code, cwd, runs):
+    """
+    Median wall time of `python -c code` in fresh processes, plus the slowest modules
+    reported by -X importtime for one run.
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        samples.append(elapsed)
+
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd, capture_output=True, text=True)
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        indent = len(module) - len(module.lstrip())
+        modules.append((indent, int(cumulative_us), module.strip()))
+    # Direct imports of the target (deeper modules are counted in their parent)
+    min_indent = min((indent for indent, _, _ in modules), default=0)
+    top = sorted((c, m) for indent, c, m in modules if indent in (min_indent, min_indent + 2))[-8:][::-1]
+    return {
+        "median_s": round(statistics.median(samples), 4),
+        "min_s": round(min(samples), 4),
+        "slowest_modules": [{"module": m, "cumulative_ms": round(c / 1000, 1)} for c, m in top],
+    }
+
+
+def checkout_ref(ref, dest):
+    """
+    Extracts a git ref into dest without touching the working tree.
+    """
+    archive = os.path.join(dest, "src.tar")
+    subprocess.run(["git", "archive", "--format=tar", "-o", archive, ref], cwd=ROOT, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(dest)
+    os.remove(archive)
+
+
+def run(cwd, runs):
+    return {name: time_import(code, cwd, runs) for name, code in TARGETS.items()}
+
+
+def print_table(results, compare=None):
+    print(f"{'target':<24}{'after (s)':>12}" + (f"{'before (s)':>12}{'speedup':>10}" if compare else ""))
+    for name, after in results.items():
+        line = f"{name:<24}{after.get('median_s', 'error')!s:>12}"
+        if compare:
+            before = compare.get(name, {})
+            line += f"{before.get('median_s', 'error')!s:>12}"
+            if "median_s" in before and "median_s" in after:
+                line += f"{before['median_s'] / after['median_s']:>9.1f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark for main.py / app.py startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--compare", help="git ref to measure as the 'before' numbers")
+    parser.add_argument("--output", default="outputs/bench/import_time.json")
+    args = parser.parse_args()
+
+    report = {"after": run(ROOT, args.runs)}
+    if args.compare:
+        with tempfile.TemporaryDirectory() as tmp:
+            checkout_ref(args.compare, tmp)
+            report["before"] = run(tmp, args.runs)
+            report["before_ref"] = args.compare
+
+    print_table(report["after"], report.get("before"))
+    output = os.path.join(ROOT, args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
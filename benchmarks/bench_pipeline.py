@@ -0,0 +1,276 @@
+# benchmarks/bench_pipeline.py
+#
+# End-to-end ingestion and query benchmark that runs fully offline: deterministic fake
+# embeddings and a fake chat model stand in for FastEmbed and Groq/Gemini.
+# Reports time per stage (load, prechunk, semantic_chunk, embed, clean, index; retrieve,
+# prompt, generate, polish), pages/s and chunks/s, query p50/p95/p99 and peak memory,
+# and writes the results to JSON so runs on different commits can be compared.
+# Every run starts from an empty index directory (cold parse cache included).
+#
+#   python benchmarks/bench_pipeline.py --label main
+#   python benchmarks/bench_pipeline.py --scale 10 --label x10         # synthetic corpus, 10 variants per document
+#   python benchmarks/bench_pipeline.py --label branch --compare outputs/bench/pipeline-main.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_rerank import read_questions
+from src.loaders import SUPPORTED_EXTENSIONS, load_document
+from src.metrics import LatencyRecorder, StageTimer
+
+FAKE_ANSWER = (
+    "Logistic regression models the probability of the positive class with the sigmoid of a linear "
+    "function of the features.\nIts weights are fitted by maximizing the likelihood, usually with gradient "
+    "descent, and  regularization keeps them small. The decision boundary is linear in the input space, "
+    "which makes the model fast to train and easy to interpret."
+)
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far (None where the resource module is missing).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def build_corpus(files, scale, corpus_dir, seed=0):
+    """
+    scale 1: the files as they are.
+    scale N: N synthetic .txt variants per file; sentences are shuffled within each page, so every
+    variant has realistic text and page structure but its own content hash (no cache hits).
+    """
+    if scale <= 1:
+        return list(files)
+    os.makedirs(corpus_dir, exist_ok=True)
+    corpus = []
+    for path in files:
+        pages = [record["text"] for record in load_document(path)]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for i in range(scale):
+            rng = random.Random(f"{seed}:{stem}:{i}")
+            variant = []
+            for page in pages:
+                sentences = _SENTENCE_RE.split(page)
+                rng.shuffle(sentences)
+                variant.append(" ".join(sentences))
+            target = os.path.join(corpus_dir, f"{stem}-{i:03d}.txt")
+            with open(target, "w", encoding="utf-8") as f:
+                f.write("\f".join(variant))
+            corpus.append(target)
+    return corpus
+
+
+def make_questions(question_file, rag_index, n, seed=0):
+    """
+    The questions in question_file, topped up to n with questions built from indexed chunks.
+    Every question is distinct, so memoized query embeddings do not hide the embed cost.
+    """
+    questions = read_questions(question_file) if question_file and os.path.exists(question_file) else []
+    stored = rag_index.vectorstore.get(include=["documents"], limit=max(n, 50))["documents"]
+    rng = random.Random(seed)
+    while len(questions) < n and stored:
+        words = rng.choice(stored).split()
+        start = rng.randrange(max(1, len(words) - 8))
+        questions.append(f"What does the course say about {' '.join(words[start:start + 8])}? ({len(questions)})")
+    return questions[:n]
+
+
+def run_queries(rag_index, questions, top_k):
+    """
+    The steps of the RAG chain, timed one by one: retrieve → prompt (pack context, format)
+    → generate (fake LLM) → polish. Retrieval is not memoized.
+    """
+    from langchain_core.output_parsers import StrOutputParser
+    from src.context import get_context_packer
+    from src.llms import get_fake_llm
+    from src.postprocess import spacy_polish
+    from src.prompts import get_rag_prompt
+    from src.retriever import get_retriever
+
+    retriever = get_retriever(rag_index.vectorstore, k=top_k)
+    packer = get_context_packer("fake")
+    prompt = get_rag_prompt()
+    chat_model = get_fake_llm(responses=[FAKE_ANSWER])
+    parser = StrOutputParser()
+
+    def answer(question, latency):
+        with latency.time("total"):
+            with latency.time("retrieve"):
+                docs = retriever.invoke(question)
+            with latency.time("prompt"):
+                prompt_input, _ = packer.pack_for_prompt(docs, question, prompt)
+                prompt_value = prompt.invoke(prompt_input)
+            with latency.time("generate"):
+                raw = parser.invoke(chat_model.invoke(prompt_value))
+            with latency.time("polish"):
+                spacy_polish(raw)
+
+    # Warm-up (spaCy load, first-call overheads) is not part of the measurement
+    answer("warm-up question?", LatencyRecorder())
+    latency = LatencyRecorder()
+    start = time.perf_counter()
+    for question in questions:
+        answer(question, latency)
+    seconds = time.perf_counter() - start
+    return {
+        "count": len(questions),
+        "seconds": round(seconds, 3),
+        "qps": round(len(questions) / seconds, 2) if seconds else None,
+        "stages": latency.summary(),
+    }
+
+
+def print_report(report):
+    ingest = report["ingest"]
+    print(f"\nIngestion: {report['corpus']['files']} files, {report['corpus']['pages']} pages, "
+          f"{report['corpus']['chunks']} chunks in {ingest['seconds']}s "
+          f"({ingest['pages_per_s']} pages/s, {ingest['chunks_per_s']} chunks/s)")
+    for name, stage in ingest["stages"].items():
+        print(f"  {name:<24}{stage['seconds']:>10.3f}s  (x{stage['count']})")
+    query = report["query"]
+    print(f"\nQueries: {query['count']} in {query['seconds']}s ({query['qps']} q/s)")
+    print(f"  {'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stage in query["stages"].items():
+        print(f"  {name:<12}{stage['p50_ms']:>10}{stage['p95_ms']:>10}{stage['p99_ms']:>10}")
+    print(f"\nPeak RSS: {report['memory']['peak_rss_mb_after_ingest']} MB after ingestion, "
+          f"{report['memory']['peak_rss_mb']} MB overall")
+
+
+def _change(old, new):
+    if not old:
+        return "    n/a"
+    return f"{(new - old) / old * 100:+7.1f}%"
+
+
+def print_comparison(old, new):
+    """
+    Side-by-side of two result files: ingestion stage seconds, throughput and query percentiles.
+    """
+    print(f"\nCompared with {old.get('label')} ({old.get('commit')}):")
+    for name, stage in new["ingest"]["stages"].items():
+        before = old["ingest"]["stages"].get(name, {}).get("seconds")
+        print(f"  ingest {name:<24}{before if before is not None else '-':>10} → {stage['seconds']:<10}{_change(before, stage['seconds'])}")
+    for key in ("pages_per_s", "chunks_per_s"):
+        print(f"  ingest {key:<24}{old['ingest'][key]:>10} → {new['ingest'][key]:<10}{_change(old['ingest'][key], new['ingest'][key])}")
+    for name, stage in new["query"]["stages"].items():
+        before_stage = old["query"]["stages"].get(name, {})
+        for p in ("p50_ms", "p95_ms", "p99_ms"):
+            before = before_stage.get(p)
+            print(f"  query {name + ' ' + p:<25}{before if before is not None else '-':>10} → {stage[p]:<10}{_change(before, stage[p])}")
+    print(f"  peak_rss_mb{'':<20}{old['memory']['peak_rss_mb']:>10} → {new['memory']['peak_rss_mb']:<10}"
+          f"{_change(old['memory']['peak_rss_mb'], new['memory']['peak_rss_mb'])}")
+
+
+def main():
+    default_files = sorted(
+        os.path.join(ROOT, "data", name) for name in os.listdir(os.path.join(ROOT, "data"))
+        if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+    )
+    parser = argparse.ArgumentParser(description="Offline ingestion + query benchmark (fake embedder and LLM)")
+    parser.add_argument("--files", nargs="+", default=default_files)
+    parser.add_argument("--scale", type=int, default=1, help="Synthetic variants per document (1: data/ as is)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--questions", default=os.path.join(ROOT, "docs", "classic-rag-QA.txt"))
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--backend", default="chroma", help="Vector backend (see src/vectorstore.VECTOR_BACKENDS)")
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output", default=None, help="Default: outputs/bench/pipeline-<label>.json")
+    parser.add_argument("--compare", default=None, help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    from src.pipeline import build_index
+    from src.vectorstore import count_vectors
+
+    work_dir = os.path.join(ROOT, "outputs", "bench", f"pipeline-work-{args.label}")
+    shutil.rmtree(work_dir, ignore_errors=True)
+    files = build_corpus(args.files, args.scale, os.path.join(work_dir, "corpus"))
+    print(f"Corpus: {len(files)} files (scale {args.scale})")
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    rag_index = build_index(
+        files,
+        chroma_persist_dir=os.path.join(work_dir, "index"),
+        chunk_size=args.chunk_size,
+        embedding_model="fake",
+        force_reindex=True,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        keyword_index=False,
+        vector_backend=args.backend,
+        timer=timer,
+    )
+    ingest_seconds = time.perf_counter() - start
+    rss_after_ingest = peak_rss_mb()
+
+    parse_cache = os.path.join(work_dir, "index", "parsed_cache")
+    pages = sum(len(load_document(path, parse_cache)) for path in files)
+    chunks = count_vectors(rag_index.vectorstore)
+
+    questions = make_questions(args.questions, rag_index, args.queries)
+    query = run_queries(rag_index, questions, args.top_k)
+
+    report = {
+        "label": args.label,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("files", "output", "compare")},
+        "corpus": {
+            "files": len(files),
+            "pages": pages,
+            "chunks": chunks,
+            "megabytes": round(sum(os.path.getsize(path) for path in files) / 1e6, 2),
+        },
+        "ingest": {
+            "seconds": round(ingest_seconds, 3),
+            "pages_per_s": round(pages / ingest_seconds, 2),
+            "chunks_per_s": round(chunks / ingest_seconds, 2),
+            "stages": timer.as_dict(),
+        },
+        "query": query,
+        "memory": {"peak_rss_mb_after_ingest": rss_after_ingest, "peak_rss_mb": peak_rss_mb()},
+    }
+    print_report(report)
+
+    output = os.path.join(ROOT, args.output or f"outputs/bench/pipeline-{args.label}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/bench_rerank.py
+#
+# Latency added by the cross-encoder re-rank stage per query, for different candidate
+# counts N. Queries run against an existing index (build it first with main.py); by default
+# the questions in docs/classic-rag-QA.txt are used.
+#
+#   python benchmarks/bench_rerank.py --candidates 10 20 50 --k 5
+#   python benchmarks/bench_rerank.py --scorer overlap --embedding-model fake   # offline smoke run
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.bm25 import tokenize
+from src.embeddings import get_embedding_model
+from src.metrics import LatencyHistogram
+from src.rerank import CrossEncoderReranker, DEFAULT_RERANK_MODEL
+from src.vectorstore import load_vectorstore
+
+QUESTION_RE = re.compile(r"^\s*\d+\.\s+(.+\?)\s*$")
+
+
+def read_questions(path):
+    """
+    One question per line, or numbered "N. question?" lines as in docs/classic-rag-QA.txt.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    numbered = [m.group(1) for m in map(QUESTION_RE.match, lines) if m]
+    return numbered or lines
+
+
+def overlap_scorer(pairs):
+    """
+    Cheap stand-in for the cross-encoder: share of query terms found in the chunk.
+    """
+    scores = []
+    for query, text in pairs:
+        terms = set(tokenize(query))
+        scores.append(len(terms & set(tokenize(text))) / max(1, len(terms)))
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-query latency of cross-encoder re-ranking vs candidate count")
+    parser.add_argument("--chroma-dir", default="outputs/chroma_semantic_allpdfs_v2")
+    parser.add_argument("--backend", default="chroma")
+    parser.add_argument("--embedding-model", default="BAAI/bge-base-en-v1.5")
+    parser.add_argument("--questions", default=os.path.join(ROOT, "docs", "classic-rag-QA.txt"))
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 20, 50])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--scorer", choices=["cross-encoder", "overlap"], default="cross-encoder")
+    parser.add_argument("--model", default=DEFAULT_RERANK_MODEL)
+    parser.add_argument("--output", default="outputs/bench/rerank.json")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    embed_model = get_embedding_model(args.embedding_model)
+    vectorstore = load_vectorstore(embed_model, persist_directory=args.chroma_dir, backend=args.backend)
+    scorer = overlap_scorer if args.scorer == "overlap" else None
+    print(f"{len(questions)} questions, k={args.k}, scorer={args.scorer}")
+
+    # Warm-up: model load and first-call overheads are not part of per-query latency
+    CrossEncoderReranker(args.model, batch_size=args.batch_size, scorer=scorer).rerank(
+        questions[0], vectorstore.similarity_search(questions[0], k=2), k=1
+    )
+
+    report = {}
+    for n in args.candidates:
+        reranker = CrossEncoderReranker(args.model, batch_size=args.batch_size, scorer=scorer)
+        retrieval = LatencyHistogram()
+        changed = 0
+        for question in questions:
+            t0 = time.perf_counter()
+            candidates = vectorstore.similarity_search(question, k=n)
+            retrieval.record(time.perf_counter() - t0)
+            top = reranker.rerank(question, candidates, k=args.k)
+            changed += [d.page_content for d in top] != [d.page_content for d in candidates[:args.k]]
+        report[n] = {
+            "retrieval": retrieval.summary(),
+            "rerank": reranker.latency.summary().get("rerank", {}),
+            "top_k_changed": round(changed / max(1, len(questions)), 3),
+        }
+
+    print(f"{'N':>4}{'retrieve p50':>14}{'rerank p50':>12}{'rerank p95':>12}{'rerank p99':>12}{'top-k changed':>15}")
+    for n, stats in report.items():
+        rerank = stats["rerank"]
+        print(
+            f"{n:>4}{stats['retrieval']['p50_ms']:>12}ms{rerank.get('p50_ms', 0):>10}ms"
+            f"{rerank.get('p95_ms', 0):>10}ms{rerank.get('p99_ms', 0):>10}ms{stats['top_k_changed']:>15}"
+        )
+    output = os.path.join(ROOT, args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"scorer": args.scorer, "model": args.model, "k": args.k, "results": report}, f, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
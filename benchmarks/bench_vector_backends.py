@@ -0,0 +1,134 @@
+# benchmarks/bench_vector_backends.py
+#
+# Recall/latency tradeoff of the vector backends on our own corpus. Vectors, texts and
+# metadata are exported from an existing Chroma index (build it first with main.py), loaded
+# into each backend, and queried with either real questions or perturbed chunk vectors.
+# Recall@k is measured against an exact NumPy scan; int8/float16 variants of the NumPy
+# store are included to show what quantization plus rescoring costs in recall.
+#
+#   python benchmarks/bench_vector_backends.py --chroma-dir outputs/chroma_semantic_allpdfs_v2 --k 5
+#   python benchmarks/bench_vector_backends.py --questions questions.txt --embedding-model BAAI/bge-base-en-v1.5
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from src.metrics import LatencyHistogram
+from src.native_store import QUANTIZATIONS
+from src.vectorstore import VECTOR_BACKENDS, load_chroma_vectorstore, load_vectorstore
+
+
+def export_chroma(chroma_dir):
+    vectorstore = load_chroma_vectorstore(None, persist_directory=chroma_dir)
+    data = vectorstore._collection.get(include=["embeddings", "documents", "metadatas"])
+    return data["ids"], np.asarray(data["embeddings"], dtype=np.float32), data["documents"], data["metadatas"]
+
+
+def make_queries(args, vectors):
+    if args.questions:
+        from src.embeddings import get_embedding_model
+
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        return np.asarray(get_embedding_model(args.embedding_model).embed_documents(questions), dtype=np.float32)
+    # Perturbed copies of random chunks: near-duplicate queries whose neighbours are known to exist
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(vectors), size=min(args.n_queries, len(vectors)), replace=False)
+    noise = rng.normal(scale=args.noise * np.abs(vectors).mean(), size=(len(picks), vectors.shape[1]))
+    return (vectors[picks] + noise).astype(np.float32)
+
+
+def bench_backend(backend, ids, vectors, texts, metadatas, queries, k, store_dir, quantization=None):
+    start = time.perf_counter()
+    store = load_vectorstore(None, persist_directory=store_dir, backend=backend, quantization=quantization)
+    store.upsert_embeddings(ids, vectors, texts, metadatas)
+    store.search_by_vectors(queries[:1], k=k)  # builds the FAISS index, if any
+    build_seconds = time.perf_counter() - start
+
+    latency = LatencyHistogram()
+    results = []
+    for query in queries:
+        t0 = time.perf_counter()
+        hits = store.search_by_vectors([query], k=k)[0]
+        latency.record(time.perf_counter() - t0)
+        results.append([doc.id for doc, _ in hits])
+
+    t0 = time.perf_counter()
+    store.search_by_vectors(queries, k=k)
+    batch_seconds = time.perf_counter() - t0
+    return results, {
+        "build_s": round(build_seconds, 4),
+        **latency.summary(),
+        "batch_qps": round(len(queries) / batch_seconds, 1) if batch_seconds else None,
+        "scanned_mb": round(store.memory_footprint() / 1e6, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency of Chroma vs NumPy vs FAISS backends")
+    parser.add_argument("--chroma-dir", default="outputs/chroma_semantic_allpdfs_v2")
+    parser.add_argument("--backends", nargs="+", default=[b for b in VECTOR_BACKENDS if b != "chroma"])
+    parser.add_argument("--quantizations", nargs="*", default=list(QUANTIZATIONS), help="Quantized numpy variants to add")
+    parser.add_argument("--questions", help="Text file with one question per line (default: perturbed chunk vectors)")
+    parser.add_argument("--embedding-model", default="BAAI/bge-base-en-v1.5")
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", default="outputs/bench/vector_backends.json")
+    args = parser.parse_args()
+
+    ids, vectors, texts, metadatas = export_chroma(args.chroma_dir)
+    queries = make_queries(args, vectors)
+    print(f"{len(ids)} vectors (dim {vectors.shape[1]}), {len(queries)} queries, k={args.k}")
+
+    # Chroma itself, queried one vector at a time, for the latency baseline
+    chroma = load_chroma_vectorstore(None, persist_directory=args.chroma_dir)
+    chroma_latency = LatencyHistogram()
+    for query in queries:
+        t0 = time.perf_counter()
+        chroma._collection.query(query_embeddings=[query.tolist()], n_results=args.k)
+        chroma_latency.record(time.perf_counter() - t0)
+    report = {"chroma": chroma_latency.summary()}
+
+    exact = None
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [("numpy", None)] + [(b, None) for b in args.backends if b != "numpy"]
+        runs += [("numpy", q) for q in args.quantizations]
+        for backend, quantization in runs:
+            name = f"{backend}-{quantization}" if quantization else backend
+            try:
+                results, stats = bench_backend(
+                    backend, ids, vectors, texts, metadatas, queries, args.k, os.path.join(tmp, name), quantization
+                )
+            except ImportError as e:
+                print(f"Skipping {backend}: {e}")
+                continue
+            if exact is None:
+                exact = results
+            stats["recall_at_k"] = round(
+                float(np.mean([len(set(r) & set(e)) / max(1, len(e)) for r, e in zip(results, exact)])), 4
+            )
+            report[name] = stats
+
+    print(f"{'backend':<16}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'batch qps':>12}{'scan MB':>10}")
+    for name, stats in report.items():
+        print(
+            f"{name:<16}{stats.get('recall_at_k', '-')!s:>10}{stats['p50_ms']:>10}"
+            f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats.get('batch_qps', '-')!s:>12}{stats.get('scanned_mb', '-')!s:>10}"
+        )
+    output = os.path.join(ROOT, args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
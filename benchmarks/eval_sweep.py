@@ -0,0 +1,388 @@
+# benchmarks/eval_sweep.py
+#
+# Retrieval-quality / answer-quality / latency sweep over pipeline settings: every combination of
+# chunker, chunk size, chunk overlap and breakpoint percentile gets its own index (cached under
+# outputs/eval/indexes/, so later sweeps only re-ingest new combinations), and every top_k is then
+# evaluated on a fixed question set. Per configuration it records recall@k and MRR, answer-quality
+# scores, query latency and prompt tokens, and marks the Pareto-optimal configurations.
+#
+#   python benchmarks/eval_sweep.py --embedding-model fake                      # offline: stub answers, local judge
+#   python benchmarks/eval_sweep.py --chunk-sizes 1000 2000 --top-k 3 5 8 --breakpoint-percentiles 90 95
+#   python benchmarks/eval_sweep.py --chunkers semantic structured --embedding-model fake   # chunking cost vs quality
+#   python benchmarks/eval_sweep.py --llm-backend groq --judge ragas --judge-backend gemini
+#
+# Questions come from docs/classic-rag-QA.txt (numbered questions with "ans -" / "Expected answer -"
+# references) or from a JSONL file of {"question": ..., "reference": ...} lines.
+# A retrieved chunk counts as relevant when it contains at least --relevance share of the reference's terms.
+#
+# Judges: "local" scores answers by term overlap (no model, no network); "ragas" runs the ragas metrics
+# with --judge-backend as the judge LLM.
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.bm25 import tokenize
+from src.chunkers import ChunkStats
+from src.context import estimate_tokens
+from src.loaders import SUPPORTED_EXTENSIONS
+from src.metrics import LatencyRecorder
+
+QUESTION_RE = re.compile(r"^\s*\d+\.\s+(.+\?)\s*$")
+REFERENCE_RE = re.compile(r"^\s*(?:ans|expected answer)\s*-\s*(.*)$", re.IGNORECASE)
+VERDICT_RE = re.compile(r"\s*\((?:correct|wrong)[^)]*\)\s*$", re.IGNORECASE)
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+JUDGE_METRICS = ("faithfulness", "answer_relevancy", "context_precision", "context_recall", "answer_correctness")
+
+
+def read_qa(path):
+    """
+    [{"question", "reference"}] from a JSONL file, or from numbered questions in the
+    docs/classic-rag-QA.txt layout (reference after "ans -", or the paragraphs after
+    "Expected answer -" up to a "-----" line; "(correct)"-style verdicts are dropped).
+    """
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    items, reference, collecting = [], [], False
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            question = QUESTION_RE.match(line)
+            if question:
+                items.append({"question": question.group(1), "reference": ""})
+                reference, collecting = [], False
+                continue
+            if not items:
+                continue
+            answer = REFERENCE_RE.match(line)
+            if answer:
+                reference, collecting = [answer.group(1)], True
+            elif line.strip().startswith("---"):
+                collecting = False
+            elif collecting:
+                reference.append(line.strip())
+            items[-1]["reference"] = VERDICT_RE.sub("", " ".join(part for part in reference if part)).strip()
+    return [item for item in items if item["reference"]]
+
+
+def term_recall(reference, text):
+    """
+    Share of the reference's distinct terms that occur in text.
+    """
+    terms = set(tokenize(reference))
+    return len(terms & set(tokenize(text))) / max(1, len(terms))
+
+
+def token_f1(prediction, reference):
+    predicted, expected = tokenize(prediction), tokenize(reference)
+    common = sum(min(predicted.count(t), expected.count(t)) for t in set(predicted) & set(expected))
+    if not common:
+        return 0.0
+    precision, recall = common / len(predicted), common / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+
+def stub_answer(question, context):
+    """
+    Offline stand-in for the LLM: the context sentence sharing the most terms with the question.
+    """
+    sentences = [s for s in SENTENCE_RE.split(context) if s.strip()]
+    return max(sentences, key=lambda s: term_recall(question, s), default="I don't know")
+
+
+def local_judge(samples):
+    """
+    Term-overlap approximations of the ragas metrics, averaged over samples (no model calls):
+        faithfulness        answer terms found in the retrieved context
+        answer_relevancy    question terms found in the answer
+        context_precision   average precision of the relevant chunks in retrieval order
+        context_recall      reference terms found in the retrieved context
+        answer_correctness  token F1 of answer vs reference
+    """
+    totals = dict.fromkeys(JUDGE_METRICS, 0.0)
+    for sample in samples:
+        context = " ".join(sample["contexts"])
+        relevant = sample["relevant"]
+        hits = [i for i, flag in enumerate(relevant) if flag]
+        totals["faithfulness"] += term_recall(sample["answer"], context)
+        totals["answer_relevancy"] += term_recall(sample["question"], sample["answer"])
+        totals["context_precision"] += sum((n + 1) / (i + 1) for n, i in enumerate(hits)) / len(hits) if hits else 0.0
+        totals["context_recall"] += term_recall(sample["reference"], context)
+        totals["answer_correctness"] += token_f1(sample["answer"], sample["reference"])
+    return {name: round(total / max(1, len(samples)), 4) for name, total in totals.items()}
+
+
+def ragas_judge(samples, judge_backend, embed_model):
+    """
+    The same scores from ragas, with get_chat_model(judge_backend) as the judge LLM.
+    """
+    try:
+        from ragas import EvaluationDataset, evaluate
+        from ragas.embeddings import LangchainEmbeddingsWrapper
+        from ragas.llms import LangchainLLMWrapper
+        from ragas.metrics import (
+            AnswerCorrectness, Faithfulness, LLMContextPrecisionWithReference, LLMContextRecall, ResponseRelevancy,
+        )
+    except ImportError as e:
+        raise SystemExit(f"--judge ragas needs the ragas package (pip install ragas): {e}")
+    from src.llms import get_chat_model
+
+    dataset = EvaluationDataset.from_list([
+        {
+            "user_input": sample["question"],
+            "retrieved_contexts": sample["contexts"],
+            "response": sample["answer"],
+            "reference": sample["reference"],
+        }
+        for sample in samples
+    ])
+    metrics = {
+        "faithfulness": Faithfulness(),
+        "answer_relevancy": ResponseRelevancy(),
+        "context_precision": LLMContextPrecisionWithReference(),
+        "context_recall": LLMContextRecall(),
+        "answer_correctness": AnswerCorrectness(),
+    }
+    result = evaluate(
+        dataset,
+        metrics=list(metrics.values()),
+        llm=LangchainLLMWrapper(get_chat_model(judge_backend)),
+        embeddings=LangchainEmbeddingsWrapper(embed_model),
+        show_progress=False,
+    ).to_pandas()
+    return {name: round(float(result[metric.name].mean()), 4) for name, metric in metrics.items()}
+
+
+def index_dir(root, settings):
+    """
+    Cache directory of one index configuration; build_index's manifest makes reruns a no-op.
+    """
+    stamp = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:10]
+    name = f"{settings['chunker']}-cs{settings['chunk_size']}-ov{settings['chunk_overlap']}-bp{settings['breakpoint_percentile']:g}"
+    return os.path.join(root, f"{name}-{stamp}")
+
+
+def evaluate_config(rag_index, qa, top_k, answer_fn, context_packer, relevance):
+    """
+    Runs every question through retrieve → pack → answer and returns the samples plus
+    recall@k, MRR, latency and token counts.
+    """
+    from src.chain import format_docs
+    from src.prompts import get_rag_prompt
+    from src.retriever import get_retriever
+
+    prompt = get_rag_prompt()
+    retriever = get_retriever(rag_index.vectorstore, k=top_k, index_version=rag_index.index_version)
+    latency = LatencyRecorder()
+    samples, prompt_tokens, answer_tokens = [], [], []
+    for item in qa:
+        start = time.perf_counter()
+        with latency.time("retrieve"):
+            docs = retriever.invoke(item["question"])
+        if context_packer is not None:
+            prompt_input, _ = context_packer.pack_for_prompt(docs, item["question"], prompt)
+        else:
+            prompt_input = {"context": format_docs(docs), "question": item["question"]}
+        with latency.time("answer"):
+            answer = answer_fn(prompt_input)
+        latency.record("query", time.perf_counter() - start)
+        prompt_tokens.append(estimate_tokens(prompt.format(**prompt_input)))
+        answer_tokens.append(estimate_tokens(answer))
+        contexts = [doc.page_content for doc in docs]
+        samples.append({
+            **item,
+            "contexts": contexts,
+            "answer": answer,
+            "relevant": [term_recall(item["reference"], text) >= relevance for text in contexts],
+        })
+
+    first_hits = [next((rank for rank, flag in enumerate(s["relevant"], 1) if flag), None) for s in samples]
+    summary = latency.summary()
+    return samples, {
+        "recall@k": round(sum(rank is not None for rank in first_hits) / max(1, len(samples)), 4),
+        "mrr": round(sum(1 / rank for rank in first_hits if rank) / max(1, len(samples)), 4),
+        "p50_ms": summary["query"]["p50_ms"],
+        "p95_ms": summary["query"]["p95_ms"],
+        "retrieve_p50_ms": summary["retrieve"]["p50_ms"],
+        "prompt_tokens": round(sum(prompt_tokens) / max(1, len(prompt_tokens)), 1),
+        "answer_tokens": round(sum(answer_tokens) / max(1, len(answer_tokens)), 1),
+    }
+
+
+# Objectives of the Pareto front: (result key, higher is better)
+PARETO_OBJECTIVES = (("quality", True), ("recall@k", True), ("p95_ms", False), ("prompt_tokens", False))
+
+
+def mark_pareto(rows):
+    """
+    Sets row["pareto"] on configurations that no other configuration beats on every objective.
+    """
+    def at_least_as_good(a, b):
+        return all(a[key] >= b[key] if higher else a[key] <= b[key] for key, higher in PARETO_OBJECTIVES)
+
+    for row in rows:
+        row["pareto"] = not any(
+            other is not row and at_least_as_good(other, row) and any(other[key] != row[key] for key, _ in PARETO_OBJECTIVES)
+            for other in rows
+        )
+
+
+TABLE_COLUMNS = (
+    ("chunker", "chunker"), ("chunk_size", "chunk"), ("chunk_overlap", "overlap"), ("breakpoint_percentile", "bp"), ("top_k", "k"),
+    ("recall@k", "recall@k"), ("mrr", "MRR"), ("quality", "quality"), ("faithfulness", "faithful"),
+    ("answer_correctness", "correct"), ("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"), ("prompt_tokens", "prompt tok"),
+    ("chunks", "chunks"), ("embeds_per_sentence", "emb/sent"), ("breakpoint_search_rate", "bp search"),
+)
+
+
+def format_table(rows):
+    header = "| " + " | ".join(label for _, label in TABLE_COLUMNS) + " | pareto |"
+    lines = [header, "|" + "---|" * (len(TABLE_COLUMNS) + 1)]
+    for row in rows:
+        cells = [
+            f"{row[key]:g}" if isinstance(row[key], float) else "-" if row[key] is None else str(row[key])
+            for key, _ in TABLE_COLUMNS
+        ]
+        lines.append("| " + " | ".join(cells) + f" | {'★' if row['pareto'] else ''} |")
+    return "\n".join(lines)
+
+
+def main():
+    default_files = sorted(
+        os.path.join(ROOT, "data", name) for name in os.listdir(os.path.join(ROOT, "data"))
+        if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+    )
+    parser = argparse.ArgumentParser(description="Sweep chunking/retrieval settings; score quality, latency and cost")
+    parser.add_argument("--files", nargs="+", default=default_files)
+    parser.add_argument("--questions", default=os.path.join(ROOT, "docs", "classic-rag-QA.txt"))
+    parser.add_argument("--chunkers", nargs="+", choices=["semantic", "structured"], default=["semantic"])
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[1000, 2000])
+    parser.add_argument("--chunk-overlaps", type=int, nargs="+", default=[50])
+    parser.add_argument("--breakpoint-percentiles", type=float, nargs="+", default=[90, 95])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--embedding-model", default="BAAI/bge-base-en-v1.5")
+    parser.add_argument("--backend", default="chroma", help="Vector backend (see src/vectorstore.VECTOR_BACKENDS)")
+    parser.add_argument("--llm-backend", default="stub", help="'stub' (extractive, offline) or a get_chat_model backend")
+    parser.add_argument("--judge", choices=["local", "ragas"], default="local")
+    parser.add_argument("--judge-backend", default="groq", help="Judge LLM for --judge ragas")
+    parser.add_argument("--relevance", type=float, default=0.5, help="Reference term share that makes a chunk relevant")
+    parser.add_argument("--no-pack", action="store_true", help="Pass all retrieved chunks, without context packing")
+    parser.add_argument("--index-root", default="outputs/eval/indexes")
+    parser.add_argument("--output", default="outputs/eval/sweep.json")
+    args = parser.parse_args()
+
+    from src.pipeline import build_index, load_embedding_model
+    from src.context import get_context_packer
+    from src.vectorstore import count_vectors
+
+    qa = read_qa(args.questions)
+    if not qa:
+        raise SystemExit(f"No question/reference pairs in {args.questions}")
+    index_root = os.path.join(ROOT, args.index_root)
+    # One embedding model (and on-disk vector cache) for all configurations: sentences shared
+    # between chunkings are embedded once across the whole sweep
+    embed_model = load_embedding_model(args.embedding_model, disk_cache_dir=index_root)
+
+    if args.llm_backend == "stub":
+        def answer_fn(prompt_input):
+            return stub_answer(prompt_input["question"], prompt_input["context"])
+    else:
+        from src.chain import get_answer_chain
+        from src.llms import get_chat_model
+
+        answer_fn = get_answer_chain(get_chat_model(args.llm_backend)).invoke
+    pack_backend = "fake" if args.llm_backend == "stub" else args.llm_backend
+    print(f"{len(qa)} questions, {len(args.files)} documents, answers: {args.llm_backend}, judge: {args.judge}")
+
+    rows = []
+    grid = itertools.product(args.chunkers, args.chunk_sizes, args.chunk_overlaps, args.breakpoint_percentiles)
+    for chunker, chunk_size, chunk_overlap, percentile in grid:
+        settings = {
+            "chunker": chunker,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "breakpoint_percentile": percentile,
+            "embedding_model": args.embedding_model,
+            "vector_backend": args.backend,
+        }
+        persist_dir = index_dir(index_root, settings)
+        chunk_stats = ChunkStats()
+        start = time.perf_counter()
+        rag_index = build_index(
+            args.files,
+            chroma_persist_dir=persist_dir,
+            chunker=chunker,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            breakpoint_percentile=percentile,
+            embedding_model=args.embedding_model,
+            keyword_index=False,
+            vector_backend=args.backend,
+            embed_model=embed_model,
+            parse_cache_dir=os.path.join(index_root, "parsed_cache"),
+            chunk_stats=chunk_stats,
+        )
+        index_seconds = round(time.perf_counter() - start, 3)
+        # Boundary statistics are only collected while ingesting; cached indexes reuse the saved ones
+        stats_path = os.path.join(persist_dir, "chunk_stats.json")
+        if chunk_stats.lengths:
+            boundary_stats = chunk_stats.summary()
+            with open(stats_path, "w", encoding="utf-8") as f:
+                json.dump(boundary_stats, f, indent=2)
+        elif os.path.exists(stats_path):
+            with open(stats_path, "r", encoding="utf-8") as f:
+                boundary_stats = json.load(f)
+        else:
+            boundary_stats = {}
+        chunks = count_vectors(rag_index.vectorstore)
+        # Query vectors are memoized: embed them up front so latency compares retrieval and answering only
+        for item in qa:
+            embed_model.embed_query(item["question"])
+
+        for top_k in args.top_k:
+            packer = None if args.no_pack else get_context_packer(pack_backend)
+            samples, result = evaluate_config(rag_index, qa, top_k, answer_fn, packer, args.relevance)
+            scores = local_judge(samples) if args.judge == "local" else ragas_judge(samples, args.judge_backend, embed_model)
+            rows.append({
+                "chunker": chunker,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "breakpoint_percentile": percentile,
+                "top_k": top_k,
+                "chunks": chunks,
+                "index_seconds": index_seconds,
+                "embeds_per_sentence": boundary_stats.get("embeds_per_sentence"),
+                "breakpoint_search_rate": boundary_stats.get("breakpoint_search_rate"),
+                "boundaries": boundary_stats.get("boundaries"),
+                **result,
+                **scores,
+                "quality": round(sum(scores.values()) / len(scores), 4),
+            })
+            print(f"  {chunker} chunk {chunk_size}/{chunk_overlap} bp {percentile:g} k {top_k}: recall@k {result['recall@k']}, "
+                  f"MRR {result['mrr']}, quality {rows[-1]['quality']}, p95 {result['p95_ms']} ms")
+
+    mark_pareto(rows)
+    rows.sort(key=lambda row: (not row["pareto"], -row["quality"], row["p95_ms"]))
+    table = format_table(rows)
+    print("\n" + table)
+
+    output = os.path.join(ROOT, args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"settings": vars(args), "questions": len(qa), "pareto_objectives": PARETO_OBJECTIVES, "results": rows}, f, indent=2)
+    with open(os.path.splitext(output)[0] + ".md", "w", encoding="utf-8") as f:
+        f.write(table + "\n")
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
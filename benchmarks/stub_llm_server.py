@@ -0,0 +1,146 @@
+# benchmarks/stub_llm_server.py
+#
+# Local stand-in for the LLM APIs, for testing timeouts, hedging and failover without
+# network access or API keys. One server speaks all three protocols:
+#   - Groq (OpenAI-compatible):  POST /openai/v1/chat/completions  (JSON or SSE stream)
+#   - Gemini:                    POST /v1beta/models/<model>:generateContent / :streamGenerateContent
+#   - Ollama:                    POST /api/chat  (NDJSON stream or JSON)
+#
+#   python benchmarks/stub_llm_server.py --port 8901 --delay-ms 3000            # a slow Groq
+#   python benchmarks/stub_llm_server.py --port 8902 --fail-rate 1.0            # a broken backend
+#   GROQ_BASE_URL=http://127.0.0.1:8901 GEMINI_BASE_URL=http://127.0.0.1:8902 \
+#   OLLAMA_BASE_URL=http://127.0.0.1:8903 python main.py                        # with llm_backend="failover"
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(answer, delay_ms, fail_rate, token_delay_ms):
+    tokens = [t + " " for t in answer.split()]
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _start_stream(self, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(token_delay_ms / 1000)
+
+        def _end_stream(self):
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(delay_ms / 1000)
+            if random.random() < fail_rate:
+                return self._send_json(503, {"error": {"message": "stub backend unavailable", "code": 503}})
+
+            if self.path.startswith("/openai/v1/chat/completions"):
+                return self._openai(request)
+            if ":generateContent" in self.path or ":streamGenerateContent" in self.path:
+                return self._gemini(":streamGenerateContent" in self.path)
+            if self.path.startswith("/api/chat"):
+                return self._ollama(request)
+            return self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        def _openai(self, request):
+            model = request.get("model", "stub")
+            if not request.get("stream"):
+                return self._send_json(200, {
+                    "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": len(tokens), "total_tokens": len(tokens) + 1},
+                })
+            self._start_stream("text/event-stream")
+            for token in tokens:
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": token}, "finish_reason": None}],
+                }
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._end_stream()
+
+        def _gemini(self, stream):
+            def response(text):
+                return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}]}
+
+            if not stream:
+                return self._send_json(200, response(answer))
+            self._start_stream("text/event-stream")
+            for token in tokens:
+                self._write_chunk(f"data: {json.dumps(response(token))}\r\n\r\n".encode())
+            self._end_stream()
+
+        def _ollama(self, request):
+            model = request.get("model", "edusage")
+
+            def message(text, done):
+                return {"model": model, "created_at": "2024-01-01T00:00:00Z",
+                        "message": {"role": "assistant", "content": text}, "done": done,
+                        **({"done_reason": "stop"} if done else {})}
+
+            if request.get("stream") is False:
+                return self._send_json(200, message(answer, True))
+            self._start_stream("application/x-ndjson")
+            for token in tokens:
+                self._write_chunk((json.dumps(message(token, False)) + "\n").encode())
+            self._write_chunk((json.dumps(message("", True)) + "\n").encode())
+            self._end_stream()
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Hedged/cancelled requests hang up mid-response all the time; that is expected here
+        pass
+
+
+def serve(port, answer="Stub answer from the local LLM server.", delay_ms=0, fail_rate=0.0, token_delay_ms=0, host="127.0.0.1"):
+    """
+    Builds a stub server without starting it: run server.serve_forever() (e.g. in a thread)
+    and server.shutdown() to stop it.
+    """
+    return StubServer((host, port), make_handler(answer, delay_ms, fail_rate, token_delay_ms))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Groq/Gemini/Ollama server for failover tests")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--answer", default="Stub answer from the local LLM server.")
+    parser.add_argument("--delay-ms", type=float, default=0, help="Delay before responding")
+    parser.add_argument("--token-delay-ms", type=float, default=0, help="Delay between streamed tokens")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with HTTP 503")
+    args = parser.parse_args()
+    server = serve(args.port, args.answer, args.delay_ms, args.fail_rate, args.token_delay_ms)
+    print(f"Stub LLM server on http://127.0.0.1:{args.port} (delay {args.delay_ms} ms, fail rate {args.fail_rate})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# export_chroma_vectors.py
+#
+# Exports every chunk vector, text and metadata from the Chroma index into the contiguous
+# memory-mapped format of src/native_store.py (one .npy segment + .json sidecar), optionally with
+# an int8/float16 quantized copy for the search scan:
+#
+#   python export_chroma_vectors.py --quantization int8
+#
+# Worker processes then open the export read-only and share it through the page cache:
+#
+#   NumpyVectorStore.load(embed_model, "outputs/numpy_vectors", quantization="int8")
+
+import argparse
+import time
+from src.native_store import NumpyVectorStore, QUANTIZATIONS
+from src.vectorstore import load_chroma_vectorstore
+from src.logger import get_logger
+
+logger = get_logger()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export Chroma vectors to a memory-mapped (optionally quantized) store")
+    parser.add_argument("--chroma-dir", default="outputs/chroma_semantic_allpdfs_v2")
+    parser.add_argument("--output-dir", default="outputs/numpy_vectors")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default=None)
+    parser.add_argument("--page-size", type=int, default=5000)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    chroma = load_chroma_vectorstore(None, persist_directory=args.chroma_dir)
+    store = NumpyVectorStore(None, args.output_dir, autosave=False, quantization=args.quantization)
+
+    # Page through the collection in bulk instead of row by row
+    offset = 0
+    while True:
+        page = chroma._collection.get(
+            include=["embeddings", "documents", "metadatas"], limit=args.page_size, offset=offset
+        )
+        if not page["ids"]:
+            break
+        store.upsert_embeddings(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+        offset += len(page["ids"])
+        logger.info(f"Exported {offset} vectors ...")
+    store.save()
+
+    start = time.perf_counter()
+    reopened = NumpyVectorStore.load(None, args.output_dir, quantization=args.quantization)
+    load_seconds = time.perf_counter() - start
+    full_bytes = reopened.count() * reopened.dim * 4
+    scanned_bytes = reopened.memory_footprint()
+    print(f"Exported {reopened.count()} vectors to '{args.output_dir}'.")
+    print(f"Reload time: {load_seconds * 1000:.1f} ms")
+    print(f"Full-precision matrix: {full_bytes / 1e6:.2f} MB; scanned per query: {scanned_bytes / 1e6:.2f} MB "
+          f"({full_bytes / max(1, scanned_bytes):.1f}x smaller)")
+
+if __name__ == "__main__":
+    main()
@@ -14,32 +14,56 @@
 
 # main.py
 
+import argparse
+from src.config import COURSE_MAP_FILE
 from src.pipeline import run_rag_pipeline
 from src.postprocess import spacy_polish
+from src.tracing import start_trace
 from src.logger import get_logger
 
 logger = get_logger()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Educational RAG question answering")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Worker processes for PDF parsing/cleaning during ingestion (default: 1, serial)"
+    )
+    parser.add_argument(
+        "--course", action="append", default=None,
+        help="Only index and search this course's documents (see data/courses.json); repeatable"
+    )
+    return parser.parse_args()
+
 def main():
-    # List your PDF files here (relative path from project root)
+    args = parse_args()
+
+    # List your documents here (PDF, DOCX or TXT; relative path from project root)
     pdf_files = [
         "data/[01] Introduction.pdf"  # <-- Replace with your actual PDF filename(s)
     ]
 
     logger.info("Starting RAG pipeline setup...")
-    semantic_rag_chain = run_rag_pipeline(pdf_files, llm_backend="groq")
+    # With --course, documents are indexed per course and only the chosen courses are searched
+    course_options = {"course_map": COURSE_MAP_FILE, "courses": args.course} if args.course else {}
+    semantic_rag_chain = run_rag_pipeline(pdf_files, llm_backend="groq", workers=args.workers, **course_options)
 
     # Ask your question here:
     question = "In the context of the Turing test, what was Alan Turing's primary argument for using language as the basis for determining machine intelligence, and what did he aim to avoid?"
     logger.info(f"User question: {question}")
 
-    # Run the RAG chain
-    raw_answer = semantic_rag_chain.invoke(question)
-    logger.info(f"Raw LLM answer: {raw_answer}")
+    # One trace per question: retrieval, prompt, LLM call and polishing are timed together
+    with start_trace(question):
+        # Run the RAG chain
+        raw_answer = semantic_rag_chain.invoke(question)
+        logger.info(f"Raw LLM answer: {raw_answer}")
+
+        # Polish the answer for clean formatting
+        polished_answer = spacy_polish(raw_answer)
+        logger.info(f"Polished answer: {polished_answer}")
 
-    # Polish the answer for clean formatting
-    polished_answer = spacy_polish(raw_answer)
-    logger.info(f"Polished answer: {polished_answer}")
+    if hasattr(semantic_rag_chain, "stats"):
+        logger.info(f"Answer cache stats: {semantic_rag_chain.stats()}")
 
     print("\n===== FINAL ANSWER =====\n")
     print(polished_answer)
@@ -0,0 +1,44 @@
+# src/async_http.py
+
+import asyncio
+import threading
+import weakref
+import httpx
+
+
+class LoopBoundAsyncClient(httpx.AsyncClient):
+    """
+    httpx.AsyncClient that sends each request through a pooled client of the running
+    event loop. An AsyncClient's connections belong to the loop that opened them, so a
+    single shared one breaks on the next asyncio.run(); SDKs that take one client
+    object (and check it is an AsyncClient) get this instead.
+    """
+
+    def __init__(self, **client_kwargs):
+        super().__init__(**client_kwargs)
+        self._client_kwargs = client_kwargs
+        self._loop_clients = weakref.WeakKeyDictionary()
+        self._loop_clients_lock = threading.Lock()
+
+    def for_running_loop(self):
+        """
+        Returns the running loop's client, creating it on first use; it is dropped with the loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._loop_clients_lock:
+            client = self._loop_clients.get(loop)
+            if client is None:
+                client = self._loop_clients[loop] = httpx.AsyncClient(**self._client_kwargs)
+        return client
+
+    async def send(self, request, **kwargs):
+        return await self.for_running_loop().send(request, **kwargs)
+
+    async def aclose(self):
+        """
+        Closes the running loop's client only; clients of other loops stay usable.
+        """
+        with self._loop_clients_lock:
+            client = self._loop_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
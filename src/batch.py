@@ -0,0 +1,190 @@
+# src/batch.py
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from src.chain import get_answer_chain, format_docs
+from src.embeddings import embed_queries
+from src.prompts import get_rag_prompt
+from src.tracing import span, start_trace
+from src.vectorstore import batch_similarity_search
+from src.logger import get_logger
+
+logger = get_logger()
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: at most `rate` acquisitions per second,
+    with bursts of up to `burst`. A rate of None disables limiting.
+    """
+
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def read_questions(path):
+    """
+    Reads a JSONL file of questions. Each line is {"id": ..., "question": ...};
+    lines without an id get their 1-based line number.
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            questions.append({"id": str(record.get("id", line_no)), "question": record["question"]})
+    return questions
+
+
+def load_completed_ids(output_path):
+    """
+    Ids already answered successfully in a previous (possibly interrupted) run.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line
+                continue
+            if not record.get("error"):
+                done.add(str(record["id"]))
+    return done
+
+
+def drop_partial_last_line(output_path):
+    """
+    Truncates an unterminated last line (left by a crash mid-write), so records appended
+    on resume start on a line of their own instead of being glued to the broken one.
+    """
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        position = end
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        logger.warning(f"Dropping a truncated last line from '{output_path}'.")
+        f.truncate(position)
+
+
+def run_batch_qa(
+    questions,
+    embed_model,
+    vectorstore,
+    chat_model,
+    output_path,
+    k=5,
+    concurrency=4,
+    requests_per_second=None,
+    slab_size=64,
+    context_packer=None,
+    retriever=None,
+):
+    """
+    Answers many questions:
+        - Skips ids already in output_path (resume after a crash)
+        - Embeds each slab of queries in one batched call and retrieves in bulk (dense top-k
+          on vectorstore), or, with a retriever (e.g. get_pipeline_retriever's hybrid,
+          reranking or partitioned one), retrieves the slab with retriever.batch(), whose
+          concurrent query embeddings the batching executor groups into micro-batches;
+          k is then the retriever's own
+        - Sends LLM requests concurrently (at most `concurrency` in flight,
+          at most `requests_per_second` started per second)
+        - Appends one JSON line per answer as soon as it completes
+    With a context_packer, each prompt's context is packed into its token budget
+    and the estimated prompt tokens are written with the answer.
+    Returns a summary dict.
+    """
+    done = load_completed_ids(output_path)
+    pending = [q for q in questions if q["id"] not in done]
+    logger.info(f"Batch QA: {len(pending)} questions to answer, {len(questions) - len(pending)} already done.")
+
+    answer_chain = get_answer_chain(chat_model)
+    prompt = get_rag_prompt()
+    limiter = RateLimiter(requests_per_second, burst=concurrency)
+    write_lock = threading.Lock()
+    summary = {"answered": 0, "failed": 0, "skipped": len(questions) - len(pending)}
+    start = time.perf_counter()
+
+    def answer(item, docs):
+        limiter.acquire()
+        t0 = time.perf_counter()
+        record = {"id": item["id"], "question": item["question"]}
+        with start_trace(item["question"], query_id=item["id"]) as trace:
+            with span("prompt.pack"):
+                if context_packer is not None:
+                    prompt_input, report = context_packer.pack_for_prompt(docs, item["question"], prompt)
+                    record["prompt_tokens"] = report["prompt_tokens"]
+                else:
+                    prompt_input = {"context": format_docs(docs), "question": item["question"]}
+            try:
+                record["answer"] = answer_chain.invoke(prompt_input, trace.config())
+            except Exception as e:
+                logger.warning(f"Question {item['id']} failed: {e}")
+                record["error"] = str(e)
+        record["sources"] = [doc.metadata.get("source_pdf") for doc in docs]
+        record["latency_s"] = round(time.perf_counter() - t0, 4)
+        return record
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    drop_partial_last_line(output_path)
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for slab_start in range(0, len(pending), slab_size):
+            slab = pending[slab_start:slab_start + slab_size]
+            slab_questions = [item["question"] for item in slab]
+            if retriever is not None:
+                docs_per_question = retriever.batch(slab_questions, config={"max_concurrency": concurrency})
+            else:
+                vectors = embed_queries(embed_model, slab_questions)
+                docs_per_question = batch_similarity_search(vectorstore, vectors, k=k)
+
+            futures = [pool.submit(answer, item, docs) for item, docs in zip(slab, docs_per_question)]
+            for future in as_completed(futures):
+                record = future.result()
+                with write_lock:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                summary["failed" if "error" in record else "answered"] += 1
+            logger.info(f"Batch QA progress: {slab_start + len(slab)}/{len(pending)}")
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(f"Batch QA finished: {summary}")
+    return summary
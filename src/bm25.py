@@ -0,0 +1,175 @@
+# src/bm25.py
+
+import heapq
+import json
+import math
+import os
+import re
+from src.native_store import matches_filter
+from src.logger import get_logger
+
+logger = get_logger()
+
+# Words plus single regex/operator symbols, so queries like "a*b" or "x|y" can match exactly
+TOKEN_RE = re.compile(r"\w+|[*+?|^$\\\[\]{}]")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from had has have in is it of on or so that the this to was were which with what
+""".split())
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index over chunk texts, persisted as JSON next to the Chroma files.
+        - postings: term → {chunk_id: term frequency}
+        - docs: chunk_id → {'text', 'metadata', 'length'}
+    Chunks are added and removed by the same ids the vectorstore uses, so both
+    indexes stay in step during incremental ingestion.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.docs = {}
+        self.total_length = 0
+        self.index_version = None
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, ids, texts, metadatas=None):
+        metadatas = metadatas or [{}] * len(ids)
+        self.remove([chunk_id for chunk_id in ids if chunk_id in self.docs])
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            tokens = tokenize(text)
+            self.docs[chunk_id] = {"text": text, "metadata": metadata, "length": len(tokens)}
+            self.total_length += len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                self.postings.setdefault(token, {})[chunk_id] = tf
+
+    def remove(self, ids):
+        for chunk_id in ids:
+            doc = self.docs.pop(chunk_id, None)
+            if doc is None:
+                continue
+            self.total_length -= doc["length"]
+            for token in set(tokenize(doc["text"])):
+                posting = self.postings.get(token)
+                if posting is not None:
+                    posting.pop(chunk_id, None)
+                    if not posting:
+                        del self.postings[token]
+
+    def search(self, query, k=5, search_filter=None):
+        """
+        Returns up to k (chunk_id, score) pairs, best first.
+        With search_filter (Chroma-style `where` on chunk metadata), only matching chunks are
+        scored, so the top k are the best matching ones without over-fetching.
+        """
+        n_docs = len(self.docs)
+        if not n_docs:
+            return []
+        avg_length = self.total_length / n_docs
+        scores = {}
+        allowed = {}
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for chunk_id, tf in posting.items():
+                if search_filter:
+                    if chunk_id not in allowed:
+                        allowed[chunk_id] = matches_filter(self.docs[chunk_id]["metadata"] or {}, search_filter)
+                    if not allowed[chunk_id]:
+                        continue
+                length_norm = self.k1 * (1 - self.b + self.b * self.docs[chunk_id]["length"] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + length_norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path, index_version=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.index_version = index_version
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "index_version": index_version,
+            "total_length": self.total_length,
+            "docs": self.docs,
+            "postings": self.postings,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a saved index, postings included.
+        Returns an empty index if the file is missing or unreadable.
+        """
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not read BM25 index at '{path}': {e}")
+            return cls()
+        index = cls(k1=data.get("k1", 1.5), b=data.get("b", 0.75))
+        index.docs = data["docs"]
+        index.postings = data["postings"]
+        index.total_length = data["total_length"]
+        index.index_version = data.get("index_version")
+        logger.info(f"Loaded BM25 index with {len(index)} chunks.")
+        return index
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, page_size=1000):
+        """
+        Rebuilds the keyword index from the texts already stored in Chroma.
+        """
+        index = cls()
+        offset = 0
+        while True:
+            page = vectorstore.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            index.add(page["ids"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+        logger.info(f"Rebuilt BM25 index from vectorstore ({len(index)} chunks).")
+        return index
+
+
+class PartitionedKeywordIndex:
+    """
+    Read-only view over BM25Index partitions ({course: index}) with the search/docs interface
+    of BM25Index. Like PartitionedRetriever, only the partitions a search filter allows are
+    searched (see split_course_filter); each on its own statistics, hits merged by score.
+    """
+
+    def __init__(self, partitions):
+        from collections import ChainMap
+
+        self.partitions = {course: index for course, index in partitions.items() if index is not None}
+        self.docs = ChainMap(*(index.docs for index in self.partitions.values()))
+
+    def __len__(self):
+        return sum(len(index) for index in self.partitions.values())
+
+    def search(self, query, k=5, search_filter=None):
+        from src.retriever import split_course_filter
+
+        courses, rest = split_course_filter(search_filter, self.partitions)
+        hits = [hit for course in courses for hit in self.partitions[course].search(query, k=k, search_filter=rest)]
+        return heapq.nlargest(k, hits, key=lambda item: item[1])
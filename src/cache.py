@@ -0,0 +1,400 @@
+# src/cache.py
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from src.tracing import span
+from src.logger import get_logger
+
+logger = get_logger()
+
+# Answer caches with writes not yet flushed to disk; saved once more at interpreter exit
+_open_answer_caches = weakref.WeakSet()
+
+
+@atexit.register
+def _save_open_answer_caches():
+    for cache in list(_open_answer_caches):
+        try:
+            cache.save()
+        except Exception as e:
+            logger.warning(f"Could not save answer cache '{cache.path}': {e}")
+
+
+def normalize_question(text):
+    """
+    Lowercases, collapses whitespace and drops trailing ?!. so trivially different
+    spellings of a question share one exact-match key. Symbols inside the question are
+    kept: "What is C++?" and "What is C#?" must not share an answer.
+    """
+    text = re.sub(r"\s+", " ", text.lower()).strip()
+    return text.rstrip("?!. ")
+
+
+class LRUCache:
+    """
+    Thread-safe bounded mapping with least-recently-used eviction and an optional TTL.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, created_at):
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            created_at, value = item
+            if self._expired(created_at):
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value, created_at=None):
+        """
+        Stores value under key and returns the keys evicted to make room.
+        """
+        evicted = []
+        with self._lock:
+            self._data[key] = (created_at or time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                evicted.append(self._data.popitem(last=False)[0])
+        return evicted
+
+    def items(self):
+        """
+        Returns (key, created_at, value) for live entries, oldest first.
+        """
+        with self._lock:
+            for key in [k for k, (created_at, _) in self._data.items() if self._expired(created_at)]:
+                del self._data[key]
+            return [(key, created_at, value) for key, (created_at, value) in self._data.items()]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed on the question:
+        1. Exact match on the normalized question text
+        2. Otherwise, nearest past question by embedding cosine similarity,
+           accepted only above similarity_threshold
+    Entries belong to a namespace (index version + answer settings); a different
+    namespace on load discards everything, so answers never outlive the index they came from.
+    Persisted to `<path>.sqlite3`, one row per entry (question, answer and vector together),
+    so a write costs one row whatever the cache size and processes can share the file.
+    New entries are written in batches, at most every flush_seconds (and by save()).
+    """
+
+    def __init__(
+        self,
+        embed_model,
+        namespace,
+        path="outputs/cache/answer_cache",
+        similarity_threshold=0.95,
+        max_entries=1000,
+        ttl_seconds=7 * 24 * 3600,
+        flush_seconds=1.0,
+    ):
+        import sqlite3
+
+        self.embed_model = embed_model
+        self.namespace = namespace
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.flush_seconds = flush_seconds
+        self.entries = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.metrics = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._matrix = None
+        self._matrix_keys = []
+        self._pending = {}
+        self._evicted = set()
+        self._last_flush = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path + ".sqlite3", check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, namespace TEXT NOT NULL, created_at REAL NOT NULL,"
+            " question TEXT NOT NULL, answer TEXT NOT NULL, vector BLOB NOT NULL);"
+        )
+        self._conn.commit()
+        self.load()
+        _open_answer_caches.add(self)
+
+    def _question_vector(self, question):
+        import numpy as np
+
+        vector = np.asarray(self.embed_model.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _similarity_matrix(self):
+        import numpy as np
+
+        # Rebuilt lazily after writes; lookups between writes reuse it
+        if self._matrix is None:
+            items = self.entries.items()
+            self._matrix_keys = [key for key, _, _ in items]
+            self._matrix = np.stack([value["vector"] for _, _, value in items]) if items else None
+        return self._matrix, self._matrix_keys
+
+    def lookup(self, question):
+        """
+        Returns (answer, vector). answer is None on a miss; vector (or None on
+        an exact hit) can be passed to store() to avoid embedding twice.
+        """
+        key = normalize_question(question)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.metrics["exact_hits"] += 1
+            logger.info("Answer cache: exact hit.")
+            return entry["answer"], None
+
+        vector = self._question_vector(question)
+        with self._lock:
+            matrix, keys = self._similarity_matrix()
+        if matrix is not None:
+            scores = matrix @ vector
+            best = int(scores.argmax())
+            if scores[best] >= self.similarity_threshold:
+                entry = self.entries.get(keys[best])
+                if entry is not None:
+                    self.metrics["semantic_hits"] += 1
+                    logger.info(f"Answer cache: semantic hit (similarity {scores[best]:.3f}).")
+                    return entry["answer"], vector
+
+        self.metrics["misses"] += 1
+        return None, vector
+
+    def store(self, question, answer, vector=None):
+        if vector is None:
+            vector = self._question_vector(question)
+        key = normalize_question(question)
+        created_at = time.time()
+        evicted = self.entries.put(key, {"question": question, "answer": answer, "vector": vector}, created_at=created_at)
+        with self._lock:
+            self._matrix = None
+            self._pending[key] = (created_at, question, answer, vector)
+            for old_key in evicted:
+                self._pending.pop(old_key, None)
+                self._evicted.add(old_key)
+            due = time.time() - self._last_flush >= self.flush_seconds
+        if due:
+            self.save()
+
+    def stats(self):
+        total = sum(self.metrics.values())
+        hits = self.metrics["exact_hits"] + self.metrics["semantic_hits"]
+        return {**self.metrics, "entries": len(self.entries), "hit_rate": round(hits / total, 3) if total else 0.0}
+
+    def save(self):
+        """
+        Writes the entries stored since the last save (and drops evicted ones) in one transaction.
+        """
+        import numpy as np
+
+        with self._save_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                evicted, self._evicted = self._evicted, set()
+                self._last_flush = time.time()
+            if not pending and not evicted:
+                return
+            rows = [
+                (key, self.namespace, created_at, question, answer, np.asarray(vector, dtype=np.float32).tobytes())
+                for key, (created_at, question, answer, vector) in pending.items()
+            ]
+            with self._conn:
+                self._conn.executemany("DELETE FROM answers WHERE key = ?;", [(key,) for key in evicted])
+                self._conn.executemany("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?);", rows)
+
+    def load(self):
+        import numpy as np
+
+        try:
+            with self._conn:
+                stale = self._conn.execute("DELETE FROM answers WHERE namespace != ?;", (self.namespace,)).rowcount
+            rows = self._conn.execute(
+                "SELECT key, created_at, question, answer, vector FROM answers WHERE namespace = ? ORDER BY created_at;",
+                (self.namespace,),
+            ).fetchall()
+        except Exception as e:
+            logger.warning(f"Could not load answer cache from '{self.path}': {e}")
+            return
+        if stale:
+            logger.info("Answer cache belongs to a different index version; dropped its entries.")
+        for key, created_at, question, answer, vector in rows:
+            self.entries.put(
+                key,
+                {"question": question, "answer": answer, "vector": np.frombuffer(vector, dtype=np.float32).copy()},
+                created_at=created_at,
+            )
+        if rows:
+            logger.info(f"Loaded {len(self.entries)} cached answers.")
+
+    def close(self):
+        self.save()
+        _open_answer_caches.discard(self)
+        with self._save_lock:
+            self._conn.close()
+
+
+class CachedRagChain:
+    """
+    Wraps a RAG chain with a SemanticAnswerCache per filter scope.
+    cache_factory(scope) opens the cache of one scope ("" for unfiltered questions, else the
+    JSON of the per-call search_filter in the config), so answers found under one course
+    filter are never served under another. Cache misses go through the wrapped chain unchanged.
+    """
+
+    def __init__(self, chain, cache_factory):
+        self.chain = chain
+        self.cache_factory = cache_factory
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def _cache(self, config):
+        from src.retriever import config_search_filter
+
+        search_filter = config_search_filter(config)
+        scope = json.dumps(search_filter, sort_keys=True) if search_filter else ""
+        cache = self.caches.get(scope)
+        if cache is None:
+            with self._lock:
+                cache = self.caches.get(scope)
+                if cache is None:
+                    cache = self.caches[scope] = self.cache_factory(scope)
+        return cache
+
+    def _lookup(self, cache, question):
+        with span("cache_lookup"):
+            return cache.lookup(question)
+
+    def invoke(self, question, config=None, **kwargs):
+        cache = self._cache(config)
+        answer, vector = self._lookup(cache, question)
+        if answer is not None:
+            return answer
+        answer = self.chain.invoke(question, config, **kwargs)
+        cache.store(question, answer, vector=vector)
+        return answer
+
+    def stream(self, question, config=None, **kwargs):
+        """
+        Streams answer tokens. A cache hit is yielded in one piece; a miss streams
+        from the wrapped chain and is cached only once the stream completes.
+        """
+        cache = self._cache(config)
+        answer, vector = self._lookup(cache, question)
+        if answer is not None:
+            yield answer
+            return
+        parts = []
+        for token in self.chain.stream(question, config, **kwargs):
+            parts.append(token)
+            yield token
+        cache.store(question, "".join(parts), vector=vector)
+
+    async def ainvoke(self, question, config=None, **kwargs):
+        import asyncio
+
+        # Opening a cache and lookups embed/read files; keep that off the event loop
+        cache = await asyncio.to_thread(self._cache, config)
+        answer, vector = await asyncio.to_thread(self._lookup, cache, question)
+        if answer is not None:
+            return answer
+        answer = await self.chain.ainvoke(question, config, **kwargs)
+        await asyncio.to_thread(cache.store, question, answer, vector)
+        return answer
+
+    async def astream(self, question, config=None, **kwargs):
+        import asyncio
+
+        cache = await asyncio.to_thread(self._cache, config)
+        answer, vector = await asyncio.to_thread(self._lookup, cache, question)
+        if answer is not None:
+            yield answer
+            return
+        parts = []
+        async for token in self.chain.astream(question, config, **kwargs):
+            parts.append(token)
+            yield token
+        await asyncio.to_thread(cache.store, question, "".join(parts), vector)
+
+    def stats(self):
+        """
+        Hit/miss counts summed over every scope opened so far.
+        """
+        caches = list(self.caches.values())
+        if len(caches) == 1:
+            return caches[0].stats()
+        totals = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "entries": 0}
+        for cache in caches:
+            for name, value in cache.stats().items():
+                if name in totals:
+                    totals[name] += value
+        lookups = totals["exact_hits"] + totals["semantic_hits"] + totals["misses"]
+        hits = totals["exact_hits"] + totals["semantic_hits"]
+        return {**totals, "hit_rate": round(hits / lookups, 3) if lookups else 0.0, "scopes": len(caches)}
+
+
+class SQLiteCache:
+    """
+    Small persistent key → JSON value store, safe to share between threads and processes.
+    Used as the on-disk tier under the in-process LRU caches.
+    """
+
+    def __init__(self, path, ttl_seconds=None):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL);"
+        )
+        self._conn.commit()
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?;", (key,)).fetchone()
+        if row is None:
+            return default
+        if self.ttl_seconds is not None and time.time() - row[1] > self.ttl_seconds:
+            return default
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?);",
+                (key, json.dumps(value), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,20 +1,51 @@
 # src/chain.py
 
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from src.prompts import get_rag_prompt
 from src.logger import get_logger
 
 logger = get_logger()
 
-def get_semantic_rag_chain(retriever, chat_model):
+def get_semantic_rag_chain(retriever, chat_model, context_packer=None):
+    """
+    Question → retriever → prompt → LLM → string.
+    With a context_packer (src/context.py), retrieved chunks are deduplicated and packed
+    into a token budget, and each query's prompt token count is recorded.
+    """
     rag_prompt = get_rag_prompt()
     logger.info("Building semantic RAG chain...")
-    chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | rag_prompt
-        | chat_model
-        | StrOutputParser()
-    )
+    if context_packer is None:
+        chain = (
+            {"context": retriever, "question": RunnablePassthrough()}
+            | rag_prompt
+            | chat_model
+            | StrOutputParser()
+        )
+    else:
+        def pack_prompt(inputs):
+            prompt_input, _ = context_packer.pack_for_prompt(inputs["docs"], inputs["question"], rag_prompt)
+            return prompt_input
+
+        chain = (
+            {"docs": retriever, "question": RunnablePassthrough()}
+            | RunnableLambda(pack_prompt)
+            | rag_prompt
+            | chat_model
+            | StrOutputParser()
+        )
     logger.info("Semantic RAG chain built.")
     return chain
+
+def format_docs(docs):
+    """
+    Joins retrieved chunk texts into a single context string.
+    """
+    return "\n\n".join(doc.page_content for doc in docs)
+
+def get_answer_chain(chat_model):
+    """
+    Prompt → LLM → string, for callers that retrieve context themselves.
+    Expects {"context": str, "question": str}.
+    """
+    return get_rag_prompt() | chat_model | StrOutputParser()
@@ -1,15 +1,31 @@
 # src/chunkers.py
 
-from langchain_experimental.text_splitter import SemanticChunker
-from src.utils import final_clean_text
+import itertools
+import os
+import re
+import time
+from langchain_core.documents import Document
+from src.loaders import load_document
+from src.cleaning import clean_texts, strip_page_furniture
+from src.metrics import StageTimer
 from src.logger import get_logger
 
 logger = get_logger()
 
+# Bump whenever the metadata stored with each chunk changes, so older indexes are rebuilt
+METADATA_VERSION = 1
+
+def chunk_metadata(filename, meta, extra=None):
+    """
+    Metadata of one chunk: source_pdf (the file path, whatever its format), document
+    (its file name), page and, for DOCX, section, plus any index-wide fields (e.g. course).
+    """
+    return {"source_pdf": filename, "document": os.path.basename(filename), **(extra or {}), **meta}
+
 def run_semantic_chunking(pdf_files, pre_chunker, embed_model):
     """
-    For each PDF:
-        - Loads the PDF (expects loader already set up in pipeline)
+    For each document:
+        - Loads its pages/sections through the loader registry (src/loaders.py)
         - Pre-chunks each doc (page)
         - Semantic chunks pre-chunks
         - Adds source metadata
@@ -18,18 +34,16 @@ def run_semantic_chunking(pdf_files, pre_chunker, embed_model):
     """
     all_semantic_chunks = []
 
-    from langchain.document_loaders import PyPDFLoader
+    from langchain_experimental.text_splitter import SemanticChunker
 
     semantic_chunker = SemanticChunker(embed_model, breakpoint_threshold_type="percentile")
 
     for filename in pdf_files:
         logger.info(f"🔵 Pre-chunking: {filename}")
-        loader = PyPDFLoader(filename)
-        docs = loader.load()
         docs_prechunked = []
-        for doc in docs:
+        for record in strip_page_furniture(load_document(filename)):
             # Pre-chunk using the provided pre_chunker (e.g., RecursiveCharacterTextSplitter)
-            docs_prechunked.extend(pre_chunker.create_documents([doc.page_content]))
+            docs_prechunked.extend(pre_chunker.create_documents([record["text"]]))
         logger.info(f"...{len(docs_prechunked)} pre-chunks created.")
 
         logger.info(f"Semantic chunking: {filename}")
@@ -37,8 +51,7 @@ def run_semantic_chunking(pdf_files, pre_chunker, embed_model):
 
         # Add metadata to each chunk
         for chunk in chunks:
-            chunk.metadata = getattr(chunk, 'metadata', {})
-            chunk.metadata["source_pdf"] = filename
+            chunk.metadata = chunk_metadata(filename, getattr(chunk, 'metadata', {}))
 
         logger.info(f"...{len(chunks)} semantic chunks created for {filename}")
         all_semantic_chunks.extend(chunks)
@@ -46,7 +59,631 @@ def run_semantic_chunking(pdf_files, pre_chunker, embed_model):
     logger.info(f"Total semantic chunks across all PDFs: {len(all_semantic_chunks)}")
 
     # Final clean-up (remove artifacts from all semantic chunks)
-    for chunk in all_semantic_chunks:
-        chunk.page_content = final_clean_text(chunk.page_content)
+    cleaned = clean_texts([chunk.page_content for chunk in all_semantic_chunks])
+    for chunk, text in zip(all_semantic_chunks, cleaned):
+        chunk.page_content = text
 
     return all_semantic_chunks
+
+
+def _pool_vectors(vectors):
+    """
+    Mean-pools sentence vectors and L2-normalizes the result.
+    """
+    import numpy as np
+
+    pooled = np.mean(np.asarray(vectors, dtype=np.float32), axis=0)
+    norm = np.linalg.norm(pooled)
+    if norm > 0:
+        pooled = pooled / norm
+    return pooled.tolist()
+
+
+def _breakpoint_threshold(semantic_chunker, distances):
+    # SemanticChunker's own (private) threshold helpers, so splits match split_text exactly;
+    # langchain_experimental is pinned and tests/test_chunkers.py checks the parity
+    if semantic_chunker.number_of_chunks is not None:
+        return semantic_chunker._threshold_from_clusters(distances), distances
+    return semantic_chunker._calculate_breakpoint_threshold(distances)
+
+
+def semantic_split_with_vectors(semantic_chunker, texts):
+    """
+    Splits texts exactly like SemanticChunker.split_text, but:
+        - Embeds the combined sentences of all texts in one embed_documents call
+        - Keeps those embeddings and mean-pools them into one vector per chunk
+    Returns a list of (chunk_text, vector) in input order.
+    vector is None for texts too short for breakpoint detection (nothing was embedded).
+    """
+    return [pair for per_text in _semantic_split_grouped(semantic_chunker, texts) for pair in per_text]
+
+
+def _semantic_split_grouped(semantic_chunker, texts, timer=None, stats=None):
+    """
+    Like semantic_split_with_vectors, but returns one list of (chunk_text, vector) per input text.
+    With a timer, the embedding call is recorded as the "embed" stage; with stats (ChunkStats),
+    chunk boundaries and embedding counts are added to it.
+    """
+    from langchain_experimental.text_splitter import combine_sentences, calculate_cosine_distances
+
+    split_texts = []
+    to_embed = []
+    for text in texts:
+        single_sentences = re.split(semantic_chunker.sentence_split_regex, text)
+        if stats is not None:
+            stats.texts += 1
+            stats.sentences += len(single_sentences)
+        too_short = len(single_sentences) == 1 or (
+            semantic_chunker.breakpoint_threshold_type == "gradient" and len(single_sentences) == 2
+        )
+        if too_short:
+            split_texts.append((single_sentences, None))
+            continue
+        sentences = combine_sentences(
+            [{"sentence": x, "index": i} for i, x in enumerate(single_sentences)],
+            semantic_chunker.buffer_size,
+        )
+        split_texts.append((single_sentences, sentences))
+        to_embed.extend(s["combined_sentence"] for s in sentences)
+
+    embeddings = []
+    if to_embed:
+        with (timer or StageTimer()).stage("embed"):
+            embeddings = semantic_chunker.embeddings.embed_documents(to_embed)
+        if stats is not None:
+            stats.breakpoint_embeds += len(to_embed)
+
+    grouped = []
+    offset = 0
+    for single_sentences, sentences in split_texts:
+        results = []
+        grouped.append(results)
+        if sentences is None:
+            results.extend((s, None) for s in single_sentences)
+            if stats is not None:
+                stats.add_chunks(single_sentences, ["prechunk"] * len(single_sentences))
+            continue
+        if stats is not None:
+            stats.texts_searched += 1
+        for sentence in sentences:
+            sentence["combined_sentence_embedding"] = embeddings[offset]
+            offset += 1
+        distances, sentences = calculate_cosine_distances(sentences)
+        threshold, breakpoint_array = _breakpoint_threshold(semantic_chunker, distances)
+
+        start_index = 0
+        for index, value in enumerate(breakpoint_array):
+            if value <= threshold:
+                continue
+            group = sentences[start_index:index + 1]
+            combined_text = " ".join(d["sentence"] for d in group)
+            if semantic_chunker.min_chunk_size is not None and len(combined_text) < semantic_chunker.min_chunk_size:
+                continue
+            results.append((combined_text, _pool_vectors([d["combined_sentence_embedding"] for d in group])))
+            start_index = index + 1
+        if start_index < len(sentences):
+            group = sentences[start_index:]
+            combined_text = " ".join(d["sentence"] for d in group)
+            results.append((combined_text, _pool_vectors([d["combined_sentence_embedding"] for d in group])))
+        if stats is not None:
+            stats.add_chunks([text for text, _ in results], ["semantic"] * (len(results) - 1) + ["prechunk"])
+    return grouped
+
+
+def get_semantic_chunker(embed_model, breakpoint_percentile=95):
+    """
+    Splits where the distance between neighbouring sentences exceeds this percentile of all distances
+    (lower values give more, smaller chunks).
+    """
+    from langchain_experimental.text_splitter import SemanticChunker
+
+    return SemanticChunker(
+        embed_model, breakpoint_threshold_type="percentile", breakpoint_threshold_amount=breakpoint_percentile
+    )
+
+
+class ChunkStats:
+    """
+    Chunk-boundary statistics of an ingestion run: why each chunk ends, chunk lengths, and how
+    many texts were embedded for breakpoint detection and for chunk vectors, against the
+    number of sentences. Boundary kinds:
+        - structure: end of a heading/paragraph/page section (structured chunker)
+        - prechunk: end of a character-split pre-chunk (semantic chunker)
+        - semantic: embedding distance above the breakpoint threshold
+        - size: the chunk would otherwise exceed the maximum size
+    """
+
+    def __init__(self):
+        self.boundaries = {}
+        self.lengths = []
+        self.texts = 0
+        self.texts_searched = 0
+        self.sentences = 0
+        self.breakpoint_embeds = 0
+        self.chunk_embeds = 0
+
+    def add_chunks(self, texts, boundaries):
+        for text, boundary in zip(texts, boundaries):
+            self.lengths.append(len(text))
+            self.boundaries[boundary] = self.boundaries.get(boundary, 0) + 1
+
+    def summary(self):
+        lengths = sorted(self.lengths)
+
+        def percentile(q):
+            return lengths[min(len(lengths) - 1, int(round(q / 100 * (len(lengths) - 1))))] if lengths else 0
+
+        return {
+            "chunks": len(lengths),
+            "boundaries": dict(sorted(self.boundaries.items())),
+            "chars_p50": percentile(50),
+            "chars_p95": percentile(95),
+            "chars_max": percentile(100),
+            "texts": self.texts,
+            "texts_searched": self.texts_searched,
+            "breakpoint_search_rate": round(self.texts_searched / max(1, self.texts), 3),
+            "sentences": self.sentences,
+            "breakpoint_embeds": self.breakpoint_embeds,
+            "chunk_embeds": self.chunk_embeds,
+            "embeds_per_sentence": round((self.breakpoint_embeds + self.chunk_embeds) / max(1, self.sentences), 3),
+        }
+
+    def report(self, title="Chunk boundaries"):
+        """
+        Logs one summary line and returns the summary.
+        """
+        summary = self.summary()
+        boundaries = ", ".join(f"{kind} {n}" for kind, n in summary["boundaries"].items())
+        logger.info(
+            f"{title}: {summary['chunks']} chunks [{boundaries}], {summary['chars_p50']}/{summary['chars_p95']}/"
+            f"{summary['chars_max']} chars p50/p95/max; breakpoints searched in {summary['texts_searched']}/"
+            f"{summary['texts']} texts ({summary['breakpoint_search_rate']:.0%}); {summary['breakpoint_embeds'] + summary['chunk_embeds']} embeddings for "
+            f"{summary['sentences']} sentences ({summary['embeds_per_sentence']}/sentence)",
+            extra={"chunk_stats": summary},
+        )
+        return summary
+
+
+# Heading lines: markdown headings, "Section 1.1 ...", numbered titles ("3.3 Probabilistic ...") and ALL-CAPS lines
+HEADING_RE = re.compile(
+    r"^(?:#{1,6}\s+\S|(?:Section|SECTION|Chapter|CHAPTER|Unit|UNIT|Part|PART)\s+\d"
+    r"|\d+(?:\.\d+)*\.?\s+[A-Z]|[A-Z][A-Z0-9 ,:&()/-]{3,}$)"
+)
+BULLET_RE = re.compile(r"^(?:[\u2022\u25aa\u25cf\uf0a7\uf0b7*\-\u2013]|\(?[0-9a-z]{1,2}[.)])\s")
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.?!])\s+")
+
+
+def _blocks(text):
+    """
+    Yields (is_heading, block) for one page: heading lines, and paragraphs ending at a blank line,
+    before a heading or list item, or at a short line that ends a sentence.
+    """
+    lines = text.split("\n")
+    widths = sorted(len(line.rstrip()) for line in lines if line.strip())
+    full_width = widths[int(0.9 * (len(widths) - 1))] if widths else 0
+    paragraph = []
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            if paragraph:
+                yield False, "\n".join(paragraph)
+                paragraph = []
+            continue
+        if len(stripped) <= 80 and not stripped.endswith((",", ";")) and HEADING_RE.match(stripped):
+            if paragraph:
+                yield False, "\n".join(paragraph)
+                paragraph = []
+            yield True, line.rstrip()
+            continue
+        if paragraph and BULLET_RE.match(stripped):
+            yield False, "\n".join(paragraph)
+            paragraph = []
+        paragraph.append(line.rstrip())
+        if stripped.endswith((".", "!", "?", ":")) and len(stripped) < 0.8 * full_width:
+            yield False, "\n".join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield False, "\n".join(paragraph)
+
+
+class StructuralSplitter:
+    """
+    Structure-first pre-chunker: splits one page (or DOCX section) into sections at headings.
+    A heading always starts a new section once the current one holds min_section_size characters,
+    and stays attached to the text below it. Sections are not cut by size here: a section longer
+    than chunk_size is kept whole, so StructuredChunker places its boundaries by breakpoint search
+    (semantic first, size as the fallback) instead of by greedy paragraph packing.
+    Drop-in for RecursiveCharacterTextSplitter.split_text.
+    """
+
+    def __init__(self, chunk_size=2000, min_section_size=200):
+        self.chunk_size = chunk_size
+        self.min_section_size = min_section_size
+
+    def split_text(self, text):
+        sections, current, size, has_body = [], [], 0, False
+        for is_heading, block in _blocks(text):
+            if has_body and is_heading and size >= self.min_section_size:
+                sections.append("\n".join(current))
+                current, size, has_body = [], 0, False
+            current.append(block)
+            size += len(block) + 1
+            has_body = has_body or not is_heading
+        if current:
+            sections.append("\n".join(current))
+        return sections
+
+
+class StructuredChunker:
+    """
+    Second stage of the structure-first mode. Sections that fit max_chunk_size are chunks as they
+    are (their vectors are embedded once per chunk). Only oversized sections get breakpoint detection:
+    a window of `window` sentences slides over the section, `stride` sentences at a time (windows
+    overlap by window - stride sentences), each window is embedded, and the section is split between
+    consecutive windows whose cosine distance is above the breakpoint_percentile of the section's
+    distances, or before a sentence that would make the chunk outgrow max_chunk_size.
+    Chunk vectors of split sections are pooled from the windows inside them, so about one text in
+    `stride` sentences is embedded instead of every sentence. Oversized sections with too few
+    sentences for two windows (a long table, a block without punctuation or line breaks), and single
+    sentences longer than max_chunk_size, are split by size (RecursiveCharacterTextSplitter).
+    """
+
+    def __init__(self, embeddings, max_chunk_size=2000, window=3, breakpoint_percentile=95, stride=None):
+        self.embeddings = embeddings
+        self.max_chunk_size = max_chunk_size
+        self.window = window
+        self.stride = max(1, min(stride or window - 1, window))
+        self.breakpoint_percentile = breakpoint_percentile
+        self._size_splitter = None
+
+    def _sentences(self, text):
+        # Slides and lists often lack sentence punctuation; split such long runs at line breaks
+        sentences = []
+        for sentence in SENTENCE_SPLIT_RE.split(text):
+            if len(sentence) > self.max_chunk_size // self.window:
+                sentences.extend(sentence.split("\n"))
+            else:
+                sentences.append(sentence)
+        return [s for s in sentences if s.strip()]
+
+    def _window_starts(self, count):
+        if count < self.window:
+            return [0] if count else []
+        starts = list(range(0, count - self.window + 1, self.stride))
+        if starts[-1] + self.window < count:
+            starts.append(count - self.window)  # the last window ends at the last sentence
+        return starts
+
+    def _split_by_size(self, text):
+        if self._size_splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            self._size_splitter = RecursiveCharacterTextSplitter(chunk_size=self.max_chunk_size, chunk_overlap=0)
+        return self._size_splitter.split_text(text)
+
+    def _add_size_split(self, results, boundaries, text, vector, boundary):
+        # Chunks from a size split have no pooled vector; they are embedded on their own
+        parts = self._split_by_size(text) if len(text) > self.max_chunk_size else [text]
+        if len(parts) == 1:
+            results.append((text, vector))
+        else:
+            results.extend((part, None) for part in parts)
+        boundaries.extend(["size"] * (len(parts) - 1) + [boundary])
+
+    def split_grouped(self, texts, timer=None, stats=None):
+        """
+        Same contract as _semantic_split_grouped: one list of (chunk_text, vector or None) per text.
+        """
+        import numpy as np
+
+        stats = stats if stats is not None else ChunkStats()
+        plans, to_embed = [], []
+        for text in texts:
+            sentences = self._sentences(text)
+            stats.texts += 1
+            stats.sentences += len(sentences)
+            starts = self._window_starts(len(sentences))
+            if len(text) <= self.max_chunk_size or len(starts) < 2:
+                plans.append((text, None, None))
+                continue
+            stats.texts_searched += 1
+            plans.append((sentences, starts, len(to_embed)))
+            to_embed.extend(" ".join(sentences[i:i + self.window]) for i in starts)
+
+        embeddings = []
+        if to_embed:
+            with (timer or StageTimer()).stage("embed"):
+                embeddings = self.embeddings.embed_documents(to_embed)
+            stats.breakpoint_embeds += len(to_embed)
+
+        grouped = []
+        for item, starts, offset in plans:
+            results, boundaries = [], []
+            if starts is None:
+                self._add_size_split(results, boundaries, item, None, "structure")
+                stats.add_chunks([text for text, _ in results], boundaries)
+                grouped.append(results)
+                continue
+            sentences = item
+            vectors = np.asarray(embeddings[offset:offset + len(starts)], dtype=np.float32)
+            unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            distances = 1.0 - np.sum(unit[:-1] * unit[1:], axis=1)
+            threshold = np.percentile(distances, self.breakpoint_percentile)
+            # A breakpoint between two windows falls between the centres of the windows
+            semantic_cuts = {
+                min(max(starts[j] + (self.window + self.stride) // 2, 1), len(sentences) - 1)
+                for j in range(len(distances)) if distances[j] > threshold
+            }
+
+            pieces, cut_kinds, start, size = [], [], 0, len(sentences[0])
+            for i in range(1, len(sentences)):
+                if size + len(sentences[i]) + 1 > self.max_chunk_size:
+                    cut_kinds.append("size")
+                elif i in semantic_cuts:
+                    cut_kinds.append("semantic")
+                else:
+                    size += len(sentences[i]) + 1
+                    continue
+                pieces.append((start, i))
+                start, size = i, len(sentences[i])
+            pieces.append((start, len(sentences)))
+            cut_kinds.append("structure")
+
+            for (a, b), kind in zip(pieces, cut_kinds):
+                inside = [j for j, s in enumerate(starts) if s >= a and s + self.window <= b]
+                vector = _pool_vectors(vectors[inside]) if inside else None
+                self._add_size_split(results, boundaries, " ".join(sentences[a:b]), vector, kind)
+            stats.add_chunks([text for text, _ in results], boundaries)
+            grouped.append(results)
+        return grouped
+
+
+def split_grouped(chunker, texts, timer=None, stats=None):
+    """
+    One list of (chunk_text, vector or None) per text, from either chunker.
+    """
+    if isinstance(chunker, StructuredChunker):
+        return chunker.split_grouped(texts, timer=timer, stats=stats)
+    return _semantic_split_grouped(chunker, texts, timer=timer, stats=stats)
+
+
+def iter_prechunks(records, pre_chunker):
+    """
+    Yields (pre-chunk text, page metadata) record by record,
+    after page headers/footers are stripped.
+    """
+    for record in strip_page_furniture(records):
+        meta = {"page": record["page"]}
+        if record.get("section"):
+            meta["section"] = record["section"]
+        for text in pre_chunker.split_text(record["text"]):
+            yield text, meta
+
+
+def load_prechunks(filename, pre_chunker, cache_dir=None):
+    """
+    Loads one document (any registered format, see src/loaders.py) and pre-chunks every page.
+    Top-level and free of model state so it can run in a worker process.
+    Returns: (list of (pre-chunk text, page metadata), seconds loading, seconds pre-chunking)
+    """
+    start = time.perf_counter()
+    records = load_document(filename, cache_dir)
+    loaded = time.perf_counter()
+    prechunks = list(iter_prechunks(records, pre_chunker))
+    return prechunks, loaded - start, time.perf_counter() - loaded
+
+
+def iter_file_prechunks(pdf_files, pre_chunker, workers=1, timer=None, cache_dir=None):
+    """
+    Yields (filename, prechunks, submit_clean) for each document, in the order of pdf_files.
+    prechunks are (text, page metadata) pairs.
+        - workers <= 1: prechunks is a lazy generator over the file's pages;
+          submit_clean is None (cleaning happens inline).
+        - workers > 1: files are parsed and pre-chunked in a process pool, at most
+          `workers` files ahead; prechunks is that file's list and submit_clean
+          sends a batch of texts to the pool for cleaning and returns a Future.
+    With cache_dir, extracted page text is reused for files parsed before (see load_document).
+    """
+    timer = timer or StageTimer()
+
+    if workers <= 1:
+        for filename in pdf_files:
+            logger.info(f"🔵 Streaming pre-chunks: {filename}")
+            with timer.stage("load"):
+                records = load_document(filename, cache_dir)
+            yield filename, iter_prechunks(records, pre_chunker), None
+        return
+
+    import multiprocessing
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Workers come from a fork server, not a fork of this process: forking while the embedding
+    # executor or logging threads hold a lock can leave a worker deadlocked on it
+    methods = multiprocessing.get_all_start_methods()
+    mp_context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+    logger.info(f"Parsing {len(pdf_files)} documents with {workers} worker processes.")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        remaining = iter(pdf_files)
+        parsing = deque()
+
+        def submit_next_parse():
+            filename = next(remaining, None)
+            if filename is not None:
+                parsing.append((filename, pool.submit(load_prechunks, filename, pre_chunker, cache_dir)))
+
+        def submit_clean(texts):
+            return pool.submit(clean_texts, texts)
+
+        # Keep only `workers` files in flight so cleaning jobs don't queue behind the whole corpus
+        for _ in range(workers):
+            submit_next_parse()
+
+        while parsing:
+            filename, future = parsing.popleft()
+            with timer.stage("wait_for_workers"):
+                texts, load_seconds, prechunk_seconds = future.result()
+            submit_next_parse()
+            timer.add("load (worker)", load_seconds)
+            timer.add("prechunk (worker)", prechunk_seconds)
+            logger.info(f"🔵 {filename}: {len(texts)} pre-chunks created.")
+            yield filename, texts, submit_clean
+
+
+def iter_semantic_chunks(prechunks, semantic_chunker, group_size=16, start=0, timer=None, stats=None):
+    """
+    Yields (prechunk_index, chunk_text, vector, page metadata) while consuming
+    (text, page metadata) pre-chunks lazily.
+    Pre-chunks are split `group_size` at a time so each embedding call stays batched;
+    breakpoints are per pre-chunk, so grouping never changes the output.
+    semantic_chunker may also be a StructuredChunker; stats (ChunkStats) collects boundary statistics.
+    """
+    timer = timer or StageTimer()
+    group = []
+
+    def split_group():
+        # Sentence embedding is timed on its own ("embed"); the rest is "semantic_chunk"
+        start, embedded = time.perf_counter(), timer.seconds.get("embed", 0.0)
+        per_text = split_grouped(semantic_chunker, [text for _, text, _ in group], timer=timer, stats=stats)
+        embed_seconds = timer.seconds.get("embed", 0.0) - embedded
+        timer.add("semantic_chunk", time.perf_counter() - start - embed_seconds)
+        for (index, _, meta), pairs in zip(group, per_text):
+            for text, vector in pairs:
+                yield index, text, vector, meta
+
+    if isinstance(prechunks, list):
+        prechunk_iter = iter(prechunks[start:])
+    else:
+        # Lazy sources are always consumed from the file's first pre-chunk
+        prechunk_iter = itertools.islice(prechunks, start, None)
+
+    index = start
+    while True:
+        with timer.stage("prechunk"):
+            prechunk = next(prechunk_iter, None)
+        if prechunk is None:
+            break
+        text, meta = prechunk
+        group.append((index, text, meta))
+        index += 1
+        if len(group) >= group_size:
+            yield from split_group()
+            group = []
+    if group:
+        yield from split_group()
+
+
+def _finish_batch(filename, items, cleaned, embed_model, timer, first_chunk, resume, extra_metadata=None, stats=None):
+    """
+    Builds chunk Documents for one batch and fills in vectors that could not be pooled.
+    """
+    chunks = [
+        Document(page_content=text, metadata=chunk_metadata(filename, meta, extra_metadata))
+        for text, (_, _, meta) in zip(cleaned, items)
+    ]
+    vectors = [vector for _, vector, _ in items]
+
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        with timer.stage("embed_unpooled"):
+            fresh = embed_model.embed_documents([chunks[i].page_content for i in missing])
+        if stats is not None:
+            stats.chunk_embeds += len(missing)
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+    return {"chunks": chunks, "vectors": vectors, "first_chunk": first_chunk, "resume": resume, "pooled": len(chunks) - len(missing)}
+
+
+def iter_chunk_batches(
+    filename,
+    prechunks,
+    semantic_chunker,
+    embed_model,
+    batch_size=256,
+    timer=None,
+    start_prechunk=0,
+    start_chunk=0,
+    submit_clean=None,
+    extra_metadata=None,
+    stats=None,
+):
+    """
+    Streams one file: pre-chunks → semantic chunks → cleaned chunks, in batches of batch_size.
+    Yields dicts with:
+        - 'chunks', 'vectors': the batch (vectors pooled where possible); chunk metadata
+          as built by chunk_metadata, extra_metadata (e.g. the course) included
+        - 'first_chunk': file-level index of the batch's first chunk (for deterministic ids)
+        - 'resume': (prechunk_index, chunk_index) to restart from if everything after
+          this batch is lost; already-committed chunks of that pre-chunk are simply rewritten
+    Only one batch (plus one semantic group) is held in memory at a time.
+    If start_prechunk/start_chunk are given, earlier pre-chunks are skipped (resume).
+    With stats (ChunkStats), chunk boundaries and embedding counts are collected.
+    """
+    timer = timer or StageTimer()
+    stream = iter_semantic_chunks(prechunks, semantic_chunker, start=start_prechunk, timer=timer, stats=stats)
+
+    chunk_index = start_chunk
+    current_prechunk, current_first = None, start_chunk
+    batch = []
+    pending = None
+
+    def emit(batch, resume):
+        texts = [text for text, _, _ in batch]
+        first = chunk_index - len(batch)
+        if submit_clean is None:
+            with timer.stage("clean"):
+                cleaned = clean_texts(texts)
+            return _finish_batch(filename, batch, cleaned, embed_model, timer, first, resume, extra_metadata, stats)
+        return (batch, submit_clean(texts), first, resume)
+
+    def finish_pending(pending):
+        batch, future, first, resume = pending
+        with timer.stage("wait_for_workers"):
+            cleaned = future.result()
+        return _finish_batch(filename, batch, cleaned, embed_model, timer, first, resume, extra_metadata, stats)
+
+    for prechunk_index, text, vector, meta in stream:
+        if prechunk_index != current_prechunk:
+            current_prechunk, current_first = prechunk_index, chunk_index
+        batch.append((text, vector, meta))
+        chunk_index += 1
+        if len(batch) >= batch_size:
+            result = emit(batch, (current_prechunk, current_first))
+            batch = []
+            if submit_clean is None:
+                yield result
+                continue
+            # Finish the previous batch while this one is cleaned in the pool
+            if pending:
+                yield finish_pending(pending)
+            pending = result
+
+    if batch:
+        result = emit(batch, (current_prechunk, current_first))
+        if submit_clean is None:
+            yield result
+        else:
+            if pending:
+                yield finish_pending(pending)
+            pending = result
+    if pending:
+        yield finish_pending(pending)
+
+
+def run_semantic_chunking_with_vectors(pdf_files, pre_chunker, embed_model, workers=1, timer=None):
+    """
+    Same chunks as run_semantic_chunking, plus one vector per chunk.
+    Chunk vectors are pooled from the sentence embeddings the semantic chunker
+    already computed; only chunks with no sentence embeddings are embedded again.
+    Returns: (chunks, vectors)
+    """
+    semantic_chunker = get_semantic_chunker(embed_model)
+    all_chunks, all_vectors = [], []
+    for filename, prechunks, submit_clean in iter_file_prechunks(pdf_files, pre_chunker, workers, timer):
+        for batch in iter_chunk_batches(
+            filename, prechunks, semantic_chunker, embed_model, timer=timer, submit_clean=submit_clean
+        ):
+            all_chunks.extend(batch["chunks"])
+            all_vectors.extend(batch["vectors"])
+    logger.info(f"Total semantic chunks across all PDFs: {len(all_chunks)}")
+    return all_chunks, all_vectors
@@ -0,0 +1,90 @@
+# src/cleaning.py
+
+import re
+from collections import Counter
+
+# Bump whenever cleaning output changes, so indexes built with the old rules are rebuilt
+CLEANER_VERSION = 1
+
+# PDF glyph artifacts: ligatures, soft hyphens, Symbol-font bullets, odd spaces
+_CHAR_MAP = {
+    "\ufb00": "ff",
+    "\ufb01": "fi",
+    "\ufb02": "fl",
+    "\ufb03": "ffi",
+    "\ufb04": "ffl",
+    "\ufb05": "st",
+    "\ufb06": "st",
+    "\u00ad": "",   # soft hyphen
+    "\u200b": "",   # zero-width space
+    "\ufeff": "",   # byte order mark
+    "\uf0b7": "•",  # Symbol-font bullets
+    "\uf0a7": "•",
+    "\u00a0": " ",  # no-break space
+}
+_CHAR_RE = re.compile("[" + "".join(_CHAR_MAP) + "]")
+
+_PAGE_NUMBER_RE = re.compile(r"^(?:page\s*)?[-–]?\s*\d{1,4}\s*[-–]?(?:\s*(?:/|of)\s*\d{1,4})?$", re.IGNORECASE)
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def clean_text(text):
+    """
+    One chunk's PDF artifacts, fixed with as few passes over the text as possible:
+        - ligatures/soft hyphens/bullet glyphs (one compiled regex, rarely matching)
+        - hyphen + newline joins
+        - all whitespace runs (newlines, tabs, spaces) collapsed to one space
+    The last two are str builtins, which are several times faster than regex substitutions, and
+    faster than folding everything into one regex pass (its callback runs per whitespace run;
+    see benchmarks/bench_cleaning.py).
+    """
+    if _CHAR_RE.search(text):
+        text = _CHAR_RE.sub(lambda m: _CHAR_MAP[m.group()], text)
+    return " ".join(text.replace("-\n", "").split())
+
+
+def clean_texts(texts):
+    """
+    Batch version of clean_text (the unit of work sent to ingestion worker processes).
+    """
+    return [clean_text(text) for text in texts]
+
+
+def _edge_lines(lines, depth):
+    """
+    Indices of the first and last `depth` non-empty lines of a page.
+    """
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    return set(filled[:depth] + filled[-depth:])
+
+
+def _furniture_key(line):
+    # Running headers/footers differ only by their page number
+    return _DIGITS_RE.sub("#", " ".join(line.split())).lower()
+
+
+def strip_page_furniture(records, depth=2, min_pages=3, min_share=0.5):
+    """
+    Removes headers/footers from page records (see src/loaders.py) before chunking:
+        - page-number lines ("12", "Page 3 of 10", "- 4 -") at the top or bottom of a page
+        - lines repeated at the top/bottom of at least min_share of the pages (min_pages or more),
+          e.g. a running title or a "DRAFT" stamp
+    Returns new records; body lines are never touched.
+    """
+    pages = [record["text"].split("\n") for record in records]
+    edges = [_edge_lines(lines, depth) for lines in pages]
+
+    counts = Counter()
+    for lines, edge in zip(pages, edges):
+        counts.update({_furniture_key(lines[i]) for i in edge})
+    threshold = max(min_pages, min_share * len(pages))
+    repeated = {key for key, n in counts.items() if n >= threshold and key.strip()}
+
+    cleaned = []
+    for record, lines, edge in zip(records, pages, edges):
+        kept = [
+            line for i, line in enumerate(lines)
+            if i not in edge or not (_PAGE_NUMBER_RE.match(line.strip()) or _furniture_key(line) in repeated)
+        ]
+        cleaned.append({**record, "text": "\n".join(kept)})
+    return cleaned
@@ -5,4 +5,31 @@ load_dotenv()  # Load from .env file if present
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
\ No newline at end of file
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# Override to point the LLM clients at local stub servers (see benchmarks/stub_llm_server.py)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL") or None
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "edusage")
+
+# Backend order for llm_backend="failover": the first is preferred, the rest are hedges/fallbacks
+LLM_FAILOVER_ORDER = [b.strip() for b in os.getenv("LLM_FAILOVER_ORDER", "groq,gemini,ollama").split(",") if b.strip()]
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_HEDGE_AFTER_MS = float(os.getenv("LLM_HEDGE_AFTER_MS", "1500"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+# Per-query tracing (src/tracing.py): queries slower than this are logged as warnings,
+# and with TRACE_PROFILE_DIR set every query's span timeline is dumped there as JSON
+TRACE_SLOW_QUERY_MS = float(os.getenv("TRACE_SLOW_QUERY_MS", "5000"))
+TRACE_PROFILE_DIR = os.getenv("TRACE_PROFILE_DIR") or None
+
+# Embedding executor (src/embeddings.BatchingEmbeddings): concurrent embedding calls are grouped
+# into batches of up to EMBED_MAX_BATCH_SIZE texts, waiting at most EMBED_MAX_WAIT_MS for more,
+# and run on EMBED_WORKERS threads with EMBED_THREADS ONNX intra-op threads each (unset: all cores)
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "2"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0")) or None
+
+# Course of each document (src/courses.py): JSON {course: [file names or glob patterns]}
+COURSE_MAP_FILE = os.getenv("COURSE_MAP_FILE", "data/courses.json")
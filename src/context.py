@@ -0,0 +1,191 @@
+# src/context.py
+
+import re
+import threading
+from src.cache import normalize_question
+from src.metrics import LatencyHistogram
+from src.logger import get_logger
+
+logger = get_logger()
+
+# Context token budget per LLM backend (prompt template and question come on top)
+TOKEN_BUDGETS = {
+    "groq": 3000,
+    "gemini": 6000,
+    "ollama": 2000,
+    "fake": 3000,
+}
+DEFAULT_TOKEN_BUDGET = 3000
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    """
+    Fast local estimate of BPE/WordPiece token count: one token per word or symbol,
+    plus one per extra 6 characters of long words (which tokenizers split up).
+    """
+    return sum(1 + (len(piece) - 1) // 6 for piece in _PIECE_RE.findall(text))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Cuts text after roughly max_tokens estimated tokens, at a piece boundary.
+    """
+    used = 0
+    for match in _PIECE_RE.finditer(text):
+        used += 1 + (len(match.group()) - 1) // 6
+        if used > max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+
+def _overlap_length(previous, text, max_overlap=400, min_overlap=20):
+    """
+    Length of the longest suffix of previous that is also a prefix of text
+    (the pre-chunker's chunk_overlap), or 0 if shorter than min_overlap.
+    """
+    for size in range(min(max_overlap, len(previous), len(text)), min_overlap - 1, -1):
+        if previous.endswith(text[:size]):
+            return size
+    return 0
+
+
+def shingles(text, size=3):
+    """
+    Set of word size-grams of the lowercased text (the whole text if it has fewer words).
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class ContextPacker:
+    """
+    Turns retrieved Documents into the prompt's {context}:
+        1. Drops exact duplicates and chunks contained in another retrieved chunk
+        2. Trims text a chunk shares with the previous chunk of the same source (chunk overlap)
+        3. Drops near-duplicates: word 3-gram (shingle) Jaccard similarity ≥ near_duplicate_threshold
+           with a kept chunk. Lexical, so packing never calls the embedding model at query time
+        4. Packs chunks in retriever score order until token_budget is reached
+    Every query's token usage is logged and aggregated in stats().
+    """
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, near_duplicate_threshold=0.8, separator="\n\n"):
+        self.token_budget = token_budget
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.separator = separator
+        self._prompt_tokens = LatencyHistogram()
+        self._context_tokens = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    def _drop_near_duplicates(self, texts):
+        kept, kept_shingles = [], []
+        for i, text in enumerate(texts):
+            text_shingles = shingles(text)
+            if all(jaccard(text_shingles, other) < self.near_duplicate_threshold for other in kept_shingles):
+                kept.append(i)
+                kept_shingles.append(text_shingles)
+        return kept
+
+    def pack(self, docs, question=""):
+        """
+        Returns (context string, report dict) for docs ordered best first.
+        """
+        report = {"chunks_in": len(docs), "duplicates": 0, "near_duplicates": 0, "over_budget": 0}
+
+        # 1. Exact duplicates and contained chunks
+        texts, sources = [], []
+        seen = set()
+        for doc in docs:
+            text = doc.page_content.strip()
+            key = normalize_question(text)
+            if not text or key in seen or any(key in normalize_question(t) for t in texts):
+                report["duplicates"] += 1
+                continue
+            seen.add(key)
+            texts.append(text)
+            sources.append(doc.metadata.get("source_pdf") or doc.metadata.get("source"))
+
+        # 2. Shared chunk_overlap with an already kept chunk of the same file
+        for i in range(len(texts)):
+            for j in range(i):
+                if sources[i] is not None and sources[i] == sources[j]:
+                    overlap = _overlap_length(texts[j], texts[i])
+                    if overlap:
+                        texts[i] = texts[i][overlap:].lstrip()
+                        break
+
+        # 3. Near-duplicates by shingle overlap
+        if self.near_duplicate_threshold and len(texts) > 1:
+            kept = self._drop_near_duplicates(texts)
+            report["near_duplicates"] = len(texts) - len(kept)
+            texts = [texts[i] for i in kept]
+
+        # 4. Greedy packing in score order; later, smaller chunks may still fit
+        packed, used = [], 0
+        separator_tokens = estimate_tokens(self.separator) if self.separator.strip() else 0
+        for text in texts:
+            tokens = estimate_tokens(text) + (separator_tokens if packed else 0)
+            if used + tokens <= self.token_budget:
+                packed.append(text)
+                used += tokens
+            elif not packed:
+                # Never send an empty context: keep the best chunk, cut to the budget
+                packed.append(truncate_to_tokens(text, self.token_budget))
+                used = estimate_tokens(packed[0])
+            else:
+                report["over_budget"] += 1
+
+        context = self.separator.join(packed)
+        report["chunks_used"] = len(packed)
+        report["context_tokens"] = used
+        report["question_tokens"] = estimate_tokens(question)
+        return context, report
+
+    def pack_for_prompt(self, docs, question, prompt):
+        """
+        Packs docs and records the token usage of the full prompt they produce.
+        Returns ({"context", "question"} prompt input, report).
+        """
+        context, report = self.pack(docs, question)
+        prompt_input = {"context": context, "question": question}
+        self.record(report, estimate_tokens(prompt.format(**prompt_input)))
+        return prompt_input, report
+
+    def record(self, report, prompt_tokens):
+        report["prompt_tokens"] = prompt_tokens
+        with self._lock:
+            self._prompt_tokens.record(prompt_tokens)
+            self._context_tokens.record(report["context_tokens"])
+        logger.info(
+            f"Context: {report['chunks_used']}/{report['chunks_in']} chunks, {report['context_tokens']} context tokens, "
+            f"{prompt_tokens} prompt tokens (budget {self.token_budget}; dropped {report['duplicates']} duplicate, "
+            f"{report['near_duplicates']} near-duplicate, {report['over_budget']} over budget)"
+        )
+
+    def stats(self):
+        with self._lock:
+            prompt, context = self._prompt_tokens, self._context_tokens
+            return {
+                "queries": prompt.count,
+                "prompt_tokens_p50": prompt.percentile(50),
+                "prompt_tokens_p95": prompt.percentile(95),
+                "context_tokens_p50": context.percentile(50),
+                "context_tokens_max": context.percentile(100),
+            }
+
+
+def get_context_packer(llm_backend="groq", token_budget=None, near_duplicate_threshold=0.8):
+    """
+    Returns a ContextPacker with the backend's token budget unless one is given.
+    """
+    budget = token_budget or TOKEN_BUDGETS.get(llm_backend, DEFAULT_TOKEN_BUDGET)
+    logger.info(f"Packing context up to {budget} tokens for '{llm_backend}'.")
+    return ContextPacker(token_budget=budget, near_duplicate_threshold=near_duplicate_threshold)
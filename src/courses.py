@@ -0,0 +1,57 @@
+# src/courses.py
+
+import fnmatch
+import json
+import os
+import re
+from src.logger import get_logger
+
+logger = get_logger()
+
+# Course of documents that no course map entry matches
+DEFAULT_COURSE = "general"
+
+
+def load_course_map(course_map):
+    """
+    Returns the course map {course: [file names, paths or glob patterns]}.
+    course_map may already be a dict, or the path of a JSON file holding one
+    (a missing file gives an empty map: every document belongs to DEFAULT_COURSE).
+    """
+    if course_map is None or isinstance(course_map, dict):
+        return dict(course_map or {})
+    if not os.path.exists(course_map):
+        logger.warning(f"Course map '{course_map}' not found; all documents go to the '{DEFAULT_COURSE}' course.")
+        return {}
+    with open(course_map, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def course_of(path, course_map):
+    """
+    The first course whose entries match the document's path or file name.
+    Entries are compared literally first, so names like "[01] Introduction.pdf" need no escaping.
+    """
+    name = os.path.basename(path)
+    for course, patterns in course_map.items():
+        for pattern in patterns:
+            if pattern in (name, path) or fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(path, pattern):
+                return course
+    return DEFAULT_COURSE
+
+
+def group_by_course(pdf_files, course_map):
+    """
+    Returns {course: [documents]}, courses in sorted order.
+    """
+    groups = {}
+    for path in pdf_files:
+        groups.setdefault(course_of(path, course_map), []).append(path)
+    return {course: groups[course] for course in sorted(groups)}
+
+
+def course_slug(course):
+    """
+    Directory name of a course's partition.
+    """
+    return re.sub(r"[^\w.-]+", "_", course.strip().lower()) or DEFAULT_COURSE
@@ -1,15 +1,332 @@
 # src/embeddings.py
 
-from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+import array
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+from src.cache import LRUCache
+from src.tracing import span
 from src.logger import get_logger
 
 logger = get_logger()
 
-def get_fastembed_embedding(model_name="BAAI/bge-base-en-v1.5"):
+def get_fastembed_embedding(model_name="BAAI/bge-base-en-v1.5", threads=None):
     """
     Loads and returns a FastEmbedEmbeddings model.
+    threads: ONNX Runtime intra-op threads per call (None: ONNX default, all cores).
     """
-    logger.info(f"Loading FastEmbedEmbeddings model: {model_name}")
-    embed_model = FastEmbedEmbeddings(model_name=model_name)
+    from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+
+    logger.info(f"Loading FastEmbedEmbeddings model: {model_name}" + (f" ({threads} threads)" if threads else ""))
+    embed_model = FastEmbedEmbeddings(model_name=model_name, threads=threads)
     logger.info("Embedding model loaded.")
     return embed_model
+
+def get_fake_embedding(size=768):
+    """
+    Returns a deterministic, offline fake embedding model (same text → same vector).
+    Used for batch runs, benchmarks and tests without downloading a model.
+    """
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    logger.info(f"Loading deterministic fake embeddings (size {size}).")
+    return DeterministicFakeEmbedding(size=size)
+
+def get_embedding_model(model_name="BAAI/bge-base-en-v1.5", threads=None):
+    """
+    Returns the embedding model for a name; 'fake' selects the offline fake embedder.
+    """
+    if model_name == "fake":
+        return get_fake_embedding()
+    return get_fastembed_embedding(model_name, threads=threads)
+
+def embed_queries(embed_model, texts):
+    """
+    Embeds many queries in one batched call when the model supports it: the model's own
+    embed_queries (BatchingEmbeddings, CachedQueryEmbeddings), else FastEmbed's query_embed,
+    falling back to one embed_query per text.
+    """
+    if hasattr(type(embed_model), "embed_queries"):
+        return embed_model.embed_queries(list(texts))
+    model = getattr(embed_model, "model", None)
+    if model is not None and hasattr(model, "query_embed"):
+        return [vector.tolist() for vector in model.query_embed(list(texts))]
+    return [embed_model.embed_query(text) for text in texts]
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an embedding model and memoizes embed_query results in a bounded LRU.
+    Repeated questions (UI re-clicks, evaluation reruns, answer-cache lookups
+    followed by retrieval) embed the query only once. Document embedding is
+    passed through unchanged.
+    """
+
+    def __init__(self, base, max_entries=1024):
+        self.base = base
+        self.query_cache = LRUCache(max_entries=max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        vector = self.query_cache.get(text)
+        if vector is not None:
+            self.hits += 1
+            return list(vector)
+        self.misses += 1
+        vector = self.base.embed_query(text)
+        self.query_cache.put(text, tuple(vector))
+        return vector
+
+    def embed_queries(self, texts):
+        vectors = [self.query_cache.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        self.hits += len(texts) - sum(vector is None for vector in vectors)
+        self.misses += len(missing)
+        if missing:
+            fresh = dict(zip(missing, embed_queries(self.base, missing)))
+            for text, vector in fresh.items():
+                self.query_cache.put(text, tuple(vector))
+            vectors = [vector if vector is not None else fresh[text] for text, vector in zip(texts, vectors)]
+        return [list(vector) for vector in vectors]
+
+    def __getattr__(self, name):
+        # Expose the wrapped model's attributes (model_name, model, ...)
+        if name == "base":
+            raise AttributeError(name)
+        return getattr(self.base, name)
+
+class EmbeddingDiskCache:
+    """
+    On-disk text-hash → vector store (SQLite, float32 blobs), shared across processes and runs.
+    Keys include the model name and the embedding kind (query/document), since the same
+    text can embed differently as a query.
+    """
+
+    def __init__(self, path, model_name=""):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        # A cache: losing the last writes on power loss is fine, an fsync per batch is not
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL);")
+        self._conn.commit()
+
+    def key(self, kind, text):
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Returns {key: vector} for the keys found.
+        """
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            # SQLite caps the number of bound parameters per statement
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(part))});", part
+                ).fetchall()
+                found.update((key, array.array("f", blob).tolist()) for key, blob in rows)
+        return found
+
+    def put_many(self, items):
+        rows = [(key, array.array("f", vector).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?);", rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class _EmbedRequest:
+    def __init__(self, kind, texts):
+        self.kind = kind
+        self.texts = texts
+        self.future = Future()
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Embedding executor shared by every request of a pipeline. Concurrent embed_query /
+    embed_documents calls are queued and a dispatcher thread groups them into micro-batches
+    (up to max_batch_size texts, waiting at most max_wait_ms for more when several are queued), which run
+    on a dedicated pool of `workers` threads; callers get their vectors back through futures.
+    While all workers are busy, new requests keep queueing and go out together in the next batch.
+    One batched ONNX call instead of many small ones competing for the CPU means more
+    queries/s per core and fewer latency spikes under load.
+    With disk_cache_path, vectors are also cached on disk by text hash (see EmbeddingDiskCache).
+    """
+
+    def __init__(self, base, model_name="", max_batch_size=32, max_wait_ms=2, workers=1, disk_cache_path=None):
+        self.base = base
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.workers = max(1, workers)
+        self.disk_cache = EmbeddingDiskCache(disk_cache_path, model_name) if disk_cache_path else None
+        self.metrics = {"requests": 0, "batches": 0, "texts": 0, "embedded": 0, "disk_hits": 0}
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._dispatcher = None
+
+    def _start(self):
+        # Started on first use and again in a forked process, where the threads do not exist
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.SimpleQueue()
+            self._slots = threading.Semaphore(self.workers)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed")
+            self._dispatcher = threading.Thread(
+                target=self._dispatch, args=(self._queue, self._executor), name="embed-dispatch", daemon=True
+            )
+            self._dispatcher.start()
+            self._pid = os.getpid()
+
+    def _dispatch(self, requests, executor):
+        while True:
+            first = requests.get()
+            if first is None:
+                return
+            # While every worker is busy, new requests pile up in the queue and join this batch
+            self._slots.acquire()
+            batch, size = [first], len(first.texts)
+            waiting = False
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    # Under load (other requests already queued) wait up to max_wait for more;
+                    # a lone request on an idle executor goes out at once
+                    item = requests.get(timeout=max(0.0, deadline - time.perf_counter())) if waiting else requests.get_nowait()
+                except queue.Empty:
+                    if waiting or len(batch) == 1:
+                        break
+                    waiting = True
+                    continue
+                if item is None:
+                    requests.put(None)
+                    break
+                batch.append(item)
+                size += len(item.texts)
+            groups = [[request for request in batch if request.kind == kind] for kind in ("query", "document")]
+            groups = [group for group in groups if group]
+            for i, group in enumerate(groups):
+                if i:
+                    self._slots.acquire()
+                executor.submit(self._run, group[0].kind, group)
+
+    def _run(self, kind, group):
+        start = time.perf_counter()
+        try:
+            # Duplicate texts (the same question from two sessions) are embedded once
+            unique = list(dict.fromkeys(text for request in group for text in request.texts))
+            vectors = dict(zip(unique, self._embed(kind, unique)))
+        except Exception as e:
+            for request in group:
+                request.future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+        self.metrics["batches"] += 1
+        self.metrics["texts"] += len(unique)
+        for request in group:
+            request.future.set_result([vectors[text] for text in request.texts])
+        logger.debug(f"Embedded a {kind} batch of {len(unique)} texts ({len(group)} requests) in {(time.perf_counter() - start) * 1000:.1f} ms.")
+
+    def _embed(self, kind, texts):
+        cached = {}
+        if self.disk_cache is not None:
+            keys = {text: self.disk_cache.key(kind, text) for text in texts}
+            found = self.disk_cache.get_many(keys.values())
+            cached = {text: found[key] for text, key in keys.items() if key in found}
+            self.metrics["disk_hits"] += len(cached)
+        missing = [text for text in texts if text not in cached]
+        if missing:
+            fresh = embed_queries(self.base, missing) if kind == "query" else self.base.embed_documents(missing)
+            fresh = [list(vector) for vector in fresh]
+            self.metrics["embedded"] += len(missing)
+            cached.update(zip(missing, fresh))
+            if self.disk_cache is not None:
+                self.disk_cache.put_many((keys[text], vector) for text, vector in zip(missing, fresh))
+        return [cached[text] for text in texts]
+
+    def submit(self, kind, texts):
+        """
+        Queues texts for embedding ('query' or 'document'); returns a Future of their vectors.
+        """
+        self._start()
+        self.metrics["requests"] += 1
+        request = _EmbedRequest(kind, list(texts))
+        self._queue.put(request)
+        return request.future
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        with span("embed"):
+            return self.submit("document", texts).result()
+
+    def embed_query(self, text):
+        with span("embed"):
+            return self.submit("query", [text]).result()[0]
+
+    def embed_queries(self, texts):
+        """
+        Embeds many queries as one request, through the same batches and disk cache as embed_query.
+        """
+        if not texts:
+            return []
+        with span("embed"):
+            return self.submit("query", texts).result()
+
+    async def aembed_documents(self, texts):
+        import asyncio
+
+        if not texts:
+            return []
+        return await asyncio.wrap_future(self.submit("document", texts))
+
+    async def aembed_query(self, text):
+        import asyncio
+
+        return (await asyncio.wrap_future(self.submit("query", [text])))[0]
+
+    def stats(self):
+        batches = self.metrics["batches"]
+        return {**self.metrics, "mean_batch_size": round(self.metrics["texts"] / batches, 2) if batches else 0.0}
+
+    def close(self):
+        """
+        Stops the dispatcher once queued requests are handed out, and the worker pool once they finish.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                self._queue.put(None)
+                self._dispatcher.join()
+                self._executor.shutdown(wait=True)
+                self._pid = None
+        if self.disk_cache is not None:
+            self.disk_cache.close()
+            self.disk_cache = None
+
+    def __getattr__(self, name):
+        # Expose the wrapped model's attributes (model_name, model, ...)
+        if name == "base":
+            raise AttributeError(name)
+        return getattr(self.base, name)
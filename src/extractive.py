@@ -0,0 +1,197 @@
+# src/extractive.py
+
+import re
+import threading
+from functools import lru_cache
+from src.metrics import LatencyRecorder
+from src.tracing import span
+from src.prompts import get_rag_prompt
+from src.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_READER_MODEL = "distilbert-base-cased-distilled-squad"
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+@lru_cache(maxsize=None)
+def get_qa_reader(model_name=DEFAULT_READER_MODEL):
+    """
+    Loads a transformers extractive question-answering pipeline on CPU (once per model per process).
+    """
+    from transformers import pipeline
+
+    logger.info(f"Loading extractive QA reader '{model_name}' ...")
+    return pipeline("question-answering", model=model_name, tokenizer=model_name, device=-1)
+
+
+def sentence_around(text, start, end):
+    """
+    The sentence(s) of text containing the character span [start, end).
+    """
+    offset = 0
+    sentences = []
+    for sentence in _SENTENCE_SPLIT_RE.split(text):
+        position = text.find(sentence, offset)
+        sentence_end = position + len(sentence)
+        if sentence_end > start and position < end:
+            sentences.append(sentence.strip())
+        offset = sentence_end
+    return " ".join(sentences)
+
+
+class ExtractiveReader:
+    """
+    Runs a local extractive QA model over the top retrieved chunks in one batched call
+    and keeps the highest-scoring span. An answer is accepted when its score is at least
+    min_score and it has at least min_words words; the caller escalates otherwise.
+    With answer_sentence, the whole sentence around the span is returned.
+    `reader` (a transformers-style QA pipeline) can be injected, e.g. for tests.
+    """
+
+    def __init__(
+        self,
+        model_name=DEFAULT_READER_MODEL,
+        min_score=0.5,
+        min_words=1,
+        max_chunks=5,
+        batch_size=8,
+        max_answer_len=64,
+        answer_sentence=True,
+        reader=None,
+    ):
+        self.model_name = model_name
+        self.min_score = min_score
+        self.min_words = min_words
+        self.max_chunks = max_chunks
+        self.batch_size = batch_size
+        self.max_answer_len = max_answer_len
+        self.answer_sentence = answer_sentence
+        self.reader = reader
+
+    def read(self, question, docs):
+        """
+        Returns {"answer", "score", "accepted", "source"} for the best span over docs, or None.
+        """
+        docs = [doc for doc in docs[:self.max_chunks] if doc.page_content.strip()]
+        if not docs:
+            return None
+        reader = self.reader or get_qa_reader(self.model_name)
+        results = reader(
+            [{"question": question, "context": doc.page_content} for doc in docs],
+            batch_size=self.batch_size,
+            max_answer_len=self.max_answer_len,
+        )
+        if isinstance(results, dict):
+            results = [results]
+        best_i = max(range(len(results)), key=lambda i: results[i]["score"])
+        best = results[best_i]
+        span = best["answer"].strip()
+        answer = span
+        if self.answer_sentence and "start" in best:
+            answer = sentence_around(docs[best_i].page_content, best["start"], best["end"]) or span
+        accepted = bool(span) and best["score"] >= self.min_score and len(span.split()) >= self.min_words
+        return {
+            "answer": answer,
+            "span": span,
+            "score": float(best["score"]),
+            "accepted": accepted,
+            "source": docs[best_i].metadata.get("source_pdf"),
+        }
+
+
+class ExtractiveFirstChain:
+    """
+    Answer mode that retrieves once, tries the local extractive reader, and only
+    calls the generative LLM (Groq/Gemini) when the reader is not confident.
+    Mirrors the invoke/stream interface of the LCEL chain; stats() reports how many
+    questions were answered locally and the latency of each path.
+    """
+
+    def __init__(self, retriever, chat_model, reader, context_packer=None):
+        from src.chain import get_answer_chain
+
+        self.retriever = retriever
+        self.reader = reader
+        self.context_packer = context_packer
+        self.answer_chain = get_answer_chain(chat_model)
+        self.prompt = get_rag_prompt()
+        self.latency = LatencyRecorder()
+        self.counts = {"extractive": 0, "escalated": 0}
+        self._lock = threading.Lock()
+
+    def _retrieve_and_read(self, question, config=None):
+        with self.latency.time("retrieve"):
+            docs = self.retriever.invoke(question, config=config)
+        try:
+            with self.latency.time("read"), span("extractive_read"):
+                result = self.reader.read(question, docs)
+        except Exception as e:
+            logger.warning(f"Extractive reader failed; escalating to the LLM: {e}")
+            result = None
+        return docs, result
+
+    def _prompt_input(self, question, docs):
+        if self.context_packer is not None:
+            with span("prompt.pack"):
+                prompt_input, _ = self.context_packer.pack_for_prompt(docs, question, self.prompt)
+            return prompt_input
+        from src.chain import format_docs
+
+        return {"context": format_docs(docs), "question": question}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def invoke(self, question, config=None, **kwargs):
+        docs, result = self._retrieve_and_read(question, config)
+        if result is not None and result["accepted"]:
+            self._count("extractive")
+            logger.info(f"Answered extractively (score {result['score']:.2f}); LLM skipped.")
+            return result["answer"]
+        self._count("escalated")
+        if result is not None:
+            logger.info(f"Reader confidence {result['score']:.2f} below {self.reader.min_score}; asking the LLM.")
+        with self.latency.time("generate"):
+            return self.answer_chain.invoke(self._prompt_input(question, docs), config=config, **kwargs)
+
+    def stream(self, question, config=None, **kwargs):
+        docs, result = self._retrieve_and_read(question, config)
+        if result is not None and result["accepted"]:
+            self._count("extractive")
+            yield result["answer"]
+            return
+        self._count("escalated")
+        with self.latency.time("generate"):
+            yield from self.answer_chain.stream(self._prompt_input(question, docs), config=config, **kwargs)
+
+    async def ainvoke(self, question, config=None, **kwargs):
+        import asyncio
+
+        docs, result = await asyncio.to_thread(self._retrieve_and_read, question, config)
+        if result is not None and result["accepted"]:
+            self._count("extractive")
+            return result["answer"]
+        self._count("escalated")
+        with self.latency.time("generate"):
+            return await self.answer_chain.ainvoke(self._prompt_input(question, docs), config=config, **kwargs)
+
+    async def astream(self, question, config=None, **kwargs):
+        import asyncio
+
+        docs, result = await asyncio.to_thread(self._retrieve_and_read, question, config)
+        if result is not None and result["accepted"]:
+            self._count("extractive")
+            yield result["answer"]
+            return
+        self._count("escalated")
+        with self.latency.time("generate"):
+            async for token in self.answer_chain.astream(self._prompt_input(question, docs), config=config, **kwargs):
+                yield token
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {**counts, "latency": self.latency.summary()}
@@ -0,0 +1,208 @@
+# src/ingest.py
+
+from src.chunkers import ChunkStats, get_semantic_chunker, iter_file_prechunks, iter_chunk_batches
+from src.manifest import (
+    load_manifest,
+    save_manifest,
+    new_manifest,
+    plan_ingestion,
+    make_chunk_ids,
+    get_index_version,
+    settings_fingerprint,
+    load_checkpoint,
+    save_checkpoint,
+    clear_checkpoint,
+)
+from src.vectorstore import (
+    add_chunks_to_vectorstore,
+    add_embedded_chunks_to_vectorstore,
+    delete_chunks_from_vectorstore,
+    clear_vectorstore,
+    count_vectors,
+    persist_vectorstore,
+)
+from src.metrics import StageTimer
+from src.logger import get_logger
+
+logger = get_logger()
+
+
+def sync_vectorstore(
+    pdf_files,
+    vectorstore,
+    pre_chunker,
+    embed_model,
+    persist_directory,
+    settings,
+    force_reindex=False,
+    reuse_sentence_embeddings=True,
+    workers=1,
+    batch_size=256,
+    timer=None,
+    keyword_index=None,
+    keyword_index_path=None,
+    parse_cache_dir=None,
+    chunk_metadata=None,
+    breakpoint_percentile=95,
+    semantic_chunker=None,
+    chunk_stats=None,
+):
+    """
+    Brings the vectorstore in line with the requested PDFs using the ingestion manifest:
+        - Skips files whose content hash and settings are unchanged
+        - Re-chunks and re-embeds only new or modified files
+        - Deletes vectors of modified and removed files
+    With reuse_sentence_embeddings, chunk vectors are pooled from the semantic
+    chunker's sentence embeddings instead of embedding every chunk a second time.
+    With workers > 1, PDFs are parsed and cleaned in a process pool (see iter_file_prechunks).
+    Each file is streamed page → pre-chunk → semantic chunk → cleaned chunk and written
+    in batches of batch_size; after every batch a checkpoint is saved, so an interrupted
+    run resumes from the last committed batch instead of restarting the file.
+    If a keyword_index (BM25Index) is given, it receives the same adds/deletes and is
+    saved to keyword_index_path once, when the run completes. A keyword index that is behind
+    the manifest (an earlier run was interrupted) is left alone; build_index then rebuilds it
+    from the vectorstore.
+    With parse_cache_dir, extracted page text is cached per file hash, so files that are
+    re-indexed without changing (e.g. after a settings change) are not parsed again.
+    chunk_metadata (e.g. {"course": "nlp"}) is added to the metadata of every chunk.
+    breakpoint_percentile is the semantic chunker's split threshold (see get_semantic_chunker);
+    pass semantic_chunker to use another one (e.g. a StructuredChunker).
+    Chunk-boundary statistics of the indexed files are logged and, with chunk_stats (ChunkStats), collected.
+    Returns the index version stamp of the resulting index.
+    """
+    manifest = None if force_reindex else load_manifest(persist_directory)
+
+    resumable = not force_reindex and load_checkpoint(persist_directory) is not None
+    if manifest is None and not resumable and count_vectors(vectorstore) > 0:
+        logger.warning("Existing vectors found without an ingestion manifest; clearing them to avoid duplicates.")
+        clear_vectorstore(vectorstore)
+        persist_vectorstore(vectorstore)
+        clear_checkpoint(persist_directory)
+    if manifest is None and keyword_index is not None:
+        keyword_index.remove(list(keyword_index.docs))
+    elif keyword_index is not None and keyword_index.index_version != get_index_version(manifest):
+        logger.info("BM25 index is behind the ingestion manifest; it will be rebuilt after ingestion.")
+        keyword_index = None
+
+    plan = plan_ingestion(pdf_files, manifest, settings)
+    logger.info(
+        f"Ingestion plan: {len(plan['to_index'])} to index, "
+        f"{len(plan['unchanged'])} unchanged, {len(plan['removed'])} removed."
+    )
+
+    if manifest is None or manifest.get("settings") != settings:
+        old_files = manifest.get("files", {}) if manifest else {}
+        manifest = new_manifest(settings)
+        manifest["files"] = {path: old_files[path] for path in plan["unchanged"]}
+        save_manifest(persist_directory, manifest)
+
+    checkpoint = _usable_checkpoint(vectorstore, persist_directory, plan, settings, force_reindex)
+
+    if plan["stale_ids"]:
+        delete_chunks_from_vectorstore(vectorstore, plan["stale_ids"])
+        if keyword_index is not None:
+            keyword_index.remove(plan["stale_ids"])
+    for path in plan["removed"]:
+        manifest["files"].pop(path, None)
+    if plan["stale_ids"] or plan["removed"]:
+        persist_vectorstore(vectorstore)
+        save_manifest(persist_directory, manifest)
+
+    timer = timer or StageTimer()
+    file_hashes = dict(plan["to_index"])
+    chunk_stats = chunk_stats if chunk_stats is not None else ChunkStats()
+    if semantic_chunker is None:
+        semantic_chunker = get_semantic_chunker(embed_model, breakpoint_percentile)
+    settings_hash = settings_fingerprint(settings)
+
+    sources = iter_file_prechunks([path for path, _ in plan["to_index"]], pre_chunker, workers=workers, timer=timer, cache_dir=parse_cache_dir)
+    for path, prechunks, submit_clean in sources:
+        sha = file_hashes[path]
+        start_prechunk, start_chunk = 0, 0
+        if checkpoint and checkpoint["path"] == path:
+            start_prechunk, start_chunk = checkpoint["next_prechunk"], checkpoint["next_chunk"]
+            logger.info(f"Resuming {path} from pre-chunk {start_prechunk} (chunk {start_chunk}).")
+            if keyword_index is not None and start_chunk:
+                # The keyword index is only saved when a run completes; catch it up with the committed batches
+                committed = vectorstore.get(ids=make_chunk_ids(path, sha, start_chunk), include=["documents", "metadatas"])
+                keyword_index.add(committed["ids"], committed["documents"], committed["metadatas"])
+
+        n_chunks = start_chunk
+        batches = iter_chunk_batches(
+            path, prechunks, semantic_chunker, embed_model,
+            batch_size=batch_size, timer=timer,
+            start_prechunk=start_prechunk, start_chunk=start_chunk, submit_clean=submit_clean,
+            extra_metadata=chunk_metadata,
+            stats=chunk_stats,
+        )
+        for batch in batches:
+            chunks, vectors = batch["chunks"], batch["vectors"]
+            ids = make_chunk_ids(path, sha, len(chunks), start=batch["first_chunk"])
+            with timer.stage("index"):
+                if reuse_sentence_embeddings:
+                    add_embedded_chunks_to_vectorstore(vectorstore, chunks, vectors, ids)
+                else:
+                    add_chunks_to_vectorstore(vectorstore, chunks, ids)
+            if keyword_index is not None:
+                with timer.stage("keyword_index"):
+                    keyword_index.add(ids, [c.page_content for c in chunks], [c.metadata for c in chunks])
+            n_chunks = batch["first_chunk"] + len(chunks)
+            next_prechunk, next_chunk = batch["resume"]
+            # The checkpoint may only describe vectors that are on disk
+            persist_vectorstore(vectorstore)
+            save_checkpoint(persist_directory, {
+                "path": path,
+                "sha256": sha,
+                "settings_hash": settings_hash,
+                "next_prechunk": next_prechunk,
+                "next_chunk": next_chunk,
+                "committed_chunks": n_chunks,
+            })
+
+        logger.info(f"...{n_chunks} chunks indexed for {path}")
+        manifest["files"][path] = {"sha256": sha, "chunk_ids": make_chunk_ids(path, sha, n_chunks)}
+        persist_vectorstore(vectorstore)
+        save_manifest(persist_directory, manifest)
+        clear_checkpoint(persist_directory)
+        checkpoint = None
+
+    # One BM25 write per run, at the end: the whole JSON is rewritten, so per-file saves would be quadratic
+    if keyword_index is not None and keyword_index.index_version != get_index_version(manifest):
+        _save_keyword_index(keyword_index, keyword_index_path, manifest)
+
+    if plan["to_index"]:
+        timer.report("Ingestion stage timings")
+        chunk_stats.report()
+
+    index_version = get_index_version(manifest)
+    logger.info(f"Vectorstore in sync with {len(manifest['files'])} files (index version {index_version}).")
+    return index_version
+
+
+def _save_keyword_index(keyword_index, keyword_index_path, manifest):
+    if keyword_index is not None and keyword_index_path:
+        keyword_index.save(keyword_index_path, index_version=get_index_version(manifest))
+
+
+def _usable_checkpoint(vectorstore, persist_directory, plan, settings, force_reindex):
+    """
+    Returns the checkpoint if it belongs to a file version we are about to index
+    with the same settings. Otherwise deletes the partial vectors it describes.
+    """
+    checkpoint = load_checkpoint(persist_directory)
+    if checkpoint is None:
+        return None
+    pending = dict(plan["to_index"])
+    if (
+        not force_reindex
+        and pending.get(checkpoint["path"]) == checkpoint["sha256"]
+        and checkpoint["settings_hash"] == settings_fingerprint(settings)
+    ):
+        return checkpoint
+    logger.info(f"Discarding stale ingestion checkpoint for {checkpoint['path']}.")
+    stale_ids = make_chunk_ids(checkpoint["path"], checkpoint["sha256"], checkpoint.get("committed_chunks", 0))
+    if stale_ids:
+        delete_chunks_from_vectorstore(vectorstore, stale_ids)
+        persist_vectorstore(vectorstore)
+    clear_checkpoint(persist_directory)
+    return None
@@ -0,0 +1,290 @@
+# src/llm_router.py
+
+import asyncio
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, AsyncIterator, List, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+from src.metrics import LatencyRecorder
+from src.logger import get_logger
+
+logger = get_logger()
+
+_DONE = object()
+
+
+class AllBackendsFailed(RuntimeError):
+    pass
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Chat model that routes each request over several backends in preference order:
+        - Failover: if a backend errors, the next one is tried at once
+        - Hedging: if no response (first token, when streaming) arrives within
+          hedge_after_ms, the next backend is started too; the first to answer wins
+          and the others are cancelled (async) or ignored (sync)
+        - At most max_concurrency in-flight requests per backend
+        - timeout_ms: longest wait for the next response/token from any backend
+    Works for invoke/stream (threads) and ainvoke/astream (asyncio), so it drops into
+    the LCEL chains unchanged. Per-backend latency (first token and total) and
+    win/error/hedge counts are available via stats().
+    """
+
+    backends: List[Any]
+    names: List[str]
+    hedge_after_ms: Optional[float] = 1500
+    timeout_ms: Optional[float] = 30000
+    max_concurrency: int = 4
+    latency: Any = None
+    counts: Dict[str, Dict[str, int]] = {}
+
+    _sync_slots: dict = PrivateAttr(default_factory=dict)
+    _async_slots: Any = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _executor: Any = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        if self.latency is None:
+            self.latency = LatencyRecorder()
+        self.counts = {name: {"attempts": 0, "wins": 0, "errors": 0, "hedges": 0} for name in self.names}
+        self._sync_slots = {name: threading.BoundedSemaphore(self.max_concurrency) for name in self.names}
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency * len(self.names), thread_name_prefix="llm")
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-router"
+
+    def _count(self, name, key):
+        with self._lock:
+            self.counts[name][key] += 1
+
+    def _async_slot(self, name):
+        # asyncio primitives belong to one event loop, so keep one semaphore per (live) loop
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._async_slots.setdefault(loop, {})
+            if name not in slots:
+                slots[name] = asyncio.Semaphore(self.max_concurrency)
+            return slots[name]
+
+    # ---- sync path: one worker thread per attempt, results funnelled through a queue ----
+
+    def _race(self, call):
+        """
+        Yields items from the winning backend. call(model) returns an iterator of items.
+        """
+        events = queue.Queue()
+        cancelled = {}
+        errors = []
+        timeout = self.timeout_ms / 1000 if self.timeout_ms else None
+
+        def worker(i):
+            name = self.names[i]
+            with self._sync_slots[name]:
+                start = time.perf_counter()
+                first = True
+                try:
+                    for item in call(self.backends[i]):
+                        if cancelled[i].is_set():
+                            return
+                        if first:
+                            self.latency.record(f"{name}.first", time.perf_counter() - start)
+                            first = False
+                        events.put((i, item))
+                    self.latency.record(name, time.perf_counter() - start)
+                    events.put((i, _DONE))
+                except Exception as e:
+                    events.put((i, e))
+
+        def launch(i):
+            cancelled[i] = threading.Event()
+            self._count(self.names[i], "attempts")
+            self._executor.submit(worker, i)
+
+        launch(0)
+        next_i, active, winner = 1, {0}, None
+        try:
+            while True:
+                can_hedge = winner is None and next_i < len(self.backends)
+                wait = self.hedge_after_ms / 1000 if can_hedge and self.hedge_after_ms is not None else timeout
+                try:
+                    i, item = events.get(timeout=wait)
+                except queue.Empty:
+                    if can_hedge:
+                        logger.warning(f"No response from {self.names[next_i - 1]} after {self.hedge_after_ms} ms; hedging with {self.names[next_i]}.")
+                        self._count(self.names[next_i], "hedges")
+                        launch(next_i)
+                        active.add(next_i)
+                        next_i += 1
+                        continue
+                    raise TimeoutError(f"No LLM response within {self.timeout_ms} ms")
+                if winner is not None and i != winner:
+                    continue
+                if isinstance(item, Exception):
+                    self._count(self.names[i], "errors")
+                    errors.append(f"{self.names[i]}: {item}")
+                    if winner == i:
+                        raise item
+                    active.discard(i)
+                    logger.warning(f"LLM backend {self.names[i]} failed: {item}")
+                    if next_i < len(self.backends):
+                        launch(next_i)
+                        active.add(next_i)
+                        next_i += 1
+                    elif not active:
+                        raise AllBackendsFailed("All LLM backends failed: " + "; ".join(errors))
+                    continue
+                if winner is None:
+                    winner = i
+                    self._count(self.names[i], "wins")
+                    for j in active - {i}:
+                        cancelled[j].set()
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            for flag in cancelled.values():
+                flag.set()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # generate() keeps the winner's ChatGeneration (usage, response metadata) and llm_output
+        race = self._race(lambda model: iter([model.generate([messages], stop=stop, **kwargs)]))
+        try:
+            result = next(race)
+        finally:
+            race.close()
+        return ChatResult(generations=result.generations[0], llm_output=result.llm_output)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        for chunk in self._race(lambda model: model.stream(messages, stop=stop, **kwargs)):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+
+    # ---- async path: one task per attempt, losers cancelled ----
+
+    async def _arace(self, call):
+        events = asyncio.Queue()
+        tasks = {}
+        errors = []
+        timeout = self.timeout_ms / 1000 if self.timeout_ms else None
+
+        async def worker(i):
+            name = self.names[i]
+            async with self._async_slot(name):
+                start = time.perf_counter()
+                first = True
+                try:
+                    async for item in call(self.backends[i]):
+                        if first:
+                            self.latency.record(f"{name}.first", time.perf_counter() - start)
+                            first = False
+                        await events.put((i, item))
+                    self.latency.record(name, time.perf_counter() - start)
+                    await events.put((i, _DONE))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    await events.put((i, e))
+
+        def launch(i):
+            self._count(self.names[i], "attempts")
+            tasks[i] = asyncio.ensure_future(worker(i))
+
+        launch(0)
+        next_i, active, winner = 1, {0}, None
+        try:
+            while True:
+                can_hedge = winner is None and next_i < len(self.backends)
+                wait = self.hedge_after_ms / 1000 if can_hedge and self.hedge_after_ms is not None else timeout
+                try:
+                    i, item = await asyncio.wait_for(events.get(), wait)
+                except asyncio.TimeoutError:
+                    if can_hedge:
+                        logger.warning(f"No response from {self.names[next_i - 1]} after {self.hedge_after_ms} ms; hedging with {self.names[next_i]}.")
+                        self._count(self.names[next_i], "hedges")
+                        launch(next_i)
+                        active.add(next_i)
+                        next_i += 1
+                        continue
+                    raise TimeoutError(f"No LLM response within {self.timeout_ms} ms")
+                if winner is not None and i != winner:
+                    continue
+                if isinstance(item, Exception):
+                    self._count(self.names[i], "errors")
+                    errors.append(f"{self.names[i]}: {item}")
+                    if winner == i:
+                        raise item
+                    active.discard(i)
+                    logger.warning(f"LLM backend {self.names[i]} failed: {item}")
+                    if next_i < len(self.backends):
+                        launch(next_i)
+                        active.add(next_i)
+                        next_i += 1
+                    elif not active:
+                        raise AllBackendsFailed("All LLM backends failed: " + "; ".join(errors))
+                    continue
+                if winner is None:
+                    winner = i
+                    self._count(self.names[i], "wins")
+                    for j in active - {i}:
+                        tasks[j].cancel()
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        async def call(model):
+            yield await model.agenerate([messages], stop=stop, **kwargs)
+
+        race = self._arace(call)
+        try:
+            result = await race.__anext__()
+        finally:
+            await race.aclose()
+        return ChatResult(generations=result.generations[0], llm_output=result.llm_output)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in self._arace(lambda model: model.astream(messages, stop=stop, **kwargs)):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+
+    def stats(self):
+        with self._lock:
+            counts = {name: dict(c) for name, c in self.counts.items()}
+        return {"backends": counts, "latency": self.latency.summary()}
+
+
+def get_failover_chat_model(backends=("groq", "gemini", "ollama"), hedge_after_ms=1500, timeout_ms=30000, max_concurrency=4):
+    """
+    Builds each backend with get_chat_model and puts them behind a HedgedChatModel.
+    Backends that cannot be constructed (missing package or key) are skipped.
+    """
+    from src.llms import get_chat_model
+
+    models, names = [], []
+    for name in backends:
+        try:
+            models.append(get_chat_model(name))
+            names.append(name)
+        except Exception as e:
+            logger.warning(f"Skipping LLM backend '{name}': {e}")
+    if not models:
+        raise AllBackendsFailed(f"None of the LLM backends {list(backends)} could be loaded")
+    return HedgedChatModel(
+        backends=models,
+        names=names,
+        hedge_after_ms=hedge_after_ms,
+        timeout_ms=timeout_ms,
+        max_concurrency=max_concurrency,
+    )
@@ -15,33 +15,146 @@
 
 # src/llms.py
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
-from src.config import GEMINI_API_KEY, GROQ_API_KEY
+from functools import lru_cache
+from src.config import (
+    GEMINI_API_KEY,
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    GEMINI_BASE_URL,
+    OLLAMA_BASE_URL,
+    OLLAMA_MODEL,
+    LLM_FAILOVER_ORDER,
+    LLM_TIMEOUT_SECONDS,
+    LLM_HEDGE_AFTER_MS,
+    LLM_MAX_CONCURRENCY,
+)
 from src.logger import get_logger
 
 logger = get_logger()
 
-def get_gemini_llm(model_name="gemini-1.5-flash-latest"):
+# Backend names get_chat_model accepts (CLI choices)
+LLM_BACKENDS = ("groq", "gemini", "ollama", "fake", "failover")
+
+@lru_cache(maxsize=None)
+def get_http_client(max_connections=20, timeout=LLM_TIMEOUT_SECONDS):
+    """
+    Process-wide pooled (keep-alive) httpx client shared by the LLM clients.
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.Client(limits=limits, timeout=timeout)
+
+@lru_cache(maxsize=None)
+def get_async_http_client(max_connections=20, timeout=LLM_TIMEOUT_SECONDS):
+    """
+    Async counterpart of get_http_client. Connections are bound to an event loop, so
+    requests go through a separate pool per running loop (one per asyncio.run()).
+    """
+    import httpx
+    from src.async_http import LoopBoundAsyncClient
+
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return LoopBoundAsyncClient(limits=limits, timeout=timeout)
+
+def get_gemini_llm(model_name="gemini-1.5-flash-latest", base_url=GEMINI_BASE_URL, timeout=LLM_TIMEOUT_SECONDS, max_retries=1):
     """
-    Returns a Gemini chat model for answering queries.
+    Returns a Gemini chat model for answering queries, on the shared pooled HTTP clients.
     """
+    from google.genai import Client
+    from google.genai.types import HttpOptions
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     logger.info(f"Loading Gemini chat model: {model_name}")
     llm = ChatGoogleGenerativeAI(
         model=model_name,
-        google_api_key=GEMINI_API_KEY
+        google_api_key=GEMINI_API_KEY,
+        base_url=base_url,
+        timeout=timeout,
+        max_retries=max_retries
+    )
+    # ChatGoogleGenerativeAI always builds its own google-genai client; swap in one on the pooled
+    # httpx clients (google-genai leaves clients it was given open, so the pool outlives the model)
+    llm.client = Client(
+        api_key=GEMINI_API_KEY,
+        http_options=HttpOptions(
+            base_url=base_url,
+            httpx_client=get_http_client(),
+            httpx_async_client=get_async_http_client(),
+        ),
     )
     logger.info("Gemini chat model loaded.")
     return llm
 
-def get_groq_llm(model_name="llama3-8b-8192"):
+def get_groq_llm(model_name="llama3-8b-8192", base_url=GROQ_BASE_URL, timeout=LLM_TIMEOUT_SECONDS, max_retries=1):
     """
-    Returns a Groq chat model for answering queries.
+    Returns a Groq chat model for answering queries, on the shared pooled HTTP clients.
     """
+    from langchain_groq import ChatGroq
+
     logger.info(f"Loading Groq chat model: {model_name}")
     llm = ChatGroq(
         model_name=model_name,
-        api_key=GROQ_API_KEY
+        api_key=GROQ_API_KEY,
+        base_url=base_url,
+        request_timeout=timeout,
+        max_retries=max_retries,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client()
     )
     logger.info("Groq chat model loaded.")
-    return llm
\ No newline at end of file
+    return llm
+
+def get_ollama_llm(model_name=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL, timeout=LLM_TIMEOUT_SECONDS):
+    """
+    Returns a local Ollama chat model (by default the Modelfile's 'edusage').
+    """
+    from langchain_ollama import ChatOllama
+
+    logger.info(f"Loading Ollama chat model: {model_name} at {base_url}")
+    llm = ChatOllama(
+        model=model_name,
+        base_url=base_url,
+        client_kwargs={"timeout": timeout}
+    )
+    logger.info("Ollama chat model loaded.")
+    return llm
+
+def get_fake_llm(responses=None):
+    """
+    Returns a local fake chat model (no network) that cycles through fixed responses.
+    Used for batch runs, benchmarks and tests.
+    """
+    from langchain_core.language_models import FakeListChatModel
+
+    logger.info("Loading fake chat model (offline).")
+    return FakeListChatModel(responses=responses or ["I don't know"])
+
+def get_chat_model(llm_backend="groq"):
+    """
+    Returns the chat model for a backend name: 'groq', 'gemini', 'ollama', 'fake',
+    or 'failover' (LLM_FAILOVER_ORDER behind a hedging router, see src/llm_router.py).
+    """
+    if llm_backend == "failover":
+        from src.llm_router import get_failover_chat_model
+
+        chat_model = get_failover_chat_model(
+            LLM_FAILOVER_ORDER,
+            hedge_after_ms=LLM_HEDGE_AFTER_MS,
+            timeout_ms=LLM_TIMEOUT_SECONDS * 1000,
+            max_concurrency=LLM_MAX_CONCURRENCY,
+        )
+        logger.info(f"Using failover LLM router over {LLM_FAILOVER_ORDER}.")
+    elif llm_backend == "groq":
+        chat_model = get_groq_llm()
+        logger.info("Using Groq LLM for answering.")
+    elif llm_backend == "ollama":
+        chat_model = get_ollama_llm()
+        logger.info("Using Ollama LLM for answering.")
+    elif llm_backend == "fake":
+        chat_model = get_fake_llm()
+        logger.info("Using fake LLM for answering.")
+    else:
+        chat_model = get_gemini_llm()
+        logger.info("Using Gemini LLM for answering.")
+    return chat_model
@@ -1,24 +1,187 @@
 # src/loaders.py
 
-import pdfplumber
+import json
+import os
+import re
+from src.manifest import file_sha256
 from src.logger import get_logger
 
 logger = get_logger()
 
-def load_pdf_pages(pdf_path):
-    """
-    Loads each page of a PDF using pdfplumber.
-    Returns a list of dicts: [{'page_num': n, 'text': ...}, ...]
-    """
-    logger.info(f"Loading PDF: {pdf_path}")
-    pages = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text()
-            if not text or len(text.strip()) < 10:
-                logger.debug(f"Skipping empty/short page {i+1}")
-                continue
-            pages.append({'page_num': i + 1, 'text': text})
-            logger.debug(f"Loaded page {i + 1}: {len(text)} chars")
-    logger.info(f"Loaded {len(pages)} pages from {pdf_path}")
-    return pages
+# Bump whenever a loader's output changes, so cached parses and indexes are rebuilt
+LOADER_VERSION = 1
+
+LOADERS = {}
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_HEADING_STYLE_RE = re.compile(r"^(heading\s*\d|title)", re.IGNORECASE)
+
+
+def register_loader(*extensions):
+    """
+    Decorator registering a loader for file extensions (".pdf", ...).
+    A loader takes a path and returns a list of records:
+        [{'page': n, 'section': heading or '', 'text': ...}, ...]
+    """
+    def decorator(func):
+        for ext in extensions:
+            LOADERS[ext.lower()] = func
+        return func
+    return decorator
+
+
+def get_loader(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in LOADERS:
+        raise ValueError(f"Unsupported document type '{ext}' for {path}; supported: {sorted(LOADERS)}")
+    return LOADERS[ext]
+
+
+@register_loader(".pdf")
+def load_pdf_records(pdf_path):
+    """
+    One record per non-empty page, extracted with pypdf directly
+    (same text as PyPDFLoader, without building a Document per page).
+    """
+    from pypdf import PdfReader
+
+    records = []
+    for i, page in enumerate(PdfReader(pdf_path).pages):
+        text = page.extract_text() or ""
+        if text.strip():
+            records.append({"page": i + 1, "section": "", "text": text})
+    return records
+
+
+def _docx_events(body):
+    """
+    Walks word/document.xml in reading order and yields
+    ("text", style, paragraph_text) and ("page",) events.
+    Table rows are flattened to one paragraph each, cells joined by " | ".
+    Page boundaries are Word's rendered page breaks if it stored any, else explicit page breaks.
+    """
+    rendered = any(True for _ in body.iter(f"{_W}lastRenderedPageBreak"))
+
+    def is_page_break(el):
+        if rendered:
+            return el.tag == f"{_W}lastRenderedPageBreak"
+        return el.tag == f"{_W}br" and el.get(f"{_W}type") == "page"
+
+    def paragraph(p, style=None):
+        if style is None:
+            style_el = p.find(f"{_W}pPr/{_W}pStyle")
+            style = style_el.get(f"{_W}val") if style_el is not None else ""
+            outline = p.find(f"{_W}pPr/{_W}outlineLvl")
+            if outline is not None and outline.get(f"{_W}val", "9") != "9":
+                style = "Heading"
+        parts = []
+        for el in p.iter():
+            if is_page_break(el):
+                yield "text", style, "".join(parts)
+                yield ("page",)
+                parts = []
+            elif el.tag == f"{_W}t":
+                parts.append(el.text or "")
+            elif el.tag == f"{_W}tab":
+                parts.append("\t")
+            elif el.tag in (f"{_W}br", f"{_W}cr"):
+                parts.append("\n")
+        yield "text", style, "".join(parts)
+
+    for child in body:
+        if child.tag == f"{_W}p":
+            yield from paragraph(child)
+        elif child.tag == f"{_W}tbl":
+            for row in child.iter(f"{_W}tr"):
+                cells = []
+                for cell in row.iter(f"{_W}tc"):
+                    texts = [event[2] for p in cell.iter(f"{_W}p") for event in paragraph(p, style="") if event[0] == "text"]
+                    cells.append(" ".join(t.strip() for t in texts if t.strip()))
+                yield "text", "", " | ".join(c for c in cells if c)
+
+
+@register_loader(".docx")
+def load_docx_records(docx_path):
+    """
+    Reads word/document.xml straight from the .docx zip (no python-docx needed).
+    A new record starts at every page break and every heading paragraph;
+    'section' is the current heading text.
+    """
+    import zipfile
+    import xml.etree.ElementTree as ET
+
+    with zipfile.ZipFile(docx_path) as z:
+        root = ET.fromstring(z.read("word/document.xml"))
+    body = root.find(f"{_W}body")
+    if body is None:
+        return []
+
+    records = []
+    page, section, lines = 1, "", []
+
+    def flush():
+        text = "\n".join(lines).strip()
+        if text:
+            records.append({"page": page, "section": section, "text": text})
+        lines.clear()
+
+    for event in _docx_events(body):
+        if event[0] == "page":
+            flush()
+            page += 1
+            continue
+        _, style, text = event
+        if style and _HEADING_STYLE_RE.match(style) and text.strip():
+            flush()
+            section = text.strip()
+        lines.append(text)
+    flush()
+    return records
+
+
+@register_loader(".txt", ".md")
+def load_text_records(text_path):
+    """
+    Plain text: sections are split on form feeds (page breaks), else the whole file is one record.
+    """
+    with open(text_path, "r", encoding="utf-8", errors="replace") as f:
+        content = f.read()
+    return [
+        {"page": i + 1, "section": "", "text": text}
+        for i, text in enumerate(content.split("\f"))
+        if text.strip()
+    ]
+
+
+SUPPORTED_EXTENSIONS = tuple(sorted(LOADERS))
+
+
+def load_document(path, cache_dir=None):
+    """
+    Returns the page/section records of any supported document.
+    With cache_dir, extracted text is cached as <cache_dir>/<sha256>.json, so a file
+    whose content has not changed is never parsed again (even after a settings change).
+    """
+    loader = get_loader(path)
+    cache_file = os.path.join(cache_dir, f"{file_sha256(path)}.json") if cache_dir else None
+    if cache_file:
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("loader_version") == LOADER_VERSION and cached.get("loader") == loader.__name__:
+                logger.info(f"Parse cache hit for {path} ({len(cached['records'])} records).")
+                return cached["records"]
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    records = loader(path)
+    if not records:
+        logger.warning(f"No extractable text in {path} (scanned or image-only?); it will add no chunks.")
+    if cache_file:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"loader_version": LOADER_VERSION, "loader": loader.__name__, "path": path, "records": records}, f)
+        os.replace(tmp_path, cache_file)
+    logger.info(f"Parsed {path}: {len(records)} records.")
+    return records
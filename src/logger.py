@@ -1,7 +1,64 @@
 # src/logger.py
 
+import atexit
+import contextvars
+import json
 import logging
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Fields added to every record logged in the current context, e.g. {"query_id": ...} (see src/tracing.py)
+log_context = contextvars.ContextVar("log_context", default={})
+
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copies the log_context fields onto each record (runs in the logging thread, before queueing).
+    """
+
+    def filter(self, record):
+        for key, value in log_context.get().items():
+            setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, message, plus context fields and `extra=` fields.
+    """
+
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS})
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _ProcessQueueHandler(QueueHandler):
+    """
+    Queues records for the listener thread. In a forked worker process the listener thread
+    does not exist, so records are written by the handlers directly.
+    """
+
+    def __init__(self, log_queue, listener):
+        super().__init__(log_queue)
+        self.listener = listener
+        self.pid = os.getpid()
+
+    def emit(self, record):
+        if os.getpid() == self.pid:
+            return super().emit(record)
+        for handler in self.listener.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
 
 def get_logger(
     name="educational_rag",
@@ -10,24 +67,44 @@ def get_logger(
     console: bool = True,
     file: bool = True,
 ):
-    os.makedirs(log_dir, exist_ok=True)
-    log_file = os.path.join(log_dir, f"{name}.log")
-
+    """
+    Returns the named logger, configured once per process (later calls just return it).
+    Records go through a queue to a background listener thread, so logging never blocks
+    on console or file I/O. With LOG_FORMAT=json the log file is JSON lines (<name>.jsonl),
+    including the query id and any structured `extra=` fields.
+    """
     logger = logging.getLogger(name)
+    if getattr(logger, "_rag_configured", False):
+        return logger
+
     logger.setLevel(level)
     logger.propagate = False
+    # Handlers left over from an earlier configuration (e.g. module reloads in Jupyter)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
 
-    # Remove any existing handlers to avoid duplicate logs in Jupyter/interactive runs
-    if logger.hasHandlers():
-        logger.handlers.clear()
-
+    handlers = []
     if console:
         ch = logging.StreamHandler()
         ch.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
-        logger.addHandler(ch)
+        handlers.append(ch)
     if file:
-        fh = logging.FileHandler(log_file, encoding="utf-8")
-        fh.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
-        logger.addHandler(fh)
+        os.makedirs(log_dir, exist_ok=True)
+        if os.getenv("LOG_FORMAT", "text").lower() == "json":
+            fh = logging.FileHandler(os.path.join(log_dir, f"{name}.jsonl"), encoding="utf-8")
+            fh.setFormatter(JsonFormatter())
+        else:
+            fh = logging.FileHandler(os.path.join(log_dir, f"{name}.log"), encoding="utf-8")
+            fh.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+        handlers.append(fh)
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
+    queue_handler = _ProcessQueueHandler(log_queue, listener)
+    queue_handler.addFilter(ContextFilter())
+    logger.addHandler(queue_handler)
+    logger._rag_configured = True
     return logger
@@ -0,0 +1,158 @@
+# src/manifest.py
+
+import hashlib
+import json
+import os
+from src.logger import get_logger
+
+logger = get_logger()
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+CHECKPOINT_FILENAME = "ingest_checkpoint.json"
+
+
+def file_sha256(path, block_size=1 << 20):
+    """
+    Returns the SHA-256 hex digest of a file's content, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def settings_fingerprint(settings):
+    """
+    Returns a stable hash of the chunker/embedding settings an index was built with.
+    """
+    payload = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def make_chunk_ids(path, file_hash, n_chunks, start=0):
+    """
+    Deterministic Chroma ids for the chunks of one file version.
+    Re-indexing the same file content always produces the same ids.
+    """
+    doc_key = hashlib.sha256(f"{path}:{file_hash}".encode("utf-8")).hexdigest()[:16]
+    return [f"{doc_key}-{i:05d}" for i in range(start, start + n_chunks)]
+
+
+def manifest_path(persist_directory):
+    return os.path.join(persist_directory, MANIFEST_FILENAME)
+
+
+def checkpoint_path(persist_directory):
+    return os.path.join(persist_directory, CHECKPOINT_FILENAME)
+
+
+def load_manifest(persist_directory):
+    """
+    Loads the ingestion manifest stored next to the Chroma files.
+    Returns None if the directory has never been indexed with a manifest.
+    """
+    path = manifest_path(persist_directory)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not read ingestion manifest at '{path}': {e}")
+        return None
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def save_manifest(persist_directory, manifest):
+    """
+    Writes the manifest atomically so a crash never leaves a half-written file.
+    """
+    os.makedirs(persist_directory, exist_ok=True)
+    _write_json_atomic(manifest_path(persist_directory), manifest)
+
+
+def load_checkpoint(persist_directory):
+    """
+    Loads the in-progress file checkpoint, or None if the last ingestion finished cleanly.
+    Format: {'path', 'sha256', 'settings_hash', 'next_prechunk', 'next_chunk'}
+    """
+    path = checkpoint_path(persist_directory)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable ingestion checkpoint at '{path}': {e}")
+        return None
+
+
+def save_checkpoint(persist_directory, checkpoint):
+    """
+    Records the last committed batch of the file currently being ingested.
+    """
+    os.makedirs(persist_directory, exist_ok=True)
+    _write_json_atomic(checkpoint_path(persist_directory), checkpoint)
+
+
+def clear_checkpoint(persist_directory):
+    path = checkpoint_path(persist_directory)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def new_manifest(settings):
+    return {"settings": settings, "settings_hash": settings_fingerprint(settings), "files": {}}
+
+
+def plan_ingestion(pdf_files, manifest, settings):
+    """
+    Compares the requested files against the manifest.
+    Returns a dict with:
+        - 'to_index': list of (path, sha256) for new or modified files
+        - 'unchanged': list of paths that can be skipped
+        - 'stale_ids': chunk ids to delete (modified or removed files)
+        - 'removed': list of paths no longer in the corpus
+    """
+    settings_hash = settings_fingerprint(settings)
+    indexed = manifest.get("files", {}) if manifest else {}
+    settings_changed = manifest is not None and manifest.get("settings_hash") != settings_hash
+
+    plan = {"to_index": [], "unchanged": [], "stale_ids": [], "removed": []}
+    for path in pdf_files:
+        sha = file_sha256(path)
+        entry = indexed.get(path)
+        if entry and entry.get("sha256") == sha and not settings_changed:
+            plan["unchanged"].append(path)
+            continue
+        if entry:
+            plan["stale_ids"].extend(entry.get("chunk_ids", []))
+        plan["to_index"].append((path, sha))
+
+    for path, entry in indexed.items():
+        if path not in pdf_files:
+            plan["removed"].append(path)
+            plan["stale_ids"].extend(entry.get("chunk_ids", []))
+
+    if settings_changed:
+        logger.info("Chunker/embedding settings changed since last ingestion; re-indexing all files.")
+    return plan
+
+
+def get_index_version(manifest):
+    """
+    A short stamp identifying the exact content of the index.
+    Changes whenever any file is added, modified, removed or settings change.
+    """
+    if not manifest:
+        return "empty"
+    files = {path: entry.get("sha256") for path, entry in manifest.get("files", {}).items()}
+    payload = json.dumps({"settings": manifest.get("settings_hash"), "files": files}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,102 @@
+# src/metrics.py
+
+import time
+from contextlib import contextmanager
+from src.logger import get_logger
+
+logger = get_logger()
+
+
+class StageTimer:
+    """
+    Accumulates wall-clock time per named stage (load, chunk, embed, index, ...).
+    Use `with timer.stage("embed"):` around each stage, or `timer.add(...)`
+    for time measured elsewhere (e.g. inside a worker process).
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds, count=1):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    def as_dict(self):
+        return {name: {"seconds": round(self.seconds[name], 4), "count": self.counts[name]} for name in self.seconds}
+
+    def report(self, title="Stage timings"):
+        """
+        Logs one line per stage and returns the report as a string.
+        """
+        lines = [f"{title}:"]
+        for name, seconds in self.seconds.items():
+            lines.append(f"  {name:<24} {seconds:9.3f}s  (x{self.counts[name]})")
+        report = "\n".join(lines)
+        logger.info(report, extra={"stages": self.as_dict()})
+        return report
+
+
+class LatencyHistogram:
+    """
+    Keeps the most recent `max_samples` latencies (seconds) and reports percentiles.
+    """
+
+    def __init__(self, max_samples=10000):
+        from collections import deque
+
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+        }
+
+
+class LatencyRecorder:
+    """
+    Named LatencyHistograms, e.g. one per retrieval stage.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+
+    @contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, LatencyHistogram())
+        histogram.record(seconds)
+
+    def summary(self):
+        return {name: histogram.summary() for name, histogram in self.histograms.items()}
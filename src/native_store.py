@@ -0,0 +1,671 @@
+# src/native_store.py
+
+import bisect
+import json
+import os
+import threading
+from typing import Any, Iterable, List, Optional
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from src.logger import get_logger
+
+logger = get_logger()
+
+VECTORS_FILENAME = "vectors.npy"
+METADATA_FILENAME = "metadata.json"
+SEGMENTS_FILENAME = "segments.json"
+FAISS_FILENAME = "faiss.index"
+QUANTIZATIONS = ("float16", "int8")
+SCAN_BLOCK_ROWS = 16384
+
+
+def quantize(vectors, quantization):
+    """
+    Compresses L2-normalized float32 vectors for the coarse search pass.
+        - float16: plain half precision (2x smaller)
+        - int8:    symmetric per-row scaling to [-127, 127] (4x smaller)
+    Returns (codes, scales); scales is None for float16.
+    """
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if quantization == "float16":
+        return vectors.astype(np.float16), None
+    if quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.zeros(0, dtype=np.float32)
+        scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unknown quantization '{quantization}'; expected one of {QUANTIZATIONS}")
+
+
+def matches_filter(metadata, search_filter):
+    """
+    Chroma-style `where` filter on one metadata dict: {"key": value},
+    {"key": {"$eq"/"$ne"/"$in"/"$nin": ...}} and {"$and"/"$or": [...]}.
+    """
+    if not search_filter:
+        return True
+    for key, condition in search_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, c) for c in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class _Segment:
+    """
+    One run of consecutive rows: memory-mapped from its .npy file once saved, or an
+    in-memory buffer (grown geometrically, so appends are amortized O(rows added)) until then.
+    """
+
+    def __init__(self, vectors, stem=None, metadata_file=None):
+        self.stem = stem
+        self.metadata_file = metadata_file
+        self.buffer = vectors
+        self.rows = len(vectors)
+        self.codes = None
+        self.scales = None
+
+    @property
+    def saved(self):
+        return self.stem is not None
+
+    @property
+    def vectors(self):
+        return self.buffer[:self.rows]
+
+    def append(self, new):
+        import numpy as np
+
+        needed = self.rows + len(new)
+        if needed > len(self.buffer):
+            grown = np.empty((max(needed, 2 * len(self.buffer), 1024), new.shape[1]), dtype=np.float32)
+            grown[:self.rows] = self.buffer[:self.rows]
+            self.buffer = grown
+        self.buffer[self.rows:needed] = new
+        self.rows = needed
+        self.codes = self.scales = None
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vectorstore of L2-normalized float32 vectors with exact inner-product search,
+    batched over many queries at once.
+
+    Storage is append-only: rows live in segments (<seg>.npy matrix + <seg>.json ids/texts/metadata),
+    listed with their deleted rows in segments.json. Saved segments are memory-mapped; new rows collect
+    in an in-memory segment that save() writes as one new file, so each save costs the rows added since
+    the last one. Tail segments are merged while a segment is not larger than the one after it, which keeps
+    the number of segments logarithmic and the total write cost O(n log n). Deletes and replaced rows are
+    tombstones until their segment is merged.
+
+    Writes are persisted by save(): with autosave after every write, otherwise by the caller at its
+    commit points (ingestion saves before each checkpoint, see src/ingest.py).
+
+    With quantization ("float16" or "int8"), a compressed copy of each segment
+    (<seg>.<quantization>.npy) is scanned instead, and the best
+    k * rescore_factor candidates are rescored against the full-precision rows.
+    Only the compressed copy has to stay resident; the float32 files are memory-mapped
+    and read just for the candidates, and several processes share both through the page cache.
+    A store saved in the earlier single-file layout (vectors.npy + metadata.json) opens as one segment.
+    """
+
+    def __init__(self, embedding_function, persist_directory, autosave=True, quantization=None, rescore_factor=4):
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{quantization}'; expected one of {QUANTIZATIONS}")
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.autosave = autosave
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.segments = []
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self.dead = set()
+        self.row_of = {}
+        self.dirty = False
+        self._next_segment = 1
+        self._obsolete = []
+        self._alive = None
+        self._lock = threading.RLock()
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    @property
+    def dim(self):
+        return self.segments[0].vectors.shape[1] if self.segments else 0
+
+    # ---- persistence ----
+
+    @classmethod
+    def load(cls, embedding_function, persist_directory, **kwargs):
+        """
+        Opens the store in persist_directory (empty if nothing was saved yet).
+        Saved segments are memory-mapped read-only.
+        """
+        import numpy as np
+
+        store = cls(embedding_function, persist_directory, **kwargs)
+        segments_path = os.path.join(persist_directory, SEGMENTS_FILENAME)
+        if os.path.exists(segments_path):
+            with open(segments_path, "r", encoding="utf-8") as f:
+                layout = json.load(f)
+        elif os.path.exists(os.path.join(persist_directory, VECTORS_FILENAME)) and os.path.exists(os.path.join(persist_directory, METADATA_FILENAME)):
+            layout = {"next": 1, "segments": [{"stem": "vectors", "metadata": METADATA_FILENAME, "dead": []}]}
+        else:
+            layout = {"next": 1, "segments": []}
+
+        store._next_segment = layout["next"]
+        for entry in layout["segments"]:
+            vectors = np.load(os.path.join(persist_directory, entry["stem"] + ".npy"), mmap_mode="r")
+            with open(os.path.join(persist_directory, entry["metadata"]), "r", encoding="utf-8") as f:
+                sidecar = json.load(f)
+            offset = len(store.ids)
+            store.segments.append(_Segment(vectors, entry["stem"], entry["metadata"]))
+            store.ids.extend(sidecar["ids"])
+            store.texts.extend(sidecar["texts"])
+            store.metadatas.extend(sidecar["metadatas"])
+            store.dead.update(offset + row for row in entry["dead"])
+        store.row_of = {chunk_id: row for row, chunk_id in enumerate(store.ids) if row not in store.dead}
+        for segment in store.segments:
+            store._load_codes(segment)
+        store._after_load()
+        logger.info(f"Opened {cls.__name__} at '{persist_directory}' ({store.count()} vectors, {len(store.segments)} segments).")
+        return store
+
+    def _path(self, name):
+        return os.path.join(self.persist_directory, name)
+
+    def _codes_path(self, segment):
+        return self._path(f"{segment.stem}.{self.quantization}.npy")
+
+    def _scales_path(self, segment):
+        return self._path(f"{segment.stem}.int8.scales.npy")
+
+    def _load_codes(self, segment):
+        """
+        Memory-maps a saved segment's quantized copy, re-deriving it if it is missing or out of date.
+        """
+        import numpy as np
+
+        if self.quantization is None:
+            return
+        if os.path.exists(self._codes_path(segment)):
+            codes = np.load(self._codes_path(segment), mmap_mode="r")
+            scales = None
+            if self.quantization == "int8" and os.path.exists(self._scales_path(segment)):
+                scales = np.load(self._scales_path(segment), mmap_mode="r")
+            if len(codes) == segment.rows and (self.quantization != "int8" or (scales is not None and len(scales) == len(codes))):
+                segment.codes, segment.scales = codes, scales
+                return
+        logger.info(f"Quantizing {segment.rows} vectors of {segment.stem} to {self.quantization} ...")
+        self._save_codes(segment)
+
+    def _save_codes(self, segment):
+        import numpy as np
+
+        segment.codes, segment.scales = quantize(segment.vectors, self.quantization)
+        if segment.scales is not None:
+            _save_npy(self._scales_path(segment), segment.scales)
+            segment.scales = np.load(self._scales_path(segment), mmap_mode="r")
+        _save_npy(self._codes_path(segment), segment.codes)
+        segment.codes = np.load(self._codes_path(segment), mmap_mode="r")
+
+    def _segment_codes(self, segment):
+        if segment.codes is None:
+            segment.codes, segment.scales = quantize(segment.vectors, self.quantization)
+        return segment.codes, segment.scales
+
+    def _after_load(self):
+        pass
+
+    def _write_segment(self, vectors, ids, texts, metadatas):
+        """
+        Writes rows as a new segment file pair and returns it, memory-mapped.
+        """
+        import numpy as np
+
+        stem = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        _save_npy(self._path(stem + ".npy"), np.asarray(vectors, dtype=np.float32))
+        _write_json(self._path(stem + ".json"), {"ids": ids, "texts": texts, "metadatas": metadatas})
+        segment = _Segment(np.load(self._path(stem + ".npy"), mmap_mode="r"), stem, stem + ".json")
+        if self.quantization is not None:
+            self._save_codes(segment)
+        return segment
+
+    def save(self):
+        """
+        Persists the rows added since the last save as one new segment (merged with tail segments,
+        see _merge_start) and rewrites the small segments.json. Replaced segment files are removed
+        only after segments.json no longer lists them.
+        """
+        with self._lock:
+            if not self.dirty:
+                return
+            os.makedirs(self.persist_directory, exist_ok=True)
+            first = self._merge_start()
+            if first is not None:
+                self._rewrite_tail(first)
+            offsets = self._offsets()
+            layout = {"next": self._next_segment, "segments": []}
+            for segment, offset in zip(self.segments, offsets):
+                dead = sorted(row - offset for row in self.dead if offset <= row < offset + segment.rows)
+                layout["segments"].append({"stem": segment.stem, "metadata": segment.metadata_file, "dead": dead})
+            _write_json(self._path(SEGMENTS_FILENAME), layout)
+            for segment in self._obsolete:
+                for name in (segment.stem + ".npy", segment.metadata_file, f"{segment.stem}.float16.npy",
+                             f"{segment.stem}.int8.npy", f"{segment.stem}.int8.scales.npy"):
+                    if os.path.exists(self._path(name)):
+                        os.remove(self._path(name))
+            self._obsolete = []
+            self.dirty = False
+            self._save_index()
+
+    def _save_index(self):
+        pass
+
+    def _merge_start(self):
+        """
+        First segment to rewrite on save, or None. Unsaved rows are written together with the
+        tail segments that are less than twice their live size, so segment sizes at least double
+        towards the front and every row is rewritten O(log n) times. Once half the rows are
+        tombstones, everything is compacted.
+        """
+        if not self.segments:
+            return None
+        if len(self.dead) * 2 > len(self.ids):
+            return 0
+        if self.segments[-1].saved:
+            return None
+        offsets = self._offsets()
+        dead_in = [0] * len(self.segments)
+        for row in self.dead:
+            dead_in[bisect.bisect_right(offsets, row) - 1] += 1
+        live = [segment.rows - dead for segment, dead in zip(self.segments, dead_in)]
+        first, size = len(self.segments) - 1, live[-1]
+        while first > 0 and live[first - 1] < 2 * size:
+            first -= 1
+            size += live[first]
+        return first
+
+    def _rewrite_tail(self, first):
+        """
+        Replaces segments[first:] by one saved segment holding their live rows.
+        """
+        start = self._offsets()[first]
+        keep = [row for row in range(start, len(self.ids)) if row not in self.dead]
+        merged = [self._write_segment(
+            self._gather(keep), [self.ids[r] for r in keep], [self.texts[r] for r in keep], [self.metadatas[r] for r in keep]
+        )] if keep else []
+        self._obsolete.extend(segment for segment in self.segments[first:] if segment.saved)
+        self.segments = self.segments[:first] + merged
+        self.ids = self.ids[:start] + [self.ids[r] for r in keep]
+        self.texts = self.texts[:start] + [self.texts[r] for r in keep]
+        self.metadatas = self.metadatas[:start] + [self.metadatas[r] for r in keep]
+        self.dead = {row for row in self.dead if row < start}
+        for row in range(start, len(self.ids)):
+            self.row_of[self.ids[row]] = row
+        self._alive = None
+
+    def _changed(self):
+        self._alive = None
+        self.dirty = True
+        if self.autosave:
+            self.save()
+
+    # ---- rows ----
+
+    def count(self):
+        return len(self.row_of)
+
+    def _offsets(self):
+        offsets, offset = [], 0
+        for segment in self.segments:
+            offsets.append(offset)
+            offset += segment.rows
+        return offsets
+
+    def _gather(self, rows):
+        """
+        float32 vectors of the given (ascending) rows, read segment by segment.
+        """
+        import numpy as np
+
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        for segment, offset in zip(self.segments, self._offsets()):
+            inside = (rows >= offset) & (rows < offset + segment.rows)
+            if inside.any():
+                out[inside] = segment.vectors[rows[inside] - offset]
+        return out
+
+    def _alive_mask(self):
+        import numpy as np
+
+        if self._alive is None:
+            alive = np.ones(len(self.ids), dtype=bool)
+            if self.dead:
+                alive[list(self.dead)] = False
+            self._alive = alive
+        return self._alive
+
+    # ---- writes ----
+
+    def upsert_embeddings(self, ids, embeddings, documents, metadatas=None):
+        """
+        Inserts or replaces rows with precomputed vectors (appended; replaced rows become tombstones).
+        """
+        import numpy as np
+
+        if not ids:
+            return
+        metadatas = metadatas or [{}] * len(ids)
+        new = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(new, axis=1, keepdims=True)
+        new = new / np.where(norms == 0, 1, norms)
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self.row_of:
+                    self.dead.add(self.row_of.pop(chunk_id))
+            if not self.segments or self.segments[-1].saved:
+                self.segments.append(_Segment(np.empty((0, new.shape[1]), dtype=np.float32)))
+            self.segments[-1].append(new)
+            for chunk_id, text, metadata in zip(ids, documents, metadatas):
+                self.row_of[chunk_id] = len(self.ids)
+                self.ids.append(chunk_id)
+                self.texts.append(text)
+                self.metadatas.append(metadata or {})
+            self._changed()
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        import uuid
+
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = self.embedding_function.embed_documents(texts)
+        self.upsert_embeddings(ids, vectors, texts, metadatas)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            removed = [self.row_of.pop(i) for i in ids or [] if i in self.row_of]
+            if removed:
+                self.dead.update(removed)
+                self._changed()
+        return True
+
+    def get(self, ids=None, include=None, limit=None, offset=0):
+        """
+        Chroma-compatible `get`: returns {"ids", "documents", "metadatas"}.
+        """
+        include = ["documents", "metadatas"] if include is None else include
+        with self._lock:
+            if ids is None:
+                rows = sorted(self.row_of.values())[offset:]
+                rows = rows[:limit] if limit is not None else rows
+            else:
+                rows = [self.row_of[i] for i in ids if i in self.row_of]
+            return {
+                "ids": [self.ids[r] for r in rows],
+                "documents": [self.texts[r] for r in rows] if "documents" in include else None,
+                "metadatas": [self.metadatas[r] for r in rows] if "metadatas" in include else None,
+            }
+
+    # ---- search ----
+
+    def _allowed_rows(self, search_filter):
+        """
+        Mask of the rows a search may return (live and matching the filter), or None for all rows.
+        """
+        import numpy as np
+
+        allowed = self._alive_mask() if self.dead else None
+        if search_filter:
+            matching = np.array([matches_filter(m, search_filter) for m in self.metadatas], dtype=bool)
+            allowed = matching if allowed is None else allowed & matching
+        return allowed
+
+    def _exact_search(self, queries, k, allowed=None):
+        import numpy as np
+
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for segment, offset in zip(self.segments, self._offsets()):
+            scores[:, offset:offset + segment.rows] = queries @ np.asarray(segment.vectors).T
+        if allowed is not None:
+            scores[:, ~allowed] = -np.inf
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for qi, rows in enumerate(top):
+            rows = rows[np.argsort(-scores[qi, rows])]
+            results.append([(int(r), float(scores[qi, r])) for r in rows if np.isfinite(scores[qi, r])])
+        return results
+
+    def _quantized_search(self, queries, k, allowed=None):
+        """
+        Coarse scan over the quantized copy, then exact rescoring of the best candidates.
+        """
+        import numpy as np
+
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for segment, offset in zip(self.segments, self._offsets()):
+            codes, scales = self._segment_codes(segment)
+            # Decode block by block so a full float32 copy of the matrix is never materialized
+            for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+                block = np.asarray(codes[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+                scores[:, offset + start:offset + start + len(block)] = queries @ block.T
+            if scales is not None:
+                scores[:, offset:offset + segment.rows] *= scales
+        if allowed is not None:
+            scores[:, ~allowed] = -np.inf
+        n_candidates = min(scores.shape[1], k * self.rescore_factor)
+        candidates = np.argpartition(-scores, n_candidates - 1, axis=1)[:, :n_candidates]
+        results = []
+        for qi, rows in enumerate(candidates):
+            rows = np.sort(rows[np.isfinite(scores[qi, rows])])
+            exact = self._gather(rows) @ queries[qi]
+            order = np.argsort(-exact)[:k]
+            results.append([(int(rows[i]), float(exact[i])) for i in order])
+        return results
+
+    def _search(self, queries, k, allowed=None):
+        if self.quantization is not None:
+            return self._quantized_search(queries, k, allowed)
+        return self._exact_search(queries, k, allowed)
+
+    def memory_footprint(self):
+        """
+        Bytes scanned per query: the quantized copy when quantization is on, else the float32 matrix.
+        """
+        if self.quantization is None:
+            return int(sum(segment.vectors.nbytes for segment in self.segments))
+        total = 0
+        for segment in self.segments:
+            codes, scales = self._segment_codes(segment)
+            total += codes.nbytes + (scales.nbytes if scales is not None else 0)
+        return int(total)
+
+    def search_by_vectors(self, query_vectors, k=5, search_filter=None):
+        """
+        Top-k (Document, cosine score) lists for many query vectors in one matrix product.
+        """
+        import numpy as np
+
+        with self._lock:
+            if not self.row_of or len(query_vectors) == 0:
+                return [[] for _ in query_vectors]
+            queries = np.asarray(query_vectors, dtype=np.float32)
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = queries / np.where(norms == 0, 1, norms)
+            hits = self._search(queries, k, self._allowed_rows(search_filter))
+            return [
+                [(Document(page_content=self.texts[r], metadata=dict(self.metadatas[r]), id=self.ids[r]), s) for r, s in rows]
+                for rows in hits
+            ]
+
+    def similarity_search_with_score(self, query: str, k: int = 5, filter: Optional[dict] = None, **kwargs: Any):
+        vector = self.embedding_function.embed_query(query)
+        return self.search_by_vectors([vector], k=k, search_filter=filter)[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 5, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.search_by_vectors([embedding], k=k, search_filter=filter)[0]]
+
+    def similarity_search(self, query: str, k: int = 5, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, persist_directory="outputs/numpy_store", **kwargs):
+        store = cls(embedding, persist_directory, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+def _save_npy(path, array):
+    import numpy as np
+
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(path + ".tmp", path)
+
+
+def _write_json(path, data):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def _import_faiss():
+    try:
+        import faiss
+    except ImportError as e:
+        raise ImportError(
+            "The faiss-flat/faiss-ivf/faiss-hnsw backends need FAISS (pip install faiss-cpu); "
+            "vector_backend='numpy' needs no extra package."
+        ) from e
+    return faiss
+
+
+class FaissVectorStore(NumpyVectorStore):
+    """
+    NumpyVectorStore searched through a FAISS index (inner product on normalized vectors):
+        - "flat": exact search (faiss.IndexFlatIP)
+        - "ivf":  inverted lists, nlist ≈ 4·sqrt(n), `nprobe` lists probed per query
+        - "hnsw": graph search, `ef_search` candidates per query
+    The FAISS index covers the live rows (its positions map to chunk ids, so merging segments
+    keeps it valid). It is rebuilt after writes on the next search and saved with the store.
+    Filtered queries over-fetch and fall back to an exact scan when too few candidates survive the filter.
+    FAISS is an optional dependency (faiss-cpu); opening this store without it raises ImportError.
+    """
+
+    def __init__(self, embedding_function, persist_directory, autosave=True, index_type="flat", nprobe=8, ef_search=64, hnsw_m=32):
+        _import_faiss()
+        super().__init__(embedding_function, persist_directory, autosave=autosave)
+        if index_type not in ("flat", "ivf", "hnsw"):
+            raise ValueError(f"Unknown FAISS index type: {index_type}")
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.hnsw_m = hnsw_m
+        self.index = None
+        self.index_ids = []
+
+    def _index_path(self):
+        return os.path.join(self.persist_directory, f"{self.index_type}.{FAISS_FILENAME}")
+
+    def _index_ids_path(self):
+        return self._index_path() + ".ids.json"
+
+    def _after_load(self):
+        faiss = _import_faiss()
+
+        path, ids_path = self._index_path(), self._index_ids_path()
+        if os.path.exists(path) and os.path.exists(ids_path):
+            with open(ids_path, "r", encoding="utf-8") as f:
+                index_ids = json.load(f)
+            index = faiss.read_index(path)
+            if index.ntotal == len(index_ids) == self.count() and all(i in self.row_of for i in index_ids):
+                self.index, self.index_ids = index, index_ids
+
+    def _changed(self):
+        self.index = None
+        super()._changed()
+
+    def _save_index(self):
+        faiss = _import_faiss()
+
+        if self.index is None:
+            # A stale index file would be picked up on the next load; drop it
+            for path in (self._index_path(), self._index_ids_path()):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        os.makedirs(self.persist_directory, exist_ok=True)
+        faiss.write_index(self.index, self._index_path() + ".tmp")
+        os.replace(self._index_path() + ".tmp", self._index_path())
+        _write_json(self._index_ids_path(), self.index_ids)
+
+    def _build_index(self):
+        faiss = _import_faiss()
+        import numpy as np
+
+        rows = sorted(self.row_of.values())
+        vectors = np.ascontiguousarray(self._gather(rows))
+        n, dim = vectors.shape
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        elif self.index_type == "ivf" and n >= 64:
+            nlist = max(1, min(n // 39, int(4 * n ** 0.5)))
+            index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        else:
+            # IVF needs enough points to train its centroids; tiny corpora are searched exactly
+            index = faiss.IndexFlatIP(dim)
+        index.add(vectors)
+        logger.info(f"Built FAISS {self.index_type} index over {n} vectors.")
+        self.index, self.index_ids = index, [self.ids[r] for r in rows]
+        if not self.dirty and os.path.isdir(self.persist_directory):
+            # Store and index are both on disk now; unsaved writes save it with the next save()
+            self._save_index()
+
+    def _search(self, queries, k, allowed=None):
+        if self.index is None:
+            self._build_index()
+        if hasattr(self.index, "nprobe"):
+            self.index.nprobe = self.nprobe
+        if hasattr(self.index, "hnsw"):
+            self.index.hnsw.efSearch = max(self.ef_search, k)
+
+        fetch_k = k if allowed is None else min(self.count(), k * 4)
+        scores, positions = self.index.search(queries, fetch_k)
+        results = []
+        for qi in range(len(queries)):
+            rows = [(self.row_of[self.index_ids[p]], float(s)) for p, s in zip(positions[qi], scores[qi]) if p >= 0]
+            hits = [(r, s) for r, s in rows if allowed is None or allowed[r]]
+            if allowed is not None and len(hits) < min(k, int(allowed.sum())):
+                hits = self._exact_search(queries[qi:qi + 1], k, allowed)[0]
+            results.append(hits[:k])
+        return results
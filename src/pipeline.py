@@ -1,51 +1,402 @@
 # src/pipeline.py
 
-from src.loaders import load_pdf_pages
-from src.chunkers import run_semantic_chunking
-from src.embeddings import get_fastembed_embedding
-from src.vectorstore import create_chroma_vectorstore
-from src.llms import get_gemini_llm, get_groq_llm
-from src.retriever import get_retriever
-from src.chain import get_semantic_rag_chain
-from src.postprocess import spacy_polish
+import dataclasses
+import hashlib
+import json
+import os
+from typing import Optional
 from src.logger import get_logger
 
 logger = get_logger()
 
-def run_rag_pipeline(
+@dataclasses.dataclass(frozen=True)
+class IndexSettings:
+    """
+    How documents are chunked, embedded and stored (see build_index).
+    """
+
+    chroma_persist_dir: str = "outputs/chroma_semantic_allpdfs_v2"
+    chunk_size: int = 2000
+    chunk_overlap: int = 50
+    breakpoint_percentile: float = 95
+    chunker: str = "semantic"
+    embedding_model: str = "BAAI/bge-base-en-v1.5"
+    force_reindex: bool = False
+    reuse_sentence_embeddings: bool = True
+    workers: int = 1
+    batch_size: int = 256
+    keyword_index: bool = True
+    vector_backend: str = "chroma"
+    vector_quantization: Optional[str] = None
+    embedding_disk_cache: bool = True
+
+@dataclasses.dataclass(frozen=True)
+class PipelineSettings:
+    """
+    Everything run_rag_pipeline builds from: the index settings plus retrieval, answering,
+    caching and course options. keyword_index is derived from retrieval_mode.
+    """
+
+    index: IndexSettings = dataclasses.field(default_factory=IndexSettings)
+    top_k: int = 5
+    llm_backend: str = "groq"
+    answer_cache: bool = True
+    cache_similarity_threshold: float = 0.95
+    retrieval_disk_cache: bool = False
+    retrieval_mode: str = "dense"
+    rerank: bool = False
+    rerank_candidates: int = 20
+    rerank_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rerank_budget_ms: float = 500
+    pack_context: bool = True
+    context_token_budget: Optional[int] = None
+    answer_mode: str = "generative"
+    extractive_model: str = "distilbert-base-cased-distilled-squad"
+    extractive_min_score: float = 0.5
+    course_map: Optional[str] = None
+    courses: Optional[list] = None
+    search_filter: Optional[dict] = None
+    tracing: bool = True
+
+    def replace(self, **options):
+        """
+        Copy with options changed; IndexSettings fields (chunk_size, vector_backend, ...) go to .index.
+        """
+        index_fields = {field.name for field in dataclasses.fields(IndexSettings)}
+        index_options = {name: options.pop(name) for name in list(options) if name in index_fields}
+        return dataclasses.replace(self, index=dataclasses.replace(self.index, **index_options), **options)
+
+class RagIndex:
+    """
+    Everything retrieval needs from one ingestion run.
+    """
+
+    def __init__(self, embed_model, vectorstore, index_version, keyword_index=None):
+        self.embed_model = embed_model
+        self.vectorstore = vectorstore
+        self.index_version = index_version
+        self.keyword_index = keyword_index
+
+class PartitionedIndex:
+    """
+    One RagIndex per course (see build_partitioned_index), all sharing one embedding model.
+    """
+
+    def __init__(self, embed_model, partitions):
+        self.embed_model = embed_model
+        self.partitions = partitions
+        stamp = ",".join(f"{course}={index.index_version}" for course, index in sorted(partitions.items()))
+        self.index_version = hashlib.sha256(stamp.encode("utf-8")).hexdigest()[:16]
+
+def load_embedding_model(embedding_model="BAAI/bge-base-en-v1.5", disk_cache_dir=None):
+    """
+    The embedding model behind the shared batching executor (EMBED_* settings in src/config.py),
+    with query embeddings memoized. With disk_cache_dir, vectors are also cached on disk by
+    text hash (embedding_cache.sqlite3).
+    """
+    from src.embeddings import get_embedding_model, BatchingEmbeddings, CachedQueryEmbeddings
+    from src.config import EMBED_MAX_BATCH_SIZE, EMBED_MAX_WAIT_MS, EMBED_WORKERS, EMBED_THREADS
+
+    batching_model = BatchingEmbeddings(
+        get_embedding_model(embedding_model, threads=EMBED_THREADS),
+        model_name=embedding_model,
+        max_batch_size=EMBED_MAX_BATCH_SIZE,
+        max_wait_ms=EMBED_MAX_WAIT_MS,
+        workers=EMBED_WORKERS,
+        disk_cache_path=os.path.join(disk_cache_dir, "embedding_cache.sqlite3") if disk_cache_dir else None,
+    )
+    return CachedQueryEmbeddings(batching_model)
+
+def build_index(
     pdf_files,
-    chroma_persist_dir="outputs/chroma_semantic_allpdfs_v2",
-    chunk_size=2000,
-    chunk_overlap=50,
+    settings=None,
+    timer=None,
+    course=None,
+    embed_model=None,
+    parse_cache_dir=None,
+    chunk_stats=None,
+    **options
+):
+    """
+    Loads the embedding model, opens the vectorstore (Chroma by default, or an in-process
+    NumPy/FAISS store, see VECTOR_BACKENDS) and incrementally syncs it with pdf_files
+    (PDF, DOCX or plain text, see src/loaders.py; parsed text is cached under parsed_cache/).
+    With keyword_index, a BM25 inverted index is maintained alongside the Chroma collection.
+    Embedding calls go through a shared micro-batching executor (see load_embedding_model);
+    pass embed_model to share one between indexes.
+    breakpoint_percentile sets the SemanticChunker split threshold (lower: more, smaller chunks).
+    chunker="structured" splits on headings and pages first and only searches sections longer than
+    chunk_size for semantic breakpoints (see StructuredChunker); the default "semantic" pre-chunks by
+    characters and embeds every sentence. Pass a ChunkStats as chunk_stats to collect chunk-boundary statistics.
+    With course, every chunk is tagged with it (one partition of build_partitioned_index).
+    Pass a StageTimer as timer to collect ingestion stage timings (load, prechunk, embed, ...).
+    Settings come from an IndexSettings, with keyword options overriding its fields:
+    build_index(files, IndexSettings(chunker="structured"), chunk_size=1000).
+    Returns: RagIndex
+    """
+    # Imported here so that importing src.pipeline stays cheap (LangChain loads on first build)
+    from src.vectorstore import load_vectorstore
+    from src.ingest import sync_vectorstore
+    from src.bm25 import BM25Index
+    from src.loaders import LOADER_VERSION
+    from src.cleaning import CLEANER_VERSION
+    from src.chunkers import METADATA_VERSION, StructuralSplitter, StructuredChunker
+
+    settings = dataclasses.replace(settings or IndexSettings(), **options)
+
+    # 1. Embedding model behind the batching executor (query embeddings memoized)
+    if embed_model is None:
+        embed_model = load_embedding_model(settings.embedding_model, disk_cache_dir=settings.chroma_persist_dir if settings.embedding_disk_cache else None)
+
+    # 2. Pre-chunker (and, for the structure-first mode, its chunker)
+    if settings.chunker == "structured":
+        pre_chunker = StructuralSplitter(chunk_size=settings.chunk_size)
+        semantic_chunker = StructuredChunker(embed_model, max_chunk_size=settings.chunk_size, breakpoint_percentile=settings.breakpoint_percentile)
+        # v3: overlapping windows (stride) and size splits of sections too short to search
+        chunker_stamp = f"structured-v3-percentile{settings.breakpoint_percentile:g}-w{semantic_chunker.window}s{semantic_chunker.stride}"
+    elif settings.chunker == "semantic":
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        pre_chunker = RecursiveCharacterTextSplitter(chunk_size=settings.chunk_size, chunk_overlap=settings.chunk_overlap)
+        semantic_chunker = None
+        # The default threshold keeps the original stamp, so existing indexes stay valid
+        chunker_stamp = "semantic-percentile" + (f"{settings.breakpoint_percentile:g}" if settings.breakpoint_percentile != 95 else "")
+    else:
+        raise ValueError(f"Unknown chunker '{settings.chunker}'; expected 'semantic' or 'structured'")
+
+    # 3. Vectorstore (opened, not rebuilt)
+    vectorstore = load_vectorstore(embed_model, persist_directory=settings.chroma_persist_dir, backend=settings.vector_backend, quantization=settings.vector_quantization)
+
+    # 4. Keyword index, kept in step with the vectorstore
+    bm25_path = os.path.join(settings.chroma_persist_dir, "bm25_index.json")
+    bm25 = BM25Index.load(bm25_path) if settings.keyword_index else None
+
+    # 5. Incremental ingestion: only new/modified documents are chunked and embedded
+    ingest_settings = {
+        "chunk_size": settings.chunk_size,
+        "chunk_overlap": settings.chunk_overlap,
+        "embedding_model": settings.embedding_model,
+        "chunker": chunker_stamp,
+        "chunk_vectors": "pooled" if settings.reuse_sentence_embeddings else "direct",
+        "vector_backend": settings.vector_backend,
+        "loader_version": LOADER_VERSION,
+        "cleaner_version": CLEANER_VERSION,
+        "metadata_version": METADATA_VERSION,
+        "course": course,
+    }
+    index_version = sync_vectorstore(
+        pdf_files,
+        vectorstore,
+        pre_chunker,
+        embed_model,
+        persist_directory=settings.chroma_persist_dir,
+        settings=ingest_settings,
+        force_reindex=settings.force_reindex,
+        reuse_sentence_embeddings=settings.reuse_sentence_embeddings,
+        workers=settings.workers,
+        batch_size=settings.batch_size,
+        keyword_index=bm25,
+        keyword_index_path=bm25_path,
+        parse_cache_dir=parse_cache_dir or os.path.join(settings.chroma_persist_dir, "parsed_cache"),
+        timer=timer,
+        chunk_metadata={"course": course} if course else None,
+        breakpoint_percentile=settings.breakpoint_percentile,
+        semantic_chunker=semantic_chunker,
+        chunk_stats=chunk_stats,
+    )
+    if bm25 is not None and bm25.index_version != index_version:
+        logger.info("BM25 index is out of date with the vectorstore; rebuilding it.")
+        bm25 = BM25Index.from_vectorstore(vectorstore)
+        bm25.save(bm25_path, index_version=index_version)
+    return RagIndex(embed_model, vectorstore, index_version, keyword_index=bm25)
+
+def build_partitioned_index(
+    pdf_files,
+    course_map,
+    settings=None,
+    courses=None,
+    timer=None,
+    chunk_stats=None,
+    **options
+):
+    """
+    Partitioned layout: documents are grouped by course (course_map, see src/courses.py) and
+    each course is indexed on its own under <persist_dir>/courses/<course>/ (vectorstore,
+    manifest, BM25 index), with its chunks tagged course/document/page. The parse cache and
+    the embedding model (with its disk cache) are shared by all partitions.
+    With courses, only those partitions are synced and opened.
+    Settings are build_index's: an IndexSettings and/or keyword overrides of its fields.
+    Returns: PartitionedIndex
+    """
+    from src.courses import load_course_map, group_by_course, course_slug
+
+    settings = dataclasses.replace(settings or IndexSettings(), **options)
+    groups = group_by_course(pdf_files, load_course_map(course_map))
+    if courses:
+        courses = [courses] if isinstance(courses, str) else list(courses)
+        unknown = [course for course in courses if course not in groups]
+        if unknown:
+            raise ValueError(f"No documents for course(s) {unknown}; courses of these documents: {list(groups)}")
+        groups = {course: groups[course] for course in courses}
+
+    persist_dir = settings.chroma_persist_dir
+    embed_model = load_embedding_model(settings.embedding_model, disk_cache_dir=persist_dir if settings.embedding_disk_cache else None)
+    partitions = {}
+    for course, files in groups.items():
+        logger.info(f"📚 Course '{course}': {len(files)} documents.")
+        partitions[course] = build_index(
+            files,
+            settings,
+            chroma_persist_dir=os.path.join(persist_dir, "courses", course_slug(course)),
+            course=course,
+            embed_model=embed_model,
+            parse_cache_dir=os.path.join(persist_dir, "parsed_cache"),
+            timer=timer,
+            chunk_stats=chunk_stats,
+        )
+    return PartitionedIndex(embed_model, partitions)
+
+def get_pipeline_retriever(
+    rag_index,
     top_k=5,
-    llm_backend="groq"
+    retrieval_mode="dense",
+    rerank=False,
+    rerank_candidates=20,
+    rerank_model="cross-encoder/ms-marco-MiniLM-L-6-v2",
+    rerank_budget_ms=500,
+    search_filter=None,
+    disk_cache_path=None,
 ):
-    # 1. Embedding model
-    embed_model = get_fastembed_embedding()
+    """
+    The retriever run_rag_pipeline answers from, for a RagIndex or a PartitionedIndex:
+    dense or hybrid (BM25 + rank fusion), over the partitions a filter selects, optionally
+    reranked (rerank_candidates fetched, the cross-encoder keeps the best top_k).
+    """
+    from src.retriever import get_retriever, get_hybrid_retriever, get_partitioned_retriever
+    from src.bm25 import PartitionedKeywordIndex
+    from src.rerank import CrossEncoderReranker, RerankingRetriever
 
-    # 2. Pre-chunker
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-    pre_chunker = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    fetch_k = max(top_k, rerank_candidates) if rerank else top_k
+    embed_model, index_version = rag_index.embed_model, rag_index.index_version
+    partitioned = isinstance(rag_index, PartitionedIndex)
+    partitions = {course: index.vectorstore for course, index in rag_index.partitions.items()} if partitioned else None
+    if retrieval_mode == "hybrid":
+        keyword_index = (
+            PartitionedKeywordIndex({course: index.keyword_index for course, index in rag_index.partitions.items()})
+            if partitioned else rag_index.keyword_index
+        )
+        retriever = get_hybrid_retriever(
+            None if partitioned else rag_index.vectorstore,
+            keyword_index,
+            k=fetch_k,
+            index_version=index_version,
+            search_filter=search_filter,
+            disk_cache_path=disk_cache_path,
+            partitions=partitions,
+            embed_model=embed_model,
+        )
+    elif partitioned:
+        retriever = get_partitioned_retriever(
+            partitions,
+            embed_model,
+            k=fetch_k,
+            index_version=index_version,
+            search_filter=search_filter,
+            disk_cache_path=disk_cache_path,
+        )
+    else:
+        retriever = get_retriever(
+            rag_index.vectorstore,
+            k=fetch_k,
+            index_version=index_version,
+            search_filter=search_filter,
+            disk_cache_path=disk_cache_path,
+        )
+    if rerank:
+        reranker = CrossEncoderReranker(model_name=rerank_model, latency_budget_ms=rerank_budget_ms)
+        retriever = RerankingRetriever(base_retriever=retriever, reranker=reranker, k=top_k)
+    return retriever
 
-    # 3. Semantic chunking (pre-chunking & semantic chunking)
-    all_semantic_chunks = run_semantic_chunking(pdf_files, pre_chunker, embed_model)
+def run_rag_pipeline(pdf_files, settings=None, **options):
+    """
+    Builds (or opens) the index for pdf_files and returns the answering chain.
+    Settings come from a PipelineSettings, with keyword options overriding its fields or
+    those of its IndexSettings: run_rag_pipeline(files, llm_backend="gemini", chunk_size=1000).
+    """
+    from src.llms import get_chat_model
+    from src.chain import get_semantic_rag_chain
+    from src.cache import SemanticAnswerCache, CachedRagChain
+    from src.context import get_context_packer
+    from src.extractive import ExtractiveReader, ExtractiveFirstChain
+    from src.tracing import TracedChain
 
-    # 4. Vectorstore
-    vectorstore = create_chroma_vectorstore(all_semantic_chunks, embed_model, persist_directory=chroma_persist_dir)
+    # 1-5. Embedding model, vectorstore, keyword index and incremental ingestion.
+    #      With a course_map, one partition per course (only `courses`, if given, are opened).
+    settings = (settings or PipelineSettings()).replace(**options)
+    index_settings = dataclasses.replace(settings.index, keyword_index=settings.retrieval_mode == "hybrid")
+    if settings.course_map is not None:
+        rag_index = build_partitioned_index(pdf_files, settings.course_map, index_settings, courses=settings.courses)
+        scope = ",".join(rag_index.partitions)
+    else:
+        rag_index = build_index(pdf_files, index_settings)
+        scope = ""
+    embed_model, index_version = rag_index.embed_model, rag_index.index_version
+    if settings.search_filter:
+        scope += f"|{json.dumps(settings.search_filter, sort_keys=True)}"
 
-    # 5. Retriever
-    retriever = get_retriever(vectorstore, k=top_k)
+    # 5. Retriever (top-k results memoized per index version; hybrid adds BM25 + rank fusion).
+    #    With partitions, only the courses a filter selects are searched.
+    #    search_filter is fixed for the pipeline; a filter can also be given per call:
+    #    chain.invoke(question, config={"configurable": {"search_filter": {"course": "nlp"}}}).
+    #    With rerank, rerank_candidates are fetched and a cross-encoder keeps the best top_k.
+    fetch_k = max(settings.top_k, settings.rerank_candidates) if settings.rerank else settings.top_k
+    retriever = get_pipeline_retriever(
+        rag_index,
+        top_k=settings.top_k,
+        retrieval_mode=settings.retrieval_mode,
+        rerank=settings.rerank,
+        rerank_candidates=settings.rerank_candidates,
+        rerank_model=settings.rerank_model,
+        rerank_budget_ms=settings.rerank_budget_ms,
+        search_filter=settings.search_filter,
+        disk_cache_path=os.path.join(index_settings.chroma_persist_dir, "retrieval_cache.sqlite3") if settings.retrieval_disk_cache else None,
+    )
 
     # 6. LLM selection
-    if llm_backend == "groq":
-        chat_model = get_groq_llm()
-        logger.info("Using Groq LLM for answering.")
+    chat_model = get_chat_model(settings.llm_backend)
+
+    # 7. Semantic RAG Chain (retrieved chunks deduplicated and packed into the backend's token budget)
+    context_packer = get_context_packer(settings.llm_backend, token_budget=settings.context_token_budget) if settings.pack_context else None
+    #    In "extractive-first" mode a local QA reader answers confident factual lookups without the LLM.
+    if settings.answer_mode == "extractive-first":
+        reader = ExtractiveReader(model_name=settings.extractive_model, min_score=settings.extractive_min_score)
+        semantic_rag_chain = ExtractiveFirstChain(retriever, chat_model, reader, context_packer=context_packer)
     else:
-        chat_model = get_gemini_llm()
-        logger.info("Using Gemini LLM for answering.")
+        semantic_rag_chain = get_semantic_rag_chain(retriever, chat_model, context_packer=context_packer)
+
+    # 8. Semantic answer cache (invalidated whenever the index or answer settings change;
+    #    one file per course selection/filter, fixed or per call, so scoped questions never share answers)
+    if settings.answer_cache:
+        namespace = (
+            f"{index_version}:{settings.llm_backend}:k{settings.top_k}:{settings.retrieval_mode}"
+            + (f":rerank{fetch_k}:{settings.rerank_model}" if settings.rerank else "")
+            + (f":ctx{context_packer.token_budget}" if context_packer else "")
+            + (f":extractive:{settings.extractive_model}:{settings.extractive_min_score}" if settings.answer_mode == "extractive-first" else "")
+        )
+
+        def open_answer_cache(call_scope):
+            cache_scope = scope + (f"|call={call_scope}" if call_scope else "")
+            return SemanticAnswerCache(
+                embed_model,
+                namespace=namespace + (f":scope={cache_scope}" if cache_scope else ""),
+                path=os.path.join(index_settings.chroma_persist_dir, "answer_cache" + (f"-{hashlib.sha256(cache_scope.encode('utf-8')).hexdigest()[:12]}" if cache_scope else "")),
+                similarity_threshold=settings.cache_similarity_threshold,
+            )
+
+        semantic_rag_chain = CachedRagChain(semantic_rag_chain, open_answer_cache)
 
-    # 7. Semantic RAG Chain
-    semantic_rag_chain = get_semantic_rag_chain(retriever, chat_model)
+    # 9. Per-query tracing: every answer logs its retrieve/prompt/LLM/polish breakdown (src/tracing.py)
+    if settings.tracing:
+        semantic_rag_chain = TracedChain(semantic_rag_chain)
 
     logger.info("RAG pipeline fully initialized.")
 
@@ -1,18 +1,78 @@
 # src/postprocess.py
 
 import re
-import spacy
+from functools import lru_cache
+from src.tracing import span
 from src.logger import get_logger
 
 logger = get_logger()
-nlp = spacy.load("en_core_web_sm")
 
+@lru_cache(maxsize=None)
+def get_nlp():
+    """
+    Builds a sentencizer-only spaCy pipeline on first use and reuses it afterwards.
+    Polishing only needs sentence boundaries, so the tagger/parser/NER of
+    en_core_web_sm (and the model download) are not needed.
+    """
+    import spacy
+
+    logger.info("Loading spaCy sentencizer pipeline")
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+def _polish_joined(sentences):
+    # Newlines, tabs and runs of spaces become single spaces (slashes are kept)
+    return " ".join(" ".join(sent.split()) for sent in sentences).strip()
+
+@span("polish")
 def spacy_polish(text):
-    doc = nlp(text)
-    clean = " ".join(sent.text.strip() for sent in doc.sents)
-    # Remove all newlines and tabs ONLY (not slashes)
-    clean = re.sub(r'[\n\t]+', ' ', clean)
-    # Collapse multiple spaces
-    clean = re.sub(r' +', ' ', clean)
+    # Output parsers may hand back str subclasses, which the tokenizer rejects
+    doc = get_nlp()(str(text))
+    clean = _polish_joined(sent.text for sent in doc.sents)
     logger.debug("Polished answer with spaCy.")
-    return clean.strip()
+    return clean
+
+@span("polish")
+def spacy_polish_many(texts, batch_size=64):
+    """
+    spacy_polish for many answers at once (e.g. batch QA), batched through nlp.pipe.
+    """
+    return [_polish_joined(sent.text for sent in doc.sents) for doc in get_nlp().pipe((str(t) for t in texts), batch_size=batch_size)]
+
+# A sentence can only have ended once terminal punctuation is followed by whitespace
+_SENTENCE_END = re.compile(r'[.!?]["\')\]]*\s')
+
+def spacy_polish_stream(tokens):
+    """
+    Incremental spacy_polish for streamed answers.
+    Buffers incoming tokens and, whenever a sentence may have ended, yields the
+    polished text of every completed sentence; the unfinished tail stays buffered
+    until more tokens arrive. Each sentence is processed once, not the whole answer
+    on every token.
+    """
+    buffer = ""
+    scanned = 0
+    first = True
+    for token in tokens:
+        buffer += token
+        if not _SENTENCE_END.search(buffer, max(scanned - 4, 0)):
+            scanned = len(buffer)
+            continue
+        with span("polish"):
+            sents = list(get_nlp()(buffer).sents)
+        scanned = len(buffer)
+        if len(sents) < 2:
+            continue
+        # All but the last sentence are complete
+        done = _polish_joined(sent.text for sent in sents[:-1])
+        buffer = buffer[sents[-1].start_char:]
+        scanned = 0
+        if done:
+            yield done if first else " " + done
+            first = False
+    with span("polish"):
+        tail = _polish_joined(sent.text for sent in get_nlp()(buffer).sents) if buffer.strip() else ""
+    if tail:
+        yield tail if first else " " + tail
+    logger.debug("Polished streamed answer with spaCy.")
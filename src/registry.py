@@ -0,0 +1,183 @@
+# src/registry.py
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from src.pipeline import IndexSettings, run_rag_pipeline
+from src.logger import get_logger
+
+logger = get_logger()
+
+
+def corpus_fingerprint(pdf_files):
+    """
+    Cheap change detector for the corpus: (path, size, mtime) of every file.
+    Content hashing is left to the ingestion manifest during the actual rebuild.
+    """
+    fingerprint = []
+    for path in sorted(pdf_files):
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+
+def persist_root(options):
+    """
+    Persist directory a configuration's options point at (run_rag_pipeline's default if none).
+    """
+    if options.get("chroma_persist_dir"):
+        return options["chroma_persist_dir"]
+    settings = options.get("settings")
+    if settings is not None:
+        return settings.index.chroma_persist_dir
+    return IndexSettings().chroma_persist_dir
+
+
+class PipelineHandle:
+    """
+    One initialized pipeline, shared read-only by every session using the same configuration.
+    persist_dir is the index directory it reads (None: the one its options point at).
+    """
+
+    def __init__(self, key, chain, fingerprint, init_seconds, persist_dir=None):
+        self.key = key
+        self.chain = chain
+        self.fingerprint = fingerprint
+        self.init_seconds = init_seconds
+        self.persist_dir = persist_dir
+        self.created_at = time.time()
+
+
+class PipelineRegistry:
+    """
+    Process-wide, thread-safe registry of RAG pipelines keyed by configuration
+    (PDF set, embedding model, LLM backend and any other run_rag_pipeline options).
+    Each configuration is initialized exactly once, even when many sessions ask
+    for it at the same moment. When the corpus changes on disk, the new pipeline
+    is built in the background while the old one keeps serving (warm reload): the
+    rebuild syncs a copy of the index in a directory of its own (<persist_dir>.v<corpus hash>),
+    so the serving pipeline never sees a half-applied update.
+    """
+
+    def __init__(self, builder=run_rag_pipeline):
+        self.builder = builder
+        self._handles = {}
+        self._key_locks = {}
+        self._reloading = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(pdf_files, **options):
+        # Options are frozen to JSON: lists (courses) and dicts (search_filter) are valid values
+        return (tuple(sorted(pdf_files)), json.dumps(options, sort_keys=True, default=repr))
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _build(self, key, pdf_files, options, fingerprint=None, persist_dir=None):
+        fingerprint = fingerprint or corpus_fingerprint(pdf_files)
+        if persist_dir is not None:
+            options = {**options, "chroma_persist_dir": persist_dir}
+        start = time.perf_counter()
+        chain = self.builder(list(pdf_files), **options)
+        init_seconds = time.perf_counter() - start
+        logger.info(f"Pipeline initialized in {init_seconds:.2f}s for {len(pdf_files)} files.")
+        return PipelineHandle(key, chain, fingerprint, init_seconds, persist_dir=persist_dir)
+
+    def get(self, pdf_files, reload_if_changed=True, **options):
+        """
+        Returns the PipelineHandle for this configuration, building it on first use.
+        If reload_if_changed and the corpus changed since the handle was built,
+        a background rebuild is started and the current handle is returned meanwhile.
+        """
+        key = self.make_key(pdf_files, **options)
+        handle = self._handles.get(key)
+        if handle is None:
+            with self._key_lock(key):
+                handle = self._handles.get(key)
+                if handle is None:
+                    handle = self._build(key, pdf_files, options)
+                    self._handles[key] = handle
+            return handle
+
+        if reload_if_changed and corpus_fingerprint(pdf_files) != handle.fingerprint:
+            self.reload(pdf_files, background=True, **options)
+        return handle
+
+    def reload(self, pdf_files, background=False, **options):
+        """
+        Rebuilds a configuration and swaps it in once ready; sessions keep using the
+        previous pipeline until then. Only one reload per configuration runs at a time.
+        """
+        key = self.make_key(pdf_files, **options)
+        with self._lock:
+            if key in self._reloading:
+                return
+            self._reloading.add(key)
+
+        def rebuild():
+            try:
+                logger.info("Corpus changed; rebuilding pipeline in the background.")
+                current = self._handles.get(key)
+                root = persist_root(options)
+                source = (current.persist_dir if current else None) or root
+                fingerprint = corpus_fingerprint(pdf_files)
+                stamp = hashlib.sha256(repr(fingerprint).encode("utf-8")).hexdigest()[:12]
+                target = f"{root}.v{stamp}"
+                # Incremental sync of a copy; the serving pipeline keeps reading `source` untouched
+                shutil.rmtree(target, ignore_errors=True)
+                if os.path.isdir(source):
+                    shutil.copytree(source, target)
+                handle = self._build(key, pdf_files, options, fingerprint=fingerprint, persist_dir=target)
+                with self._key_lock(key):
+                    self._handles[key] = handle
+                # Sessions may still be answering from the previous copy; older ones are unused
+                for stale in glob.glob(glob.escape(root) + ".v*"):
+                    if stale not in (target, source):
+                        shutil.rmtree(stale, ignore_errors=True)
+            except Exception as e:
+                logger.error(f"Pipeline reload failed; keeping the previous pipeline: {e}")
+            finally:
+                with self._lock:
+                    self._reloading.discard(key)
+
+        if background:
+            threading.Thread(target=rebuild, name="pipeline-reload", daemon=True).start()
+        else:
+            rebuild()
+
+    def stats(self):
+        return [
+            {
+                "files": list(handle.key[0]),
+                "options": json.loads(handle.key[1]),
+                "init_seconds": round(handle.init_seconds, 3),
+                "created_at": handle.created_at,
+                "reloading": handle.key in self._reloading,
+            }
+            for handle in self._handles.values()
+        ]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Returns the process-wide PipelineRegistry.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PipelineRegistry()
+    return _registry
@@ -0,0 +1,124 @@
+# src/rerank.py
+
+import threading
+import time
+from functools import lru_cache
+from typing import Any, List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from src.metrics import LatencyRecorder
+from src.retriever import FilterableRetriever
+from src.tracing import record_span
+from src.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+@lru_cache(maxsize=None)
+def get_cross_encoder(model_name=DEFAULT_RERANK_MODEL, max_length=512):
+    """
+    Loads a sentence-transformers CrossEncoder on CPU (once per model per process).
+    """
+    from sentence_transformers import CrossEncoder
+
+    logger.info(f"Loading cross-encoder '{model_name}' ...")
+    return CrossEncoder(model_name, max_length=max_length, device="cpu")
+
+
+def length_buckets(texts, batch_size):
+    """
+    Groups text indices into batches of similar length, so each batch is padded
+    to roughly its own length instead of the longest text overall.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores (query, chunk) pairs with a cross-encoder and keeps the best k.
+    Pairs are scored in length-bucketed batches. With latency_budget_ms, scoring
+    stops as soon as the next batch is predicted to overrun the budget, and the
+    candidates are returned in their original (dense) order instead, as they are
+    when the last batch finishes past the budget. The model is loaded on
+    construction, so the load never counts against a query's budget.
+    `scorer` (pairs → scores) replaces the cross-encoder, e.g. for offline benchmarks.
+    """
+
+    def __init__(self, model_name=DEFAULT_RERANK_MODEL, batch_size=16, latency_budget_ms=None, scorer=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.latency_budget_ms = latency_budget_ms
+        self.scorer = scorer
+        self.model = get_cross_encoder(model_name) if scorer is None else None
+        self.latency = LatencyRecorder()
+        self.counts = {"reranked": 0, "fallbacks": 0}
+        self._lock = threading.Lock()
+
+    def _score(self, pairs):
+        if self.scorer is not None:
+            return list(self.scorer(pairs))
+        return [float(s) for s in self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)]
+
+    def _over_budget(self, seconds):
+        return self.latency_budget_ms is not None and seconds * 1000 > self.latency_budget_ms
+
+    def _fallback(self, docs, k, start, elapsed):
+        with self._lock:
+            self.counts["fallbacks"] += 1
+        self.latency.record("rerank", elapsed)
+        record_span("rerank", start, elapsed, fallback=True)
+        logger.warning(f"Re-rank budget of {self.latency_budget_ms} ms exceeded; using dense order.")
+        return docs[:k]
+
+    def rerank(self, query, docs, k=5):
+        """
+        Returns the top k of docs by cross-encoder score (dense order on budget overrun).
+        """
+        if len(docs) <= 1:
+            return docs[:k]
+        texts = [doc.page_content for doc in docs]
+        scores = [None] * len(docs)
+        start = time.perf_counter()
+        slowest_batch = 0.0
+        for batch in length_buckets(texts, self.batch_size):
+            elapsed = time.perf_counter() - start
+            if self._over_budget(elapsed + slowest_batch):
+                return self._fallback(docs, k, start, elapsed)
+            batch_start = time.perf_counter()
+            for i, score in zip(batch, self._score([(query, texts[i]) for i in batch])):
+                scores[i] = score
+            slowest_batch = max(slowest_batch, time.perf_counter() - batch_start)
+
+        elapsed = time.perf_counter() - start
+        if self._over_budget(elapsed):
+            return self._fallback(docs, k, start, elapsed)
+        self.latency.record("rerank", elapsed)
+        record_span("rerank", start, elapsed)
+        with self._lock:
+            self.counts["reranked"] += 1
+        # Stable sort: equal scores keep their dense order
+        order = sorted(range(len(docs)), key=lambda i: -scores[i])
+        return [docs[i] for i in order[:k]]
+
+    def stats(self):
+        return {**self.counts, **self.latency.summary()}
+
+
+class RerankingRetriever(FilterableRetriever):
+    """
+    Over-fetches candidates from base_retriever (configured for N results) and
+    passes only the cross-encoder's top k on to the prompt.
+    """
+
+    base_retriever: Any
+    reranker: Any
+    k: int = 5
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, search_filter: Optional[dict] = None
+    ) -> List[Document]:
+        candidates = self.base_retriever.invoke(query, search_filter=search_filter) if search_filter else self.base_retriever.invoke(query)
+        return self.reranker.rerank(query, candidates, k=self.k)
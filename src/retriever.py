@@ -1,14 +1,348 @@
 # src/retriever.py
 
+import hashlib
+import json
+from typing import Any, List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.cache import LRUCache, SQLiteCache
+from src.metrics import LatencyRecorder
 from src.logger import get_logger
 
 logger = get_logger()
 
-def get_retriever(vectorstore, k=5):
+def retrieval_cache_key(query, k, search_filter, index_version):
+    payload = json.dumps(
+        {"query": query, "k": k, "filter": search_filter, "index_version": index_version},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def combine_filters(*filters):
+    """
+    Chroma-style `where` filter requiring all the given filters (None/empty ones are ignored).
+    """
+    conditions = []
+    for search_filter in filters:
+        for key, condition in (search_filter or {}).items():
+            if key == "$and":
+                conditions.extend(condition)
+            else:
+                conditions.append({key: condition})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def config_search_filter(config):
+    """
+    Per-call filter carried by a RunnableConfig: {"configurable": {"search_filter": {...}}}.
+    """
+    return ((config or {}).get("configurable") or {}).get("search_filter")
+
+
+class FilterableRetriever(BaseRetriever):
+    """
+    Retriever taking a per-call filter either as a keyword (retriever.invoke(query, search_filter=...))
+    or through the RunnableConfig (see config_search_filter), so a filter given to a whole chain
+    reaches its retriever: chain.invoke(question, config={"configurable": {"search_filter": ...}}).
+    An explicit search_filter keyword takes precedence over the config.
+    """
+
+    def invoke(self, input, config=None, **kwargs):
+        if kwargs.get("search_filter") is None and config_search_filter(config):
+            kwargs["search_filter"] = config_search_filter(config)
+        return super().invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        if kwargs.get("search_filter") is None and config_search_filter(config):
+            kwargs["search_filter"] = config_search_filter(config)
+        return await super().ainvoke(input, config, **kwargs)
+
+    async def _aget_relevant_documents(self, query, *, run_manager, **kwargs):
+        # BaseRetriever's default drops keyword arguments; run the sync search with them
+        from langchain_core.runnables.config import run_in_executor
+
+        return await run_in_executor(None, self._get_relevant_documents, query, run_manager=run_manager.get_sync(), **kwargs)
+
+
+class CachedRetriever(FilterableRetriever):
+    """
+    Top-k similarity retriever with memoized results.
+    Results are keyed on (query, k, filter, index version), so a re-indexed
+    corpus never serves stale hits. Lookups go in-process LRU → optional
+    on-disk SQLite tier (shared across processes) → vectorstore search.
+    A filter can be fixed (search_filter) and/or given per call:
+    retriever.invoke(query, search_filter={"document": "NLP.docx"}) or through the config
+    (see FilterableRetriever).
+    """
+
+    vectorstore: Any
+    k: int = 5
+    search_filter: Optional[dict] = None
+    index_version: str = ""
+    memory_cache: Any = None
+    disk_cache: Any = None
+    metrics: dict = {}
+
+    def model_post_init(self, __context):
+        self.metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, search_filter: Optional[dict] = None
+    ) -> List[Document]:
+        search_filter = combine_filters(self.search_filter, search_filter)
+        key = retrieval_cache_key(query, self.k, search_filter, self.index_version)
+
+        cached = self.memory_cache.get(key) if self.memory_cache is not None else None
+        if cached is not None:
+            self.metrics["memory_hits"] += 1
+            return [Document(page_content=d["page_content"], metadata=dict(d["metadata"])) for d in cached]
+
+        if self.disk_cache is not None:
+            cached = self.disk_cache.get(key)
+            if cached is not None:
+                self.metrics["disk_hits"] += 1
+                if self.memory_cache is not None:
+                    self.memory_cache.put(key, cached)
+                return [Document(page_content=d["page_content"], metadata=dict(d["metadata"])) for d in cached]
+
+        self.metrics["misses"] += 1
+        docs = self._search(query, search_filter)
+        serialized = [{"page_content": d.page_content, "metadata": d.metadata} for d in docs]
+        if self.memory_cache is not None:
+            self.memory_cache.put(key, serialized)
+        if self.disk_cache is not None:
+            self.disk_cache.put(key, serialized)
+        return docs
+
+    def _search(self, query, search_filter):
+        return self.vectorstore.similarity_search(query, k=self.k, filter=search_filter)
+
+
+def split_course_filter(search_filter, courses):
+    """
+    Splits a filter into the courses it allows (of `courses`) and the rest of the filter.
+    Course conditions at the top level or inside a top-level $and are understood:
+    {"course": "nlp"}, {"course": {"$in": [...]}} / $eq / $ne / $nin. Anything else is left
+    in the rest, which is still applied to every chunk (chunks carry their course).
+    """
+    allowed = list(courses)
+    rest = []
+    conditions = combine_filters(search_filter)
+    conditions = (conditions or {}).get("$and", [conditions] if conditions else [])
+    for condition in conditions:
+        if list(condition) != ["course"]:
+            rest.append(condition)
+            continue
+        value = condition["course"]
+        ops = value if isinstance(value, dict) else {"$eq": value}
+        if not set(ops) <= {"$eq", "$ne", "$in", "$nin"}:
+            rest.append(condition)
+            continue
+        for op, operand in ops.items():
+            if op == "$eq":
+                allowed = [c for c in allowed if c == operand]
+            elif op == "$ne":
+                allowed = [c for c in allowed if c != operand]
+            elif op == "$in":
+                allowed = [c for c in allowed if c in operand]
+            else:
+                allowed = [c for c in allowed if c not in operand]
+    return allowed, combine_filters(*rest)
+
+
+class PartitionedRetriever(CachedRetriever):
+    """
+    Retriever over an index partitioned by course (one vectorstore per course, see
+    build_partitioned_index). Only the partitions the filter allows are searched, so search
+    cost follows the size of the selected courses, not of the whole corpus:
+        {"course": "nlp"}                                   → the NLP partition only
+        {"course": {"$in": ["nlp", "deep-learning"]}}       → two partitions
+        {"course": "nlp", "document": "NLP.docx"}           → document filter inside the NLP partition
+    The query is embedded once; every searched partition returns its top k and the best k
+    by relevance score are kept. Memoization and per-call filters are CachedRetriever's.
+    """
+
+    partitions: dict = {}
+    embed_model: Any = None
+
+    def _search(self, query, search_filter):
+        from src.vectorstore import scored_similarity_search
+
+        courses, rest = split_course_filter(search_filter, self.partitions)
+        if not courses:
+            return []
+        vector = self.embed_model.embed_query(query)
+        hits = []
+        for course in courses:
+            hits.extend(scored_similarity_search(self.partitions[course], vector, k=self.k, search_filter=rest))
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return [doc for doc, _ in hits[:self.k]]
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=60):
+    """
+    Fuses several ranked lists of keys: score(key) = sum over lists of 1 / (rrf_k + rank).
+    Returns keys best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def _doc_key(doc):
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class HybridRetriever(FilterableRetriever):
+    """
+    Dense + BM25 retrieval fused with reciprocal rank fusion.
+    Each leg fetches fetch_k candidates; documents are matched across legs by content,
+    and the top k fused documents are returned. Per-stage latencies are recorded
+    in `latency` (dense, sparse, fusion). Filters (fixed or per call) apply to both legs.
+    """
+
+    dense_retriever: Any
+    keyword_index: Any
+    k: int = 5
+    fetch_k: int = 20
+    rrf_k: int = 60
+    search_filter: Optional[dict] = None
+    latency: Any = None
+
+    def model_post_init(self, __context):
+        if self.latency is None:
+            self.latency = LatencyRecorder()
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, search_filter: Optional[dict] = None
+    ) -> List[Document]:
+        with self.latency.time("dense"):
+            if search_filter:
+                dense_docs = self.dense_retriever.invoke(query, search_filter=search_filter)
+            else:
+                dense_docs = self.dense_retriever.invoke(query)
+
+        with self.latency.time("sparse"):
+            # The dense retriever holds the fixed filter itself; the keyword index needs both
+            sparse_filter = combine_filters(self.search_filter, search_filter)
+            sparse_docs = []
+            for chunk_id, _ in self.keyword_index.search(query, k=self.fetch_k, search_filter=sparse_filter):
+                entry = self.keyword_index.docs[chunk_id]
+                sparse_docs.append(Document(page_content=entry["text"], metadata=dict(entry["metadata"] or {})))
+
+        with self.latency.time("fusion"):
+            by_key = {}
+            for doc in sparse_docs + dense_docs:
+                by_key[_doc_key(doc)] = doc
+            fused = reciprocal_rank_fusion(
+                [[_doc_key(d) for d in dense_docs], [_doc_key(d) for d in sparse_docs]],
+                rrf_k=self.rrf_k,
+            )
+            return [by_key[key] for key in fused[:self.k]]
+
+
+def get_retriever(
+    vectorstore,
+    k=5,
+    index_version=None,
+    search_filter=None,
+    cache_size=256,
+    disk_cache_path=None,
+):
     """
     Returns a retriever object from a vectorstore, for RAG-style context retrieval.
+    When index_version is given, top-k results are memoized (in-process LRU of
+    cache_size entries, plus an on-disk tier if disk_cache_path is set).
     """
     logger.info(f"Creating retriever with top {k} results...")
-    retriever = vectorstore.as_retriever(search_kwargs={"k": k})
+    if index_version is None:
+        search_kwargs = {"k": k}
+        if search_filter:
+            search_kwargs["filter"] = search_filter
+        retriever = vectorstore.as_retriever(search_kwargs=search_kwargs)
+    else:
+        retriever = CachedRetriever(
+            vectorstore=vectorstore,
+            k=k,
+            search_filter=search_filter,
+            index_version=index_version,
+            memory_cache=LRUCache(max_entries=cache_size),
+            disk_cache=SQLiteCache(disk_cache_path) if disk_cache_path else None,
+        )
     logger.info("Retriever created.")
     return retriever
+
+
+def get_partitioned_retriever(
+    partitions,
+    embed_model,
+    k=5,
+    index_version="",
+    search_filter=None,
+    cache_size=256,
+    disk_cache_path=None,
+):
+    """
+    Returns a PartitionedRetriever over {course: vectorstore}, memoized like get_retriever.
+    """
+    logger.info(f"Creating retriever over {len(partitions)} course partitions ({', '.join(partitions)}) with top {k} results...")
+    return PartitionedRetriever(
+        vectorstore=None,
+        partitions=dict(partitions),
+        embed_model=embed_model,
+        k=k,
+        search_filter=search_filter,
+        index_version=index_version,
+        memory_cache=LRUCache(max_entries=cache_size),
+        disk_cache=SQLiteCache(disk_cache_path) if disk_cache_path else None,
+    )
+
+
+def get_hybrid_retriever(
+    vectorstore,
+    keyword_index,
+    k=5,
+    fetch_k=20,
+    index_version=None,
+    search_filter=None,
+    cache_size=256,
+    disk_cache_path=None,
+    partitions=None,
+    embed_model=None,
+):
+    """
+    Returns a HybridRetriever: the (memoized) dense retriever over fetch_k results,
+    fused with BM25 keyword results from keyword_index.
+    With partitions ({course: vectorstore}, vectorstore=None) the dense leg is a
+    PartitionedRetriever; keyword_index is then usually a PartitionedKeywordIndex.
+    """
+    fetch_k = max(k, fetch_k)
+    if partitions is not None:
+        dense_retriever = get_partitioned_retriever(
+            partitions,
+            embed_model,
+            k=fetch_k,
+            index_version=index_version or "",
+            search_filter=search_filter,
+            cache_size=cache_size,
+            disk_cache_path=disk_cache_path,
+        )
+    else:
+        dense_retriever = get_retriever(
+            vectorstore,
+            k=fetch_k,
+            index_version=index_version,
+            search_filter=search_filter,
+            cache_size=cache_size,
+            disk_cache_path=disk_cache_path,
+        )
+    logger.info(f"Creating hybrid retriever (dense + BM25, {fetch_k} candidates each, top {k} fused)...")
+    return HybridRetriever(
+        dense_retriever=dense_retriever, keyword_index=keyword_index, k=k, fetch_k=fetch_k, search_filter=search_filter
+    )
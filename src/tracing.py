@@ -0,0 +1,297 @@
+# src/tracing.py
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import ContextDecorator, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from src.config import TRACE_PROFILE_DIR, TRACE_SLOW_QUERY_MS
+from src.metrics import LatencyRecorder
+from src.logger import get_logger, log_context
+
+logger = get_logger()
+
+# In-process latency histograms of every span, by name (traced or not)
+SPAN_METRICS = LatencyRecorder()
+
+_current_trace = ContextVar("rag_trace", default=None)
+
+
+class Trace:
+    """
+    Spans of one query, in the order they finished, with start offsets relative to the query start.
+    """
+
+    def __init__(self, question, query_id=None):
+        self.query_id = query_id or uuid.uuid4().hex[:12]
+        self.question = question
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.error = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, seconds, **attrs):
+        span = {"name": name, "start_ms": round((start - self.start) * 1000, 3), "ms": round(seconds * 1000, 3), **attrs}
+        with self._lock:
+            self.spans.append(span)
+
+    def totals(self):
+        """
+        Milliseconds per span name (summed when a step ran more than once).
+        """
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span["name"]] = round(totals.get(span["name"], 0.0) + span["ms"], 3)
+        return totals
+
+    def config(self, config=None):
+        """
+        LangChain RunnableConfig carrying this trace's callback handler (merged into config if given),
+        so retriever, prompt and LLM steps of a chain are timed as spans.
+        """
+        config = dict(config or {})
+        config["callbacks"] = list(config.get("callbacks") or []) + [_callback_handler_class()(self)]
+        config["metadata"] = {**config.get("metadata", {}), "query_id": self.query_id}
+        return config
+
+    def as_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        return {
+            "query_id": self.query_id,
+            "question": self.question,
+            "total_ms": round((self.seconds or 0.0) * 1000, 3),
+            "error": self.error,
+            "totals": self.totals(),
+            "spans": spans,
+        }
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def record_span(name, start, seconds, **attrs):
+    """
+    Adds a measured span to the histograms and to the active trace, if any.
+    """
+    SPAN_METRICS.record(name, seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, seconds, **attrs)
+
+
+class span(ContextDecorator):
+    """
+    Times a block or a function as a named span:
+        with span("retrieve"): ...
+        @span("polish")
+        def spacy_polish(text): ...
+    """
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self._start = None
+
+    def _recreate_cm(self):
+        # A decorated function may run in several threads at once; each call gets its own timer
+        return span(self.name, **self.attrs)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        attrs = dict(self.attrs, error=exc_type.__name__) if exc_type else self.attrs
+        record_span(self.name, self._start, time.perf_counter() - self._start, **attrs)
+        return False
+
+
+@contextmanager
+def start_trace(question, query_id=None, profile_dir=None):
+    """
+    Traces one query: sets the query id for logging and collects every span until the block ends.
+    Then logs one structured line with the per-step breakdown (WARNING if slower than
+    TRACE_SLOW_QUERY_MS) and, with profile_dir or TRACE_PROFILE_DIR, dumps the full
+    timeline to <dir>/<query_id>.json.
+    """
+    trace = Trace(question, query_id)
+    trace_token = _current_trace.set(trace)
+    context_token = log_context.set({**log_context.get(), "query_id": trace.query_id})
+    try:
+        yield trace
+    except BaseException as e:
+        trace.error = repr(e)
+        raise
+    finally:
+        trace.seconds = time.perf_counter() - trace.start
+        SPAN_METRICS.record("query", trace.seconds)
+        _report(trace, profile_dir or TRACE_PROFILE_DIR)
+        try:
+            log_context.reset(context_token)
+            _current_trace.reset(trace_token)
+        except ValueError:
+            # Generator closed from another context (abandoned stream); nothing to restore there
+            pass
+
+
+@contextmanager
+def ensure_trace(question):
+    """
+    Joins the active trace if the caller started one (e.g. to include answer polishing), else starts one.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        yield trace
+        return
+    with start_trace(question) as trace:
+        yield trace
+
+
+def _report(trace, profile_dir):
+    total_ms = trace.seconds * 1000
+    breakdown = ", ".join(f"{name} {ms:.0f} ms" for name, ms in trace.totals().items())
+    slow = TRACE_SLOW_QUERY_MS and total_ms >= TRACE_SLOW_QUERY_MS
+    logger.log(
+        logging.WARNING if slow else logging.INFO,
+        f"⏱️ Query {trace.query_id}: {total_ms:.0f} ms{' (slow)' if slow else ''} [{breakdown}]",
+        extra={"trace": trace.as_dict()},
+    )
+    if profile_dir:
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            with open(os.path.join(profile_dir, f"{trace.query_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(trace.as_dict(), f, indent=2)
+        except OSError as e:
+            logger.warning(f"Could not write query profile for {trace.query_id}: {e}")
+
+
+def trace_stats():
+    """
+    p50/p95/p99 per span name across all queries of this process.
+    """
+    return SPAN_METRICS.summary()
+
+
+# Chain steps timed by the callback handler, by LangChain run name
+_CHAIN_SPANS = {"pack_prompt": "prompt.pack"}
+
+
+@lru_cache(maxsize=None)
+def _callback_handler_class():
+    # Defined on first use so importing this module does not import LangChain
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        """
+        Turns LangChain run start/end events into spans of one Trace:
+        retrieve, prompt (template formatting), prompt.pack (context packing),
+        llm (with llm.first_token when streaming). Nested retrievers appear as retrieve.<name>.
+        """
+
+        run_inline = True
+
+        def __init__(self, trace):
+            self.trace = trace
+            self.runs = {}
+            self.first_token = set()
+
+        def _start(self, run_id, name):
+            self.runs[run_id] = (name, time.perf_counter())
+
+        def _end(self, run_id, **attrs):
+            started = self.runs.pop(run_id, None)
+            if started is None:
+                return
+            name, start = started
+            seconds = time.perf_counter() - start
+            SPAN_METRICS.record(name, seconds)
+            self.trace.add(name, start, seconds, **attrs)
+
+        def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+            parent = self.runs.get(parent_run_id)
+            nested = parent is not None and parent[0].startswith("retrieve")
+            self._start(run_id, f"retrieve.{kwargs.get('name') or 'inner'}" if nested else "retrieve")
+
+        def on_retriever_end(self, documents, *, run_id, **kwargs):
+            self._end(run_id, docs=len(documents))
+
+        def on_retriever_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error=type(error).__name__)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(run_id, "llm")
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(run_id, "llm")
+
+        def on_llm_new_token(self, token, *, run_id, **kwargs):
+            if run_id in self.first_token or run_id not in self.runs:
+                return
+            self.first_token.add(run_id)
+            start = self.runs[run_id][1]
+            seconds = time.perf_counter() - start
+            SPAN_METRICS.record("llm.first_token", seconds)
+            self.trace.add("llm.first_token", start, seconds)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error=type(error).__name__)
+
+        def on_chain_start(self, serialized, inputs, *, run_id, **kwargs):
+            if kwargs.get("run_type") == "prompt":
+                self._start(run_id, "prompt")
+            elif kwargs.get("name") in _CHAIN_SPANS:
+                self._start(run_id, _CHAIN_SPANS[kwargs["name"]])
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error=type(error).__name__)
+
+    return TracingCallbackHandler
+
+
+class TracedChain:
+    """
+    Outermost wrapper of the RAG chain: every invoke/stream/ainvoke/astream runs in a trace
+    (the caller's, if one is active) with the tracing callbacks attached, so each answer
+    logs where its time went. Other attributes (stats, ...) are those of the wrapped chain.
+    """
+
+    def __init__(self, chain):
+        self.chain = chain
+
+    def invoke(self, question, config=None, **kwargs):
+        with ensure_trace(question) as trace:
+            return self.chain.invoke(question, trace.config(config), **kwargs)
+
+    def stream(self, question, config=None, **kwargs):
+        with ensure_trace(question) as trace:
+            yield from self.chain.stream(question, trace.config(config), **kwargs)
+
+    async def ainvoke(self, question, config=None, **kwargs):
+        with ensure_trace(question) as trace:
+            return await self.chain.ainvoke(question, trace.config(config), **kwargs)
+
+    async def astream(self, question, config=None, **kwargs):
+        with ensure_trace(question) as trace:
+            async for token in self.chain.astream(question, trace.config(config), **kwargs):
+                yield token
+
+    def stats(self):
+        inner = self.chain.stats() if hasattr(self.chain, "stats") else {}
+        return {**inner, "spans": trace_stats()}
+
+    def __getattr__(self, name):
+        return getattr(self.chain, name)
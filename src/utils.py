@@ -1,15 +1,11 @@
 # src/utils.py
 
-import re
+from src.cleaning import clean_text
+
 
 def final_clean_text(text):
     """
-    Removes PDF linebreak artifacts, hyphens, and extra whitespace for cleaner chunked text.
+    Removes PDF linebreak artifacts, hyphens, ligatures and extra whitespace for cleaner chunked text.
+    The implementation lives in src/cleaning.py.
     """
-    # Remove hyphen + newline artifacts
-    text = re.sub(r'-\n', '', text)
-    # Replace any remaining newlines with space
-    text = re.sub(r'\n+', ' ', text)
-    # Remove excess spaces
-    text = re.sub(r' +', ' ', text)
-    return text.strip()
+    return clean_text(text)
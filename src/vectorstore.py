@@ -1,18 +1,30 @@
 # src/vectorstore.py
 
-from langchain_community.vectorstores import Chroma
+import os
 from src.logger import get_logger
 
 logger = get_logger()
 
+# "chroma" or an in-process store (src/native_store.py) kept in a subdirectory of persist_directory
+VECTOR_BACKENDS = ("chroma", "numpy", "faiss-flat", "faiss-ivf", "faiss-hnsw")
+
 def create_chroma_vectorstore(
     all_semantic_chunks,
     embed_model,
-    persist_directory="outputs/chroma_semantic_allpdfs_v2"
+    persist_directory="outputs/chroma_semantic_allpdfs_v2",
+    backend="chroma"
 ):
     """
-    Stores chunks in ChromaDB vectorstore and persists it to disk.
+    Stores chunks in ChromaDB vectorstore (or another backend from VECTOR_BACKENDS) and persists it to disk.
     """
+    from langchain_community.vectorstores import Chroma
+
+    if backend != "chroma":
+        vectorstore = load_vectorstore(embed_model, persist_directory, backend=backend)
+        add_chunks_to_vectorstore(vectorstore, all_semantic_chunks, [str(i) for i in range(len(all_semantic_chunks))])
+        persist_vectorstore(vectorstore)
+        return vectorstore
+
     logger.info(f"Indexing {len(all_semantic_chunks)} semantic chunks in Chroma at '{persist_directory}' ...")
     vectorstore = Chroma.from_documents(
         all_semantic_chunks,
@@ -21,3 +33,135 @@ def create_chroma_vectorstore(
     )
     logger.info("Done! All PDFs indexed with semantic chunking.")
     return vectorstore
+
+def load_chroma_vectorstore(
+    embed_model,
+    persist_directory="outputs/chroma_semantic_allpdfs_v2"
+):
+    """
+    Opens the persisted Chroma collection (creating it if missing) without indexing anything.
+    """
+    from langchain_community.vectorstores import Chroma
+
+    logger.info(f"Opening Chroma vectorstore at '{persist_directory}' ...")
+    vectorstore = Chroma(
+        embedding_function=embed_model,
+        persist_directory=persist_directory
+    )
+    logger.info(f"Chroma vectorstore opened ({vectorstore._collection.count()} vectors).")
+    return vectorstore
+
+def load_vectorstore(
+    embed_model,
+    persist_directory="outputs/chroma_semantic_allpdfs_v2",
+    backend="chroma",
+    quantization=None
+):
+    """
+    Opens the persisted vectorstore for the given backend (see VECTOR_BACKENDS).
+    quantization ("float16"/"int8") applies to the numpy backend: search scans a
+    compressed copy and rescores the best candidates at full precision.
+    Native stores are opened without autosave: writers call persist_vectorstore at their commit points.
+    """
+    if backend == "chroma":
+        return load_chroma_vectorstore(embed_model, persist_directory=persist_directory)
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend '{backend}'; expected one of {VECTOR_BACKENDS}")
+
+    from src.native_store import NumpyVectorStore, FaissVectorStore
+
+    store_directory = os.path.join(persist_directory, backend.replace("-", "_"))
+    if backend == "numpy":
+        return NumpyVectorStore.load(embed_model, store_directory, autosave=False, quantization=quantization)
+    return FaissVectorStore.load(embed_model, store_directory, autosave=False, index_type=backend.split("-", 1)[1])
+
+def persist_vectorstore(vectorstore):
+    """
+    Makes every write so far durable. Native stores append the rows written since the last call
+    as one segment; Chroma persists each write itself, so this is a no-op there.
+    """
+    if hasattr(vectorstore, "upsert_embeddings"):
+        vectorstore.save()
+
+def count_vectors(vectorstore):
+    if hasattr(vectorstore, "upsert_embeddings"):
+        return vectorstore.count()
+    return vectorstore._collection.count()
+
+def add_chunks_to_vectorstore(vectorstore, chunks, ids, batch_size=500):
+    """
+    Adds chunks under explicit ids, in batches (Chroma caps the size of a single write).
+    """
+    for start in range(0, len(chunks), batch_size):
+        vectorstore.add_documents(chunks[start:start + batch_size], ids=ids[start:start + batch_size])
+    logger.info(f"Added {len(chunks)} chunks to vectorstore.")
+
+def add_embedded_chunks_to_vectorstore(vectorstore, chunks, vectors, ids, batch_size=500):
+    """
+    Writes chunks with precomputed vectors straight into the Chroma collection,
+    so the embedding model is not called again.
+    """
+    # Native stores (src/native_store.py) take the same upsert; Chroma's goes through its collection
+    upsert = getattr(vectorstore, "upsert_embeddings", None) or vectorstore._collection.upsert
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        upsert(
+            ids=ids[start:start + batch_size],
+            embeddings=vectors[start:start + batch_size],
+            documents=[c.page_content for c in batch],
+            metadatas=[c.metadata for c in batch],
+        )
+    logger.info(f"Added {len(chunks)} chunks with precomputed vectors to vectorstore.")
+
+def delete_chunks_from_vectorstore(vectorstore, ids, batch_size=500):
+    """
+    Deletes chunks by id, in batches.
+    """
+    for start in range(0, len(ids), batch_size):
+        vectorstore.delete(ids=ids[start:start + batch_size])
+    logger.info(f"Deleted {len(ids)} stale chunks from vectorstore.")
+
+def clear_vectorstore(vectorstore, batch_size=500):
+    """
+    Removes every vector from the collection (used for legacy indexes built without a manifest).
+    """
+    ids = vectorstore.get(include=[])["ids"]
+    if ids:
+        delete_chunks_from_vectorstore(vectorstore, ids, batch_size=batch_size)
+
+def batch_similarity_search(vectorstore, query_vectors, k=5, search_filter=None):
+    """
+    Runs top-k search for many precomputed query vectors in one Chroma call
+    (one matrix product / FAISS search for native stores).
+    Returns one list of Documents per query vector.
+    """
+    from langchain_core.documents import Document
+
+    if not query_vectors:
+        return []
+    if hasattr(vectorstore, "search_by_vectors"):
+        hits = vectorstore.search_by_vectors(query_vectors, k=k, search_filter=search_filter)
+        return [[doc for doc, _ in docs] for docs in hits]
+    kwargs = {"where": search_filter} if search_filter else {}
+    result = vectorstore._collection.query(
+        query_embeddings=query_vectors,
+        n_results=k,
+        include=["documents", "metadatas", "distances"],
+        **kwargs,
+    )
+    return [
+        [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+        for texts, metadatas in zip(result["documents"], result["metadatas"])
+    ]
+
+def scored_similarity_search(vectorstore, query_vector, k=5, search_filter=None):
+    """
+    Top-k (Document, relevance score) for one precomputed query vector, higher = more similar:
+    cosine for native stores, Chroma's distance mapped through its relevance function.
+    Scores from vectorstores of the same backend and model can be merged (see PartitionedRetriever).
+    """
+    if hasattr(vectorstore, "search_by_vectors"):
+        return vectorstore.search_by_vectors([query_vector], k=k, search_filter=search_filter)[0]
+    relevance = vectorstore._select_relevance_score_fn()
+    hits = vectorstore.similarity_search_by_vector_with_relevance_scores(query_vector, k=k, filter=search_filter)
+    return [(doc, relevance(distance)) for doc, distance in hits]
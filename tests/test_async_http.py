@@ -0,0 +1,17 @@
+import asyncio
+import httpx
+from src.async_http import LoopBoundAsyncClient
+
+
+def test_each_event_loop_gets_its_own_pool():
+    client = LoopBoundAsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text=request.url.path)))
+
+    async def fetch(path):
+        responses = await asyncio.gather(client.get(f"http://llm.test{path}"), client.get(f"http://llm.test{path}"))
+        return [response.text for response in responses], client.for_running_loop()
+
+    first_texts, first_pool = asyncio.run(fetch("/a"))
+    second_texts, second_pool = asyncio.run(fetch("/b"))
+
+    assert (first_texts, second_texts) == (["/a", "/a"], ["/b", "/b"])
+    assert isinstance(client, httpx.AsyncClient) and first_pool is not second_pool
@@ -0,0 +1,127 @@
+import json
+import time
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.retrievers import BaseRetriever
+from src.batch import RateLimiter, load_completed_ids, read_questions, run_batch_qa
+from src.native_store import NumpyVectorStore
+
+TEXTS = ["Regular expressions describe sets of strings.", "The Turing test imitates a conversation.", "Embeddings are dense vectors."]
+
+
+class EchoChatModel(BaseChatModel):
+    """
+    Answers with the prompt length; prompts mentioning `broken` raise.
+    """
+
+    broken: str = "\0"
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = messages[-1].content
+        if self.broken in prompt:
+            raise ConnectionError("rate limited")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"{len(prompt)} chars"))])
+
+
+class RecordingRetriever(BaseRetriever):
+    queries: list = []
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        self.queries.append(query)
+        return [Document(page_content=f"notes on {query}", metadata={"source_pdf": "notes.txt"})]
+
+
+def make_store(tmp_path):
+    embed_model = DeterministicFakeEmbedding(size=16)
+    store = NumpyVectorStore(embed_model, str(tmp_path / "store"))
+    store.add_texts(TEXTS, metadatas=[{"source_pdf": f"doc{i}.pdf"} for i in range(len(TEXTS))], ids=[f"c{i}" for i in range(len(TEXTS))])
+    return embed_model, store
+
+
+def write_questions(tmp_path, questions):
+    path = tmp_path / "questions.jsonl"
+    path.write_text("\n".join(json.dumps(q) for q in questions) + "\n", encoding="utf-8")
+    return read_questions(str(path))
+
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return {record["id"]: record for record in map(json.loads, f)}
+
+
+def test_read_questions_numbers_lines_without_id(tmp_path):
+    questions = write_questions(tmp_path, [{"question": "What is a regex?"}, {"id": "q7", "question": "Who was Turing?"}])
+
+    assert questions == [{"id": "1", "question": "What is a regex?"}, {"id": "q7", "question": "Who was Turing?"}]
+
+
+def test_batch_answers_all_questions_and_resumes(tmp_path):
+    embed_model, store = make_store(tmp_path)
+    questions = write_questions(tmp_path, [{"id": str(i), "question": f"Question {i} about {TEXTS[i % 3]}"} for i in range(7)])
+    output = str(tmp_path / "answers.jsonl")
+
+    summary = run_batch_qa(questions, embed_model, store, EchoChatModel(), output, k=2, concurrency=3, slab_size=3)
+
+    assert (summary["answered"], summary["failed"], summary["skipped"]) == (7, 0, 0)
+    records = read_records(output)
+    assert sorted(records) == [str(i) for i in range(7)]
+    assert all(record["answer"].endswith("chars") and len(record["sources"]) == 2 for record in records.values())
+
+    rerun = run_batch_qa(questions, embed_model, store, EchoChatModel(), output, k=2)
+    assert (rerun["answered"], rerun["skipped"]) == (0, 7)
+
+
+def test_failed_questions_are_retried_on_the_next_run(tmp_path):
+    embed_model, store = make_store(tmp_path)
+    questions = write_questions(tmp_path, [{"id": "ok", "question": "What is a regex?"}, {"id": "bad", "question": "Who was Turing?"}])
+    output = str(tmp_path / "answers.jsonl")
+
+    summary = run_batch_qa(questions, embed_model, store, EchoChatModel(broken="Turing?"), output, k=1)
+    assert (summary["answered"], summary["failed"]) == (1, 1)
+    assert load_completed_ids(output) == {"ok"}
+
+    retry = run_batch_qa(questions, embed_model, store, EchoChatModel(), output, k=1)
+    assert (retry["answered"], retry["skipped"]) == (1, 1)
+    assert load_completed_ids(output) == {"ok", "bad"}
+
+
+def test_batch_retrieves_through_a_given_retriever(tmp_path):
+    embed_model, store = make_store(tmp_path)
+    questions = write_questions(tmp_path, [{"id": str(i), "question": f"Question {i}"} for i in range(4)])
+    retriever = RecordingRetriever(queries=[])
+
+    run_batch_qa(questions, embed_model, store, EchoChatModel(), str(tmp_path / "answers.jsonl"), retriever=retriever)
+
+    assert sorted(retriever.queries) == [q["question"] for q in questions]
+    assert {record["sources"][0] for record in read_records(str(tmp_path / "answers.jsonl")).values()} == {"notes.txt"}
+
+
+def test_rate_limiter_spaces_out_acquisitions():
+    limiter = RateLimiter(rate=50, burst=1)
+
+    start = time.perf_counter()
+    for _ in range(6):
+        limiter.acquire()
+
+    assert time.perf_counter() - start >= 0.09
+
+
+def test_resume_drops_a_truncated_last_line(tmp_path):
+    embed_model, store = make_store(tmp_path)
+    questions = write_questions(tmp_path, [{"id": str(i), "question": f"Question {i}"} for i in range(3)])
+    output = str(tmp_path / "answers.jsonl")
+    run_batch_qa(questions[:2], embed_model, store, EchoChatModel(), output, k=1)
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"id": "2", "answer": "cut off mid-rec')
+
+    summary = run_batch_qa(questions, embed_model, store, EchoChatModel(), output, k=1)
+
+    assert (summary["answered"], summary["skipped"]) == (1, 2)
+    assert sorted(read_records(output)) == ["0", "1", "2"]
@@ -0,0 +1,178 @@
+import json
+import re
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from src.cache import CachedRagChain, LRUCache, SemanticAnswerCache, SQLiteCache, normalize_question
+from src.embeddings import CachedQueryEmbeddings
+from src.retriever import CachedRetriever, retrieval_cache_key
+
+VOCABULARY = ["regex", "regular", "expression", "turing", "test", "embedding", "what", "is", "a", "explain"]
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """
+    Counts vocabulary words, so questions sharing their words embed close together.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        words = re.findall(r"\w+", text.lower())
+        return [float(words.count(word)) for word in VOCABULARY]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class CountingChain:
+    def __init__(self):
+        self.questions = []
+
+    def invoke(self, question, config=None, **kwargs):
+        self.questions.append(question)
+        return f"answer {len(self.questions)}"
+
+    def stream(self, question, config=None, **kwargs):
+        answer = self.invoke(question, config)
+        yield from (answer[:6], answer[6:])
+
+
+def open_cache(tmp_path, namespace="v1", **options):
+    return SemanticAnswerCache(BagOfWordsEmbeddings(), namespace=namespace, path=str(tmp_path / "answer_cache"), **options)
+
+
+def test_exact_and_semantic_hits(tmp_path):
+    cache = open_cache(tmp_path, similarity_threshold=0.9)
+    cache.store("What is a regular expression?", "A pattern.")
+
+    assert cache.lookup("what is a   Regular Expression")[0] == "A pattern."
+    assert cache.lookup("Regular expression: what is a ...")[0] == "A pattern."
+    assert cache.lookup("Explain the Turing test")[0] is None
+    assert cache.stats()["exact_hits"] == 1
+    assert cache.stats()["semantic_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_symbols_inside_questions_keep_their_own_answers(tmp_path):
+    cache = open_cache(tmp_path, similarity_threshold=1.1)
+    cache.store("What is C++?", "A language with classes.")
+    cache.store("What is C#?", "A .NET language.")
+
+    assert normalize_question("  What is   C++?! ") == "what is c++"
+    assert normalize_question("a*") != normalize_question("a+")
+    assert cache.lookup("what is c++")[0] == "A language with classes."
+    assert cache.lookup("What is C#?")[0] == "A .NET language."
+
+
+def test_writes_are_batched_and_evictions_reach_disk(tmp_path):
+    cache = open_cache(tmp_path, max_entries=2, flush_seconds=3600)
+    cache.store("What is a regex?", "A pattern.")  # first store flushes
+    cache.store("Explain the Turing test", "An imitation game.")
+    cache.store("What is an embedding?", "A vector.")
+
+    assert open_cache(tmp_path).stats()["entries"] == 1
+    cache.save()
+    reopened = open_cache(tmp_path)
+    assert reopened.stats()["entries"] == 2
+    assert reopened.lookup("What is a regex?")[0] is None
+    assert reopened.lookup("What is an embedding?")[0] == "A vector."
+    cache.close()
+
+
+def test_cache_is_dropped_when_namespace_changes(tmp_path):
+    open_cache(tmp_path).store("What is a regex?", "A pattern.")
+
+    assert open_cache(tmp_path).lookup("What is a regex?")[0] == "A pattern."
+    assert open_cache(tmp_path, namespace="v2").lookup("What is a regex?")[0] is None
+
+
+def test_cached_chain_keeps_one_cache_per_filter_scope(tmp_path):
+    scopes = []
+
+    def cache_factory(scope):
+        scopes.append(scope)
+        return SemanticAnswerCache(BagOfWordsEmbeddings(), namespace="v1", path=str(tmp_path / f"cache{len(scopes)}"))
+
+    chain = CountingChain()
+    cached = CachedRagChain(chain, cache_factory)
+    nlp = {"configurable": {"search_filter": {"course": "nlp"}}}
+
+    assert cached.invoke("What is a regex?") == "answer 1"
+    assert cached.invoke("What is a regex?") == "answer 1"
+    assert cached.invoke("What is a regex?", config=nlp) == "answer 2"
+    assert "".join(cached.stream("What is a regex?", config=nlp)) == "answer 2"
+
+    assert scopes == ["", json.dumps({"course": "nlp"})]
+    assert len(chain.questions) == 2
+    assert cached.stats()["scopes"] == 2
+
+
+def test_streamed_answer_is_cached_once_complete(tmp_path):
+    chain = CountingChain()
+    cached = CachedRagChain(chain, lambda scope: open_cache(tmp_path))
+
+    assert list(cached.stream("What is a regex?")) == ["answer", " 1"]
+    assert list(cached.stream("What is a regex?")) == ["answer 1"]
+    assert len(chain.questions) == 1
+
+
+class CountingVectorStore:
+    def __init__(self):
+        self.searches = []
+
+    def similarity_search(self, query, k=5, filter=None):
+        self.searches.append((query, k, filter))
+        return [Document(page_content=f"{query} hit {i}", metadata={"page": i}) for i in range(k)]
+
+
+def test_retrieval_cache_key_covers_every_input():
+    key = retrieval_cache_key("what is a regex", 5, {"course": "nlp", "page": 1}, "v1")
+
+    assert key == retrieval_cache_key("what is a regex", 5, {"page": 1, "course": "nlp"}, "v1")
+    assert len({
+        key,
+        retrieval_cache_key("what is a regex?", 5, {"course": "nlp", "page": 1}, "v1"),
+        retrieval_cache_key("what is a regex", 10, {"course": "nlp", "page": 1}, "v1"),
+        retrieval_cache_key("what is a regex", 5, {"course": "nlp"}, "v1"),
+        retrieval_cache_key("what is a regex", 5, None, "v1"),
+        retrieval_cache_key("what is a regex", 5, {"course": "nlp", "page": 1}, "v2"),
+    }) == 6
+
+
+def test_cached_retriever_memory_and_disk_tiers(tmp_path):
+    def make_retriever(vectorstore, index_version="v1"):
+        return CachedRetriever(
+            vectorstore=vectorstore,
+            k=2,
+            index_version=index_version,
+            memory_cache=LRUCache(max_entries=8),
+            disk_cache=SQLiteCache(str(tmp_path / "retrieval_cache.sqlite3")),
+        )
+
+    vectorstore = CountingVectorStore()
+    retriever = make_retriever(vectorstore)
+    first = retriever.invoke("regex")
+    assert retriever.invoke("regex") == first
+    retriever.invoke("regex", search_filter={"course": "nlp"})
+    assert retriever.metrics == {"memory_hits": 1, "disk_hits": 0, "misses": 2}
+
+    # A new process finds the results on disk; a re-indexed corpus does not
+    restarted = make_retriever(vectorstore)
+    assert restarted.invoke("regex") == first
+    assert restarted.metrics["disk_hits"] == 1
+    make_retriever(vectorstore, index_version="v2").invoke("regex")
+    assert [search[0] for search in vectorstore.searches] == ["regex", "regex", "regex"]
+    assert vectorstore.searches[1][2] == {"course": "nlp"}
+
+
+def test_query_embeddings_are_memoized():
+    base = BagOfWordsEmbeddings()
+    embeddings = CachedQueryEmbeddings(base, max_entries=4)
+
+    vector = embeddings.embed_query("What is a regex?")
+    assert embeddings.embed_query("What is a regex?") == vector
+    assert embeddings.embed_queries(["What is a regex?", "Explain the Turing test", "Explain the Turing test"])[0] == vector
+    assert base.calls == 2
+    assert (embeddings.hits, embeddings.misses) == (2, 2)
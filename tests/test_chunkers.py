@@ -0,0 +1,107 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_experimental.text_splitter import SemanticChunker
+from src.chunkers import ChunkStats, StructuralSplitter, StructuredChunker, semantic_split_with_vectors
+
+TOPICS = [
+    "Regular expressions describe sets of strings. A finite automaton accepts exactly such a set.",
+    "The Turing test asks whether a machine can imitate a human in conversation. Turing chose language on purpose.",
+    "Gradient descent follows the negative gradient. The learning rate scales every step. Too large a rate diverges.",
+    "Word embeddings map words to dense vectors. Similar words end up close together! Does cosine similarity capture that?",
+]
+
+TEXTS = [
+    " ".join(TOPICS),
+    " ".join(reversed(TOPICS)) + " " + TOPICS[0],
+    "One sentence only.",
+    TOPICS[1],
+]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"breakpoint_threshold_type": "percentile"},
+        {"breakpoint_threshold_type": "percentile", "breakpoint_threshold_amount": 50},
+        {"breakpoint_threshold_type": "standard_deviation"},
+        {"breakpoint_threshold_type": "interquartile"},
+        {"breakpoint_threshold_type": "gradient"},
+        {"number_of_chunks": 3},
+        {"breakpoint_threshold_type": "percentile", "min_chunk_size": 80},
+    ],
+)
+def test_semantic_split_matches_semantic_chunker(options):
+    chunker = SemanticChunker(DeterministicFakeEmbedding(size=32), **options)
+
+    pairs = semantic_split_with_vectors(chunker, TEXTS)
+
+    assert [text for text, _ in pairs] == [chunk for text in TEXTS for chunk in chunker.split_text(text)]
+
+
+def test_semantic_split_pools_unit_vectors():
+    chunker = SemanticChunker(DeterministicFakeEmbedding(size=32), breakpoint_threshold_type="percentile")
+
+    pairs = semantic_split_with_vectors(chunker, TEXTS[:1] + ["One sentence only."])
+
+    vectors = [vector for _, vector in pairs]
+    assert vectors[-1] is None
+    for vector in vectors[:-1]:
+        assert len(vector) == 32
+        assert sum(x * x for x in vector) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_structural_splitter_keeps_long_sections_whole():
+    body = " ".join(TOPICS * 6)
+    text = f"1 Introduction\n{TOPICS[0]}\n\n2 Details\n{body}"
+
+    sections = StructuralSplitter(chunk_size=500, min_section_size=50).split_text(text)
+
+    assert sections == [f"1 Introduction\n{TOPICS[0]}", f"2 Details\n{body}"]
+
+
+def test_structured_chunker_searches_oversized_sections():
+    sections = StructuralSplitter(chunk_size=500).split_text(" ".join(TOPICS * 6))
+    chunker = StructuredChunker(DeterministicFakeEmbedding(size=32), max_chunk_size=500, breakpoint_percentile=50)
+    stats = ChunkStats()
+
+    grouped = chunker.split_grouped(sections + ["Short section."], stats=stats)
+
+    summary = stats.summary()
+    assert summary["texts_searched"] == 1
+    assert summary["breakpoint_search_rate"] == 0.5
+    assert summary["boundaries"].get("semantic", 0) > 0
+    assert grouped[-1] == [("Short section.", None)]
+    assert all(len(text) <= 500 for text, _ in grouped[0])
+    assert " ".join(text for text, _ in grouped[0]) == sections[0]
+
+
+def test_structured_chunker_splits_unpunctuated_runs_at_line_breaks():
+    lines = [f"bullet point number {i} about finite automata and regular languages" for i in range(40)]
+    chunker = StructuredChunker(DeterministicFakeEmbedding(size=32), max_chunk_size=600)
+
+    grouped = chunker.split_grouped(["\n".join(lines)])
+
+    assert len(grouped[0]) > 1
+    assert all(len(text) <= 600 for text, _ in grouped[0])
+
+
+def test_structured_chunker_windows_overlap():
+    chunker = StructuredChunker(DeterministicFakeEmbedding(size=32), window=3)
+
+    assert chunker.stride == 2
+    assert chunker._window_starts(8) == [0, 2, 4, 5]
+    assert chunker._window_starts(2) == [0]
+    assert StructuredChunker(None, window=4, stride=1)._window_starts(6) == [0, 1, 2]
+
+
+def test_structured_chunker_size_splits_sections_too_short_to_search():
+    table = " | ".join(f"row {i} cell value" for i in range(120))
+    chunker = StructuredChunker(DeterministicFakeEmbedding(size=32), max_chunk_size=300)
+    stats = ChunkStats()
+
+    grouped = chunker.split_grouped([table, "Model. " + table], stats=stats)
+
+    assert stats.texts_searched == 0
+    assert all(len(grouped[0]) > 1 and all(len(text) <= 300 for text, _ in chunks) for chunks in grouped)
+    assert all(vector is None for chunks in grouped for _, vector in chunks)
+    assert stats.summary()["boundaries"]["size"] == sum(len(chunks) for chunks in grouped) - 2
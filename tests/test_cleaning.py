@@ -0,0 +1,61 @@
+import pytest
+from src.cleaning import clean_text, clean_texts, strip_page_furniture
+from src.postprocess import spacy_polish, spacy_polish_many
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("regu-\nlar expres-\nsions", "regular expressions"),
+        ("  line one\n\n\nline  two\tend  ", "line one line two end"),
+        ("ﬁnite eﬀect, ﬂow", "finite effect, flow"),
+        ("soft­hyphen​ and space﻿", "softhyphen and space"),
+        (" first\n second", "• first • second"),
+        ("", ""),
+    ],
+)
+def test_clean_text(text, expected):
+    assert clean_text(text) == expected
+
+
+def test_clean_texts_is_clean_text_per_item():
+    texts = ["a-\nb", " c \n d ", "ﬁx"]
+
+    assert clean_texts(texts) == [clean_text(text) for text in texts]
+
+
+BODY = ["Supervised learning fits labelled examples.", "A loss function measures the error.", "Gradient descent lowers the loss.", "Overfitting memorises noise."]
+
+
+def page(n, header="Machine Learning - Lecture Notes", footer=None):
+    return {"page": n, "section": "", "text": "\n".join([header, *BODY[n - 1:] + BODY[:n - 1], footer or f"Page {n} of 4"])}
+
+
+def test_strip_page_furniture_removes_headers_footers_and_page_numbers():
+    records = [page(n) for n in range(1, 5)]
+
+    cleaned = strip_page_furniture(records)
+
+    assert [record["text"].split("\n") for record in cleaned] == [BODY[n - 1:] + BODY[:n - 1] for n in range(1, 5)]
+    assert [record["page"] for record in cleaned] == [1, 2, 3, 4]
+
+
+def test_strip_page_furniture_keeps_body_lines_and_rare_edges():
+    records = [page(1, footer="- 1 -"), page(2, header="Appendix"), page(3), page(4)]
+    records[2]["text"] = records[2]["text"].replace(BODY[3], "Chapter 42 has 42 exercises.\n42")
+
+    cleaned = [record["text"].split("\n") for record in strip_page_furniture(records)]
+
+    assert cleaned[0][-1] == BODY[-1]
+    assert cleaned[1][0] == "Appendix"
+    assert "Chapter 42 has 42 exercises." in cleaned[2]
+    assert "42" in cleaned[2]
+    two_pages = [page(1), page(2)]
+    assert [r["text"] for r in strip_page_furniture(two_pages)][0].startswith("Machine Learning")
+
+
+def test_polish_collapses_whitespace_between_sentences():
+    answer = "First sentence.\n\nSecond   sentence\twith a tab.  Third/fourth option."
+
+    assert spacy_polish(answer) == "First sentence. Second sentence with a tab. Third/fourth option."
+    assert spacy_polish_many([answer, " x "]) == [spacy_polish(answer), "x"]
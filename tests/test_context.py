@@ -0,0 +1,74 @@
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+from src.context import ContextPacker, estimate_tokens, get_context_packer, truncate_to_tokens
+
+REGEX = "Regular expressions describe sets of strings and are matched by finite automata in linear time."
+TURING = "The Turing test asks whether a machine can imitate a human in a typed conversation with a judge."
+EMBEDDINGS = "Word embeddings map every word of the vocabulary to a dense vector learned from co-occurrence."
+
+
+def doc(text, source="notes.pdf"):
+    return Document(page_content=text, metadata={"source_pdf": source})
+
+
+def test_estimate_and_truncate_tokens():
+    assert estimate_tokens("a regex, e.g. a*b") == 10
+    assert estimate_tokens("internationalization") == 4
+    assert truncate_to_tokens(REGEX, 4) == "Regular expressions"
+    assert truncate_to_tokens(REGEX, 1000) == REGEX
+
+
+def test_duplicates_and_contained_chunks_are_dropped():
+    packer = ContextPacker(token_budget=1000)
+
+    context, report = packer.pack([doc(REGEX), doc("  " + REGEX.upper()), doc("sets of strings"), doc(TURING)])
+
+    assert context == REGEX + "\n\n" + TURING
+    assert report["duplicates"] == 2
+
+
+def test_chunk_overlap_with_same_source_is_trimmed():
+    overlap = "matched by finite automata in linear time."
+    follow_up = overlap + " Thompson's construction builds the automaton."
+    other_source = overlap + " Kleene's theorem relates the two formalisms."
+    packer = ContextPacker(token_budget=1000)
+
+    context, _ = packer.pack([doc(REGEX), doc(follow_up), doc(other_source, source="other.pdf")])
+
+    assert context.split("\n\n") == [REGEX, "Thompson's construction builds the automaton.", other_source]
+
+
+def test_near_duplicates_are_dropped_lexically():
+    reworded = REGEX.replace("linear time", "linear running time")
+    packer = ContextPacker(token_budget=1000, near_duplicate_threshold=0.6)
+
+    context, report = packer.pack([doc(REGEX), doc(reworded, source="slides.pdf"), doc(TURING)])
+
+    assert context == REGEX + "\n\n" + TURING
+    assert report["near_duplicates"] == 1
+
+
+def test_packing_respects_the_token_budget():
+    budget = estimate_tokens(REGEX) + estimate_tokens(EMBEDDINGS) + 2
+    packer = ContextPacker(token_budget=budget)
+
+    context, report = packer.pack([doc(REGEX), doc(TURING + " " + TURING), doc(EMBEDDINGS)])
+
+    assert context == REGEX + "\n\n" + EMBEDDINGS
+    assert report["over_budget"] == 1
+    assert report["context_tokens"] <= budget
+
+    tiny = ContextPacker(token_budget=5).pack([doc(TURING)])[0]
+    assert tiny == truncate_to_tokens(TURING, 5)
+
+
+def test_pack_for_prompt_records_prompt_tokens():
+    prompt = ChatPromptTemplate.from_template("Context:\n{context}\n\nQuestion: {question}")
+    packer = get_context_packer("fake")
+
+    prompt_input, report = packer.pack_for_prompt([doc(REGEX)], "What is a regex?", prompt)
+
+    assert prompt_input == {"context": REGEX, "question": "What is a regex?"}
+    assert report["prompt_tokens"] > report["context_tokens"] + report["question_tokens"]
+    assert packer.stats()["queries"] == 1
+    assert packer.token_budget == 3000
@@ -0,0 +1,116 @@
+import os
+import pytest
+from src.bm25 import BM25Index, PartitionedKeywordIndex
+from src.courses import DEFAULT_COURSE, course_slug, group_by_course, load_course_map
+from src.pipeline import build_partitioned_index, get_pipeline_retriever
+from src.retriever import combine_filters, split_course_filter
+
+COURSES = ["automata", "nlp", "philosophy"]
+
+DOCS = {
+    "[01] Regex.txt": "1 Regular expressions\nRegular expressions describe sets of strings.\f2 Automata\nA finite automaton accepts a regular language.",
+    "embeddings.txt": "1 Word embeddings\nWord embeddings map words to dense vectors.",
+    "turing.txt": "1 The Turing test\nThe Turing test asks whether a machine can imitate a human.",
+    "notes.txt": "1 Notes\nLoose notes that belong to no course.",
+}
+
+COURSE_MAP = {"automata": ["[01] Regex.txt"], "nlp": ["embeddings*"], "philosophy": ["*/turing.txt"]}
+
+
+def test_course_map_matches_names_globs_and_paths(tmp_path):
+    path = tmp_path / "courses.json"
+    path.write_text('{"nlp": ["*.docx"]}', encoding="utf-8")
+
+    groups = group_by_course([f"docs/{name}" for name in DOCS], COURSE_MAP)
+
+    assert groups == {
+        "automata": ["docs/[01] Regex.txt"],
+        DEFAULT_COURSE: ["docs/notes.txt"],
+        "nlp": ["docs/embeddings.txt"],
+        "philosophy": ["docs/turing.txt"],
+    }
+    assert load_course_map(str(path)) == {"nlp": ["*.docx"]}
+    assert load_course_map(str(tmp_path / "missing.json")) == {}
+    assert course_slug(" Deep Learning/II ") == "deep_learning_ii"
+
+
+def test_combine_filters_flattens_conditions():
+    assert combine_filters(None, {}) is None
+    assert combine_filters({"course": "nlp"}) == {"course": "nlp"}
+    assert combine_filters({"$and": [{"course": "nlp"}, {"page": 2}]}, {"document": "a.pdf"}) == {
+        "$and": [{"course": "nlp"}, {"page": 2}, {"document": "a.pdf"}]
+    }
+
+
+@pytest.mark.parametrize(
+    "search_filter, courses, rest",
+    [
+        (None, COURSES, None),
+        ({"course": "nlp"}, ["nlp"], None),
+        ({"course": {"$in": ["nlp", "automata", "unknown"]}}, ["automata", "nlp"], None),
+        ({"course": {"$ne": "nlp"}}, ["automata", "philosophy"], None),
+        ({"course": {"$nin": ["nlp", "automata"]}}, ["philosophy"], None),
+        ({"course": "nlp", "document": "embeddings.txt"}, ["nlp"], {"document": "embeddings.txt"}),
+        ({"$and": [{"course": "nlp"}, {"course": "automata"}]}, [], None),
+        ({"course": {"$gt": "m"}}, COURSES, {"course": {"$gt": "m"}}),
+    ],
+)
+def test_split_course_filter(search_filter, courses, rest):
+    assert split_course_filter(search_filter, COURSES) == (courses, rest)
+
+
+def test_partitioned_keyword_index_searches_only_selected_courses():
+    nlp, automata = BM25Index(), BM25Index()
+    nlp.add(["n1"], ["word embeddings map words to vectors"], [{"course": "nlp"}])
+    automata.add(["a1"], ["an automaton accepts words of a language"], [{"course": "automata"}])
+    index = PartitionedKeywordIndex({"nlp": nlp, "automata": automata, "philosophy": None})
+
+    assert len(index) == 2
+    assert {key for key, _ in index.search("words")} == {"n1", "a1"}
+    assert [key for key, _ in index.search("words", search_filter={"course": "automata"})] == ["a1"]
+    assert index.search("words", search_filter={"course": "philosophy"}) == []
+
+
+@pytest.fixture
+def partitioned(tmp_path):
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    paths = []
+    for name, text in DOCS.items():
+        (docs_dir / name).write_text(text, encoding="utf-8")
+        paths.append(str(docs_dir / name))
+    persist_dir = tmp_path / "index"
+    rag_index = build_partitioned_index(
+        paths, COURSE_MAP, chroma_persist_dir=str(persist_dir), embedding_model="fake",
+        embedding_disk_cache=False, chunker="structured", vector_backend="numpy",
+    )
+    return paths, persist_dir, rag_index
+
+
+def test_partitions_are_indexed_per_course(partitioned):
+    paths, persist_dir, rag_index = partitioned
+
+    assert sorted(rag_index.partitions) == sorted([*COURSES, DEFAULT_COURSE])
+    assert sorted(os.listdir(persist_dir / "courses")) == sorted([*COURSES, DEFAULT_COURSE])
+    assert os.path.isdir(persist_dir / "parsed_cache")
+    assert len({id(index.embed_model) for index in rag_index.partitions.values()}) == 1
+
+    with pytest.raises(ValueError, match="No documents for course"):
+        build_partitioned_index(paths, COURSE_MAP, chroma_persist_dir=str(persist_dir), courses="robotics",
+                                embedding_model="fake", embedding_disk_cache=False, vector_backend="numpy")
+
+
+@pytest.mark.parametrize("retrieval_mode", ["dense", "hybrid"])
+def test_filters_select_partitions_fixed_or_per_call(partitioned, retrieval_mode):
+    _, _, rag_index = partitioned
+    retriever = get_pipeline_retriever(rag_index, top_k=10, retrieval_mode=retrieval_mode)
+
+    everything = {doc.metadata["course"] for doc in retriever.invoke("words and automata")}
+    nlp_only = retriever.invoke("words and automata", config={"configurable": {"search_filter": {"course": "nlp"}}})
+    two_courses = retriever.invoke("words and automata", search_filter={"course": {"$in": ["nlp", "automata"]}})
+    fixed = get_pipeline_retriever(rag_index, top_k=10, retrieval_mode=retrieval_mode, search_filter={"course": "philosophy"})
+
+    assert everything == {*COURSES, DEFAULT_COURSE}
+    assert nlp_only and {doc.metadata["document"] for doc in nlp_only} == {"embeddings.txt"}
+    assert {doc.metadata["course"] for doc in two_courses} == {"nlp", "automata"}
+    assert {doc.metadata["course"] for doc in fixed.invoke("a machine")} == {"philosophy"}
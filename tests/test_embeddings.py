@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from src.embeddings import BatchingEmbeddings, CachedQueryEmbeddings, EmbeddingDiskCache, embed_queries
+
+
+class SlowEmbeddings(Embeddings):
+    """
+    Deterministic fake embeddings that take `delay` seconds per call and record call sizes.
+    """
+
+    def __init__(self, delay=0.02):
+        self.fake = DeterministicFakeEmbedding(size=8)
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append(("document", len(texts)))
+        return self.fake.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append(("query", len(texts)))
+        return [self.fake.embed_query(text) for text in texts]
+
+
+def test_concurrent_queries_are_micro_batched():
+    base = SlowEmbeddings()
+    model = BatchingEmbeddings(base, max_batch_size=64, max_wait_ms=5, workers=1)
+    questions = [f"question {i}" for i in range(24)]
+    results = {}
+
+    def ask(question):
+        results[question] = model.embed_query(question)
+
+    threads = [threading.Thread(target=ask, args=(q,)) for q in questions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    model.close()
+
+    assert all(np.allclose(results[q], base.fake.embed_query(q)) for q in questions)
+    # While the one worker embeds a batch, the requests queued behind it go out together
+    assert model.stats()["batches"] < len(questions)
+    assert sum(size for _, size in base.calls) == len(questions)
+
+
+def test_queries_and_documents_are_never_mixed_and_duplicates_embed_once():
+    base = SlowEmbeddings(delay=0.0)
+    model = BatchingEmbeddings(base, workers=2)
+
+    async def run():
+        return await asyncio.gather(
+            model.aembed_query("same question"),
+            model.aembed_query("same question"),
+            model.aembed_documents(["chunk one", "chunk two"]),
+        )
+
+    first, second, documents = asyncio.run(run())
+    model.close()
+
+    assert first == second
+    assert np.allclose(documents, base.fake.embed_documents(["chunk one", "chunk two"]))
+    assert sum(size for kind, size in base.calls if kind == "query") == 1
+    assert {kind for kind, _ in base.calls} == {"query", "document"}
+
+
+def test_errors_reach_every_caller_of_the_batch():
+    class Broken(SlowEmbeddings):
+        def embed_documents(self, texts):
+            raise RuntimeError("model crashed")
+
+    model = BatchingEmbeddings(Broken(delay=0.0))
+    with pytest.raises(RuntimeError, match="model crashed"):
+        model.embed_documents(["chunk"])
+    assert model.embed_query("still works") is not None
+    model.close()
+
+
+def test_disk_cache_is_shared_across_executors(tmp_path):
+    path = str(tmp_path / "embedding_cache.sqlite3")
+    first = BatchingEmbeddings(SlowEmbeddings(delay=0.0), model_name="fake", disk_cache_path=path)
+    vectors = first.embed_documents(["chunk one", "chunk two"])
+    first.close()
+
+    base = SlowEmbeddings(delay=0.0)
+    second = BatchingEmbeddings(base, model_name="fake", disk_cache_path=path)
+
+    assert np.allclose(second.embed_documents(["chunk one", "chunk two"]), vectors)
+    # Queries are cached separately from documents, under the same text
+    second.embed_query("chunk one")
+    assert second.stats()["disk_hits"] == 2
+    assert base.calls == [("query", 1)]
+    second.close()
+
+
+def test_disk_cache_keys_separate_models_and_kinds(tmp_path):
+    cache = EmbeddingDiskCache(str(tmp_path / "cache.sqlite3"), model_name="bge-base")
+    other = EmbeddingDiskCache(str(tmp_path / "cache.sqlite3"), model_name="bge-small")
+
+    assert cache.key("query", "text") == cache.key("query", "text")
+    assert len({cache.key("query", "text"), cache.key("document", "text"), other.key("query", "text")}) == 3
+    cache.put_many([(cache.key("query", "text"), [0.5, 0.25])])
+    assert cache.get_many([cache.key("query", "text"), other.key("query", "text")]) == {cache.key("query", "text"): [0.5, 0.25]}
+    cache.close()
+    other.close()
+
+
+def test_embed_queries_uses_the_batched_path():
+    base = SlowEmbeddings(delay=0.0)
+    model = CachedQueryEmbeddings(BatchingEmbeddings(base))
+
+    vectors = embed_queries(model, ["a", "b", "a"])
+
+    assert vectors[0] == vectors[2]
+    assert base.calls == [("query", 2)]
+    model.base.close()
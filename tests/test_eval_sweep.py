@@ -0,0 +1,94 @@
+import pytest
+from benchmarks.eval_sweep import evaluate_config, format_table, local_judge, mark_pareto, read_qa, stub_answer, token_f1
+from src.pipeline import build_index
+
+QA_TEXT = """Classic RAG questions
+
+1. What does a regular expression describe?
+ans - A set of strings (correct)
+
+2. What accepts a regular language?
+Expected answer -
+A finite automaton
+accepts every regular language.
+-----
+Notes that are not part of the answer.
+
+3. A question without a reference?
+"""
+
+
+def test_read_qa_parses_both_reference_layouts(tmp_path):
+    path = tmp_path / "qa.txt"
+    path.write_text(QA_TEXT, encoding="utf-8")
+    jsonl = tmp_path / "qa.jsonl"
+    jsonl.write_text('{"question": "Q?", "reference": "R"}\n\n', encoding="utf-8")
+
+    assert read_qa(str(path)) == [
+        {"question": "What does a regular expression describe?", "reference": "A set of strings"},
+        {"question": "What accepts a regular language?", "reference": "A finite automaton accepts every regular language."},
+    ]
+    assert read_qa(str(jsonl)) == [{"question": "Q?", "reference": "R"}]
+
+
+def test_local_judge_scores():
+    sample = {
+        "question": "what accepts a regular language",
+        "reference": "a finite automaton",
+        "answer": "a finite automaton",
+        "contexts": ["strings and sets", "a finite automaton accepts it"],
+        "relevant": [False, True],
+    }
+
+    scores = local_judge([sample])
+
+    assert token_f1("a finite automaton", "a finite automaton") == 1.0
+    assert token_f1("nothing shared", "a finite automaton") == 0.0
+    assert scores["context_precision"] == 0.5
+    assert scores["faithfulness"] == scores["context_recall"] == scores["answer_correctness"] == 1.0
+    assert local_judge([]) == dict.fromkeys(scores, 0.0)
+
+
+def test_pareto_front_and_table():
+    rows = [
+        {"name": "best", "quality": 0.9, "recall@k": 1.0, "p95_ms": 10.0, "prompt_tokens": 500.0},
+        {"name": "cheap", "quality": 0.5, "recall@k": 0.5, "p95_ms": 5.0, "prompt_tokens": 200.0},
+        {"name": "dominated", "quality": 0.5, "recall@k": 0.5, "p95_ms": 10.0, "prompt_tokens": 500.0},
+        {"name": "tie", "quality": 0.5, "recall@k": 0.5, "p95_ms": 5.0, "prompt_tokens": 200.0},
+    ]
+
+    mark_pareto(rows)
+
+    assert {row["name"] for row in rows if row["pareto"]} == {"best", "cheap", "tie"}
+    defaults = {"chunker": "structured", "chunk_size": 2000, "chunk_overlap": 50, "breakpoint_percentile": 95.0, "top_k": 5,
+                "mrr": 1.0, "faithfulness": 1.0, "answer_correctness": 1.0, "p50_ms": 1.0, "chunks": 3,
+                "embeds_per_sentence": None, "breakpoint_search_rate": 0.25}
+    table = format_table([{**defaults, **row} for row in rows]).splitlines()
+    assert len(table) == 2 + len(rows)
+    assert table[2].endswith("| ★ |") and table[4].endswith("|  |")
+    assert "| - |" in table[2]
+
+
+def test_evaluate_config_reports_recall_and_mrr(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text(
+        "1 Regular expressions\nA regular expression describes a set of strings.\f"
+        "2 Automata\nA finite automaton accepts every regular language.",
+        encoding="utf-8",
+    )
+    rag_index = build_index([str(path)], chroma_persist_dir=str(tmp_path / "index"), embedding_model="fake",
+                            chunker="structured", vector_backend="numpy", embedding_disk_cache=False)
+    qa = [
+        {"question": "What does a regular expression describe?", "reference": "a set of strings"},
+        {"question": "Who wrote the course?", "reference": "professor unknown somebody"},
+    ]
+
+    samples, result = evaluate_config(rag_index, qa, top_k=2, answer_fn=lambda p: stub_answer(p["question"], p["context"]),
+                                      context_packer=None, relevance=0.6)
+
+    first_hit = next(rank for rank, flag in enumerate(samples[0]["relevant"], 1) if flag)
+    assert result["recall@k"] == 0.5
+    assert result["mrr"] == pytest.approx(round(1 / first_hit / 2, 4))
+    assert not any(samples[1]["relevant"])
+    assert all(len(sample["contexts"]) == 2 for sample in samples)
+    assert result["prompt_tokens"] > result["answer_tokens"] > 0
@@ -0,0 +1,83 @@
+import asyncio
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.retrievers import BaseRetriever
+from src.extractive import ExtractiveFirstChain, ExtractiveReader, sentence_around
+
+CHUNKS = [
+    "Turing proposed the imitation game in 1950. It is now called the Turing test.",
+    "Regular expressions are equivalent to finite automata. Kleene proved this in 1956.",
+]
+
+
+class ListRetriever(BaseRetriever):
+    docs: list
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.docs
+
+
+def fake_reader(scores):
+    """
+    QA pipeline stand-in: answers with the year in each context, scored scores[i].
+    """
+
+    def read(inputs, batch_size=8, max_answer_len=64):
+        results = []
+        for i, item in enumerate(inputs):
+            answer = "1956" if "1956" in item["context"] else "1950"
+            start = item["context"].find(answer)
+            results.append({"answer": answer, "score": scores[i], "start": start, "end": start + len(answer)})
+        return results
+
+    return read
+
+
+def make_chain(scores, min_score=0.5):
+    retriever = ListRetriever(docs=[Document(page_content=text, metadata={"source_pdf": f"doc{i}.pdf"}) for i, text in enumerate(CHUNKS)])
+    reader = ExtractiveReader(min_score=min_score, reader=fake_reader(scores))
+    return ExtractiveFirstChain(retriever, FakeListChatModel(responses=["LLM answer"]), reader)
+
+
+def test_sentence_around_returns_the_sentences_of_a_span():
+    text = CHUNKS[1]
+
+    assert sentence_around(text, text.find("1956"), text.find("1956") + 4) == "Kleene proved this in 1956."
+    assert sentence_around(text, text.find("automata"), text.find("Kleene") + 6) == text
+
+
+def test_reader_keeps_the_best_span():
+    reader = ExtractiveReader(min_score=0.5, reader=fake_reader([0.2, 0.9]))
+
+    result = reader.read("When did Kleene prove it?", [Document(page_content=t, metadata={"source_pdf": f"doc{i}.pdf"}) for i, t in enumerate(CHUNKS)])
+
+    assert result == {"answer": "Kleene proved this in 1956.", "span": "1956", "score": 0.9, "accepted": True, "source": "doc1.pdf"}
+    assert reader.read("Anything?", [Document(page_content="  ")]) is None
+
+
+def test_confident_answers_skip_the_llm():
+    chain = make_chain([0.2, 0.9])
+
+    assert chain.invoke("When did Kleene prove it?") == "Kleene proved this in 1956."
+    assert list(chain.stream("When did Kleene prove it?")) == ["Kleene proved this in 1956."]
+    assert chain.stats()["extractive"] == 2
+    assert chain.stats()["escalated"] == 0
+
+
+def test_unconfident_answers_escalate_to_the_llm():
+    chain = make_chain([0.2, 0.3])
+
+    assert chain.invoke("Why is it equivalent?") == "LLM answer"
+    assert asyncio.run(chain.ainvoke("Why is it equivalent?")) == "LLM answer"
+    assert chain.stats()["escalated"] == 2
+
+
+def test_reader_failure_escalates_to_the_llm():
+    def broken_reader(inputs, **kwargs):
+        raise RuntimeError("model not available")
+
+    chain = make_chain([0.9, 0.9])
+    chain.reader.reader = broken_reader
+
+    assert chain.invoke("When did Kleene prove it?") == "LLM answer"
+    assert chain.stats()["escalated"] == 1
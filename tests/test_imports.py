@@ -0,0 +1,18 @@
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+HEAVY_MODULES = ("langchain", "langchain_core", "langchain_community", "chromadb", "spacy", "numpy", "fastembed", "pdfplumber", "faiss")
+
+
+@pytest.mark.parametrize("module", ["src.pipeline", "src.registry", "src.config"])
+def test_importing_entry_points_defers_heavy_dependencies(module):
+    code = (
+        f"import sys, {module}\n"
+        f"print(','.join(sorted({{name.split('.')[0] for name in sys.modules}} & set({HEAVY_MODULES!r}))))"
+    )
+
+    loaded = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).resolve().parents[1], capture_output=True, text=True, check=True).stdout.strip()
+
+    assert loaded == ""
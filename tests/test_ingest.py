@@ -0,0 +1,160 @@
+import pytest
+from src.manifest import load_manifest
+from src.pipeline import IndexSettings, PipelineSettings, build_index
+
+SECTIONS = {
+    "regex.txt": [
+        "1 Regular expressions\nRegular expressions describe sets of strings. A finite automaton accepts exactly such a set.",
+        "2 Automata\nEvery regular expression has an equivalent automaton. Determinization may blow up the state count.",
+    ],
+    "turing.txt": [
+        "1 The Turing test\nThe Turing test asks whether a machine can imitate a human in conversation.",
+        "2 Objections\nTuring answered the theological objection and the argument from consciousness.",
+    ],
+    "embeddings.txt": [
+        "1 Word embeddings\nWord embeddings map words to dense vectors. Similar words end up close together.",
+    ],
+}
+
+
+def write_docs(directory, names):
+    paths = []
+    for name in names:
+        path = directory / name
+        path.write_text("\f".join(SECTIONS[name]), encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def build(paths, persist_dir, **options):
+    return build_index(
+        paths,
+        chroma_persist_dir=str(persist_dir),
+        embedding_model="fake",
+        chunker="structured",
+        vector_backend="numpy",
+        embedding_disk_cache=False,
+        **options,
+    )
+
+
+def chunk_ids(index):
+    return sorted(index.vectorstore.get()["ids"])
+
+
+def file_chunk_ids(persist_dir, path):
+    return load_manifest(str(persist_dir))["files"][path]["chunk_ids"]
+
+
+@pytest.fixture
+def docs(tmp_path):
+    directory = tmp_path / "docs"
+    directory.mkdir()
+    return directory
+
+
+def test_unchanged_files_are_not_reindexed(docs, tmp_path, monkeypatch):
+    paths = write_docs(docs, ["regex.txt", "turing.txt"])
+    first = build(paths, tmp_path / "index")
+
+    import src.ingest
+    monkeypatch.setattr(src.ingest, "iter_chunk_batches", lambda *args, **kwargs: pytest.fail("unchanged file re-chunked"))
+    second = build(paths, tmp_path / "index")
+
+    assert second.index_version == first.index_version
+    assert chunk_ids(second) == chunk_ids(first)
+    assert len(second.keyword_index) == second.vectorstore.count()
+
+
+def test_modified_and_removed_files_are_synced(docs, tmp_path):
+    paths = write_docs(docs, ["regex.txt", "turing.txt", "embeddings.txt"])
+    first = build(paths, tmp_path / "index")
+    regex_ids = file_chunk_ids(tmp_path / "index", paths[0])
+    turing_ids = file_chunk_ids(tmp_path / "index", paths[1])
+
+    (docs / "turing.txt").write_text(SECTIONS["turing.txt"][0], encoding="utf-8")
+    second = build(paths[:2], tmp_path / "index")
+
+    assert second.index_version != first.index_version
+    assert file_chunk_ids(tmp_path / "index", paths[0]) == regex_ids
+    new_turing_ids = file_chunk_ids(tmp_path / "index", paths[1])
+    assert not set(new_turing_ids) & set(turing_ids)
+    assert chunk_ids(second) == sorted(regex_ids + new_turing_ids)
+    assert sorted(second.keyword_index.docs) == chunk_ids(second)
+    assert paths[2] not in load_manifest(str(tmp_path / "index"))["files"]
+
+
+def test_settings_change_reindexes_everything(docs, tmp_path):
+    paths = write_docs(docs, ["regex.txt"])
+    first = build(paths, tmp_path / "index")
+
+    second = build(paths, tmp_path / "index", breakpoint_percentile=50)
+
+    assert second.index_version != first.index_version
+    assert chunk_ids(second) == sorted(file_chunk_ids(tmp_path / "index", paths[0]))
+
+
+def test_interrupted_ingestion_resumes_from_checkpoint(docs, tmp_path, monkeypatch):
+    import src.ingest
+    paths = write_docs(docs, ["regex.txt", "turing.txt", "embeddings.txt"])
+    expected = build(paths, tmp_path / "fresh", batch_size=1)
+
+    save_checkpoint, saves = src.ingest.save_checkpoint, []
+
+    def interrupt_after_fourth_batch(persist_directory, checkpoint):
+        save_checkpoint(persist_directory, checkpoint)
+        saves.append(checkpoint)
+        if len(saves) == 4:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(src.ingest, "save_checkpoint", interrupt_after_fourth_batch)
+    with pytest.raises(KeyboardInterrupt):
+        build(paths, tmp_path / "index", batch_size=1)
+    monkeypatch.undo()
+
+    iter_chunk_batches, starts = src.ingest.iter_chunk_batches, []
+
+    def record_start(path, *args, **kwargs):
+        starts.append((path, kwargs["start_chunk"]))
+        return iter_chunk_batches(path, *args, **kwargs)
+
+    monkeypatch.setattr(src.ingest, "iter_chunk_batches", record_start)
+    resumed = build(paths, tmp_path / "index", batch_size=1)
+
+    assert starts[0] == (saves[-1]["path"], saves[-1]["next_chunk"])
+    assert saves[-1]["next_chunk"] > 0
+    assert chunk_ids(resumed) == chunk_ids(expected)
+    assert sorted(resumed.keyword_index.docs) == chunk_ids(expected)
+    assert resumed.index_version == expected.index_version
+
+
+def test_parallel_ingestion_matches_serial(docs, tmp_path):
+    paths = write_docs(docs, ["regex.txt", "turing.txt", "embeddings.txt"])
+
+    serial = build(paths, tmp_path / "serial")
+    parallel = build(paths, tmp_path / "parallel", workers=2)
+
+    assert parallel.index_version == serial.index_version
+    assert parallel.vectorstore.get(include=["documents", "metadatas"]) == serial.vectorstore.get(include=["documents", "metadatas"])
+
+
+def test_index_settings_and_keyword_options_build_the_same_index(docs, tmp_path):
+    paths = write_docs(docs, ["regex.txt", "turing.txt"])
+    settings = IndexSettings(embedding_model="fake", chunker="structured", vector_backend="numpy", embedding_disk_cache=False)
+
+    from_settings = build_index(paths, settings, chroma_persist_dir=str(tmp_path / "settings"), breakpoint_percentile=50)
+    from_options = build(paths, tmp_path / "options", breakpoint_percentile=50)
+
+    assert from_settings.index_version == from_options.index_version
+    assert settings.breakpoint_percentile == 95
+    with pytest.raises(TypeError):
+        build_index(paths, settings, chunk_sise=500)
+
+
+def test_pipeline_settings_route_index_options():
+    settings = PipelineSettings(top_k=3).replace(chunk_size=500, retrieval_mode="hybrid")
+
+    assert (settings.top_k, settings.retrieval_mode, settings.index.chunk_size) == (3, "hybrid", 500)
+    assert settings.index.chunk_overlap == IndexSettings().chunk_overlap
+    with pytest.raises(TypeError):
+        settings.replace(chunk_sise=500)
@@ -0,0 +1,103 @@
+import asyncio
+import time
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from src.llm_router import AllBackendsFailed, HedgedChatModel
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Answers `reply` after `delay` seconds, or raises if `fail`.
+    """
+
+    reply: str = ""
+    delay: float = 0.0
+    fail: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _wait(self):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("backend down")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._wait()
+        message = AIMessage(content=self.reply, response_metadata={"backend": self.reply}, usage_metadata={"input_tokens": 3, "output_tokens": 2, "total_tokens": 5})
+        return ChatResult(generations=[ChatGeneration(message=message, generation_info={"finish_reason": "stop"})], llm_output={"backend": self.reply})
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self._wait()
+        for word in self.reply.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+def router(*backends, **options):
+    return HedgedChatModel(backends=list(backends), names=[f"b{i}" for i in range(len(backends))], **options)
+
+
+def test_failover_to_next_backend():
+    model = router(ScriptedChatModel(fail=True), ScriptedChatModel(reply="second answers"), hedge_after_ms=None)
+
+    assert model.invoke("hi").content == "second answers"
+    assert "".join(chunk.content for chunk in model.stream("hi")) == "second answers "
+    counts = model.stats()["backends"]
+    assert counts["b0"]["errors"] == 2
+    assert counts["b1"]["wins"] == 2
+
+
+def test_slow_backend_is_hedged():
+    model = router(ScriptedChatModel(reply="slow", delay=1.0), ScriptedChatModel(reply="fast"), hedge_after_ms=50)
+
+    start = time.perf_counter()
+    answer = model.invoke("hi").content
+
+    assert answer == "fast"
+    assert time.perf_counter() - start < 0.5
+    assert model.stats()["backends"]["b1"]["hedges"] == 1
+
+
+def test_fast_primary_is_not_hedged():
+    model = router(ScriptedChatModel(reply="fast"), ScriptedChatModel(reply="backup"), hedge_after_ms=500)
+
+    assert model.invoke("hi").content == "fast"
+    assert model.stats()["backends"]["b1"]["attempts"] == 0
+
+
+def test_winning_generation_is_returned_unchanged():
+    model = router(ScriptedChatModel(fail=True), ScriptedChatModel(reply="answer"), hedge_after_ms=None)
+
+    result = model.generate([[HumanMessage(content="hi")]])
+
+    generation = result.generations[0][0]
+    assert generation.generation_info == {"finish_reason": "stop"}
+    assert generation.message.response_metadata["backend"] == "answer"
+    assert generation.message.usage_metadata["total_tokens"] == 5
+
+
+def test_all_backends_failing_raises():
+    model = router(ScriptedChatModel(fail=True), ScriptedChatModel(fail=True), hedge_after_ms=None)
+
+    with pytest.raises(AllBackendsFailed):
+        model.invoke("hi")
+
+
+def test_async_failover_and_hedging():
+    failover = router(ScriptedChatModel(fail=True), ScriptedChatModel(reply="second answers"), hedge_after_ms=None)
+    hedged = router(ScriptedChatModel(reply="slow", delay=1.0), ScriptedChatModel(reply="fast"), hedge_after_ms=50)
+
+    async def run():
+        streamed = [chunk.content async for chunk in failover.astream("hi")]
+        start = time.perf_counter()
+        answers = await asyncio.gather(*(hedged.ainvoke(f"q{i}") for i in range(3)))
+        return streamed, [answer.content for answer in answers], time.perf_counter() - start
+
+    streamed, answers, seconds = asyncio.run(run())
+
+    assert "".join(streamed) == "second answers "
+    assert answers == ["fast"] * 3
+    assert seconds < 0.5
@@ -0,0 +1,87 @@
+import os
+import zipfile
+import pytest
+from src import loaders
+from src.loaders import SUPPORTED_EXTENSIONS, get_loader, load_document
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def paragraph(text, style=None, page_break=False):
+    style_xml = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    break_xml = '<w:r><w:br w:type="page"/></w:r>' if page_break else ""
+    return f"<w:p>{style_xml}<w:r><w:t>{text}</w:t></w:r>{break_xml}</w:p>"
+
+
+def write_docx(path, body):
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("word/document.xml", f'<w:document xmlns:w="{W}"><w:body>{body}</w:body></w:document>')
+
+
+def test_docx_records_follow_headings_page_breaks_and_tables(tmp_path):
+    path = tmp_path / "notes.docx"
+    table = (
+        "<w:tbl><w:tr>"
+        "<w:tc><w:p><w:r><w:t>Model</w:t></w:r></w:p></w:tc><w:tc><w:p><w:r><w:t>Accuracy</w:t></w:r></w:p></w:tc>"
+        "</w:tr></w:tbl>"
+    )
+    write_docx(path, "".join([
+        paragraph("Introduction", style="Heading1"),
+        paragraph("Machine learning learns from data.", page_break=True),
+        paragraph("Still the introduction."),
+        paragraph("Evaluation", style="Heading2"),
+        table,
+    ]))
+
+    records = load_document(str(path))
+
+    assert records == [
+        {"page": 1, "section": "Introduction", "text": "Introduction\nMachine learning learns from data."},
+        {"page": 2, "section": "Introduction", "text": "Still the introduction."},
+        {"page": 2, "section": "Evaluation", "text": "Evaluation\nModel | Accuracy"},
+    ]
+
+
+def test_text_records_split_on_form_feeds(tmp_path):
+    path = tmp_path / "notes.md"
+    path.write_text("# Page one\n\fPage two\n\f  \n", encoding="utf-8")
+
+    assert load_document(str(path)) == [
+        {"page": 1, "section": "", "text": "# Page one\n"},
+        {"page": 2, "section": "", "text": "Page two\n"},
+    ]
+
+
+def test_pdf_pages_are_records():
+    path = os.path.join(os.path.dirname(__file__), os.pardir, "data", "ML_course_content_1.pdf")
+    if not os.path.exists(path):
+        pytest.skip("sample PDF not available")
+
+    records = load_document(path)
+
+    assert records and [r["page"] for r in records] == sorted({r["page"] for r in records})
+    assert all(r["text"].strip() for r in records)
+
+
+def test_unsupported_extension_is_rejected():
+    assert {".pdf", ".docx", ".txt", ".md"} <= set(SUPPORTED_EXTENSIONS)
+    with pytest.raises(ValueError, match="Unsupported document type"):
+        get_loader("slides.pptx")
+
+
+def test_parse_cache_skips_unchanged_files(tmp_path, monkeypatch):
+    path = tmp_path / "notes.txt"
+    path.write_text("First page\fSecond page", encoding="utf-8")
+    cache_dir = str(tmp_path / "parsed_cache")
+    records = load_document(str(path), cache_dir=cache_dir)
+
+    def load_text_records(text_path):
+        raise AssertionError("cached file parsed again")
+
+    monkeypatch.setitem(loaders.LOADERS, ".txt", load_text_records)
+    assert load_document(str(path), cache_dir=cache_dir) == records
+
+    # Changed content has a new hash, so it is parsed again
+    path.write_text("Rewritten", encoding="utf-8")
+    with pytest.raises(AssertionError):
+        load_document(str(path), cache_dir=cache_dir)
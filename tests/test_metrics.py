@@ -0,0 +1,64 @@
+import time
+from src.loaders import load_document
+from src.manifest import file_sha256
+from src.metrics import LatencyHistogram, LatencyRecorder, StageTimer
+from src.pipeline import build_index
+
+
+def test_stage_timer_accumulates_per_stage():
+    timer = StageTimer()
+    with timer.stage("embed"):
+        time.sleep(0.01)
+    with timer.stage("embed"):
+        pass
+    timer.add("load (worker)", 0.5, count=3)
+
+    stages = timer.as_dict()
+
+    assert stages["embed"]["count"] == 2
+    assert stages["embed"]["seconds"] >= 0.01
+    assert stages["load (worker)"] == {"seconds": 0.5, "count": 3}
+    assert "load (worker)" in timer.report()
+
+
+def test_latency_percentiles():
+    histogram = LatencyHistogram(max_samples=100)
+    for ms in range(1, 201):
+        histogram.record(ms / 1000)
+
+    # Only the most recent max_samples are kept for percentiles; count covers all
+    assert histogram.count == 200
+    assert histogram.percentile(0) == 0.101
+    assert histogram.percentile(50) == 0.151
+    assert histogram.summary()["p99_ms"] == 199.0
+
+    recorder = LatencyRecorder()
+    with recorder.time("retrieve"):
+        pass
+    assert recorder.summary()["retrieve"]["count"] == 1
+    assert LatencyHistogram().percentile(95) == 0.0
+
+
+def test_build_index_reports_separate_ingestion_stages(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("1 Regular expressions\nA regex describes a set of strings.\f2 Automata\nAn automaton accepts them.", encoding="utf-8")
+    timer = StageTimer()
+
+    build_index([str(path)], chroma_persist_dir=str(tmp_path / "index"), embedding_model="fake", chunker="structured",
+                vector_backend="numpy", embedding_disk_cache=False, timer=timer)
+
+    assert {"load", "prechunk", "semantic_chunk", "clean", "index"} <= set(timer.seconds)
+
+
+def test_bench_corpus_variants_keep_pages_but_change_content(tmp_path):
+    from benchmarks.bench_pipeline import build_corpus
+
+    path = tmp_path / "notes.txt"
+    path.write_text("First sentence. Second sentence. Third sentence.\fFourth sentence. Fifth sentence.", encoding="utf-8")
+
+    corpus = build_corpus([str(path)], scale=3, corpus_dir=str(tmp_path / "corpus"))
+
+    assert build_corpus([str(path)], scale=1, corpus_dir=str(tmp_path / "unused")) == [str(path)]
+    assert len(corpus) == 3
+    assert all(len(load_document(variant)) == 2 for variant in corpus)
+    assert len({file_sha256(variant) for variant in corpus}) == 3
@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+from src.native_store import FaissVectorStore, NumpyVectorStore, matches_filter, quantize
+
+DIM = 64
+
+
+def random_unit_vectors(n, seed):
+    vectors = np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_store(path, vectors, **options):
+    store = NumpyVectorStore(None, str(path), **options)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    store.upsert_embeddings(ids, vectors, [f"text {i}" for i in range(len(vectors))], [{"even": i % 2 == 0} for i in range(len(vectors))])
+    return store
+
+
+def top_ids(store, queries, k, **options):
+    return [[doc.id for doc, _ in hits] for hits in store.search_by_vectors(queries, k=k, **options)]
+
+
+@pytest.mark.parametrize("quantization, max_error", [("float16", 1e-3), ("int8", 1e-2)])
+def test_quantize_round_trip(quantization, max_error):
+    vectors = random_unit_vectors(100, seed=0)
+
+    codes, scales = quantize(vectors, quantization)
+
+    decoded = codes.astype(np.float32) * (scales[:, None] if scales is not None else 1)
+    assert np.abs(decoded - vectors).max() < max_error
+    assert codes.nbytes == vectors.nbytes // (2 if quantization == "float16" else 4)
+
+
+def test_quantize_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        quantize(random_unit_vectors(2, seed=0), "int4")
+
+
+@pytest.mark.parametrize("quantization", ["float16", "int8"])
+def test_quantized_search_rescores_to_exact_results(tmp_path, quantization):
+    vectors = random_unit_vectors(2000, seed=1)
+    queries = random_unit_vectors(20, seed=2)
+    exact = make_store(tmp_path / "exact", vectors)
+    quantized = make_store(tmp_path / quantization, vectors, quantization=quantization)
+
+    exact_hits = exact.search_by_vectors(queries, k=10)
+    quantized_hits = quantized.search_by_vectors(queries, k=10)
+
+    overlap = [len({d.id for d, _ in a} & {d.id for d, _ in b}) for a, b in zip(exact_hits, quantized_hits)]
+    assert sum(overlap) / (10 * len(queries)) >= 0.95
+    # Returned scores come from the full-precision rows, not the quantized copy
+    for query, hits in zip(queries, quantized_hits):
+        for doc, score in hits:
+            assert score == pytest.approx(float(vectors[int(doc.id[1:])] @ query), abs=1e-5)
+    assert quantized.memory_footprint() < exact.memory_footprint()
+
+
+def test_quantized_store_survives_reload_with_deletes_and_filters(tmp_path):
+    vectors = random_unit_vectors(300, seed=3)
+    store = make_store(tmp_path / "store", vectors, quantization="int8")
+    store.delete(["c0", "c2"])
+
+    reloaded = NumpyVectorStore.load(None, str(tmp_path / "store"), quantization="int8")
+
+    assert reloaded.count() == 298
+    assert not {"c0", "c2"} & {chunk_id for hits in top_ids(reloaded, vectors[:3], k=5) for chunk_id in hits}
+    assert top_ids(reloaded, vectors[1:2], k=1) == [["c1"]]
+    even_hits = top_ids(reloaded, vectors[10:11], k=5, search_filter={"even": True})
+    assert even_hits[0][0] == "c10"
+    assert all(int(chunk_id[1:]) % 2 == 0 for chunk_id in even_hits[0])
+
+
+def test_matches_filter_operators():
+    metadata = {"course": "nlp", "page": 3}
+
+    assert matches_filter(metadata, None)
+    assert matches_filter(metadata, {"course": "nlp", "page": {"$in": [1, 3]}})
+    assert matches_filter(metadata, {"$or": [{"course": "theory"}, {"page": {"$ne": 1}}]})
+    assert not matches_filter(metadata, {"$and": [{"course": "nlp"}, {"page": {"$nin": [3]}}]})
+    assert not matches_filter(metadata, {"document": {"$eq": "NLP.pdf"}})
+
+
+def test_upserts_deletes_and_saves_survive_reload(tmp_path):
+    vectors = random_unit_vectors(40, seed=4)
+    store = NumpyVectorStore(None, str(tmp_path / "store"), autosave=False)
+    for start in range(0, 40, 5):
+        ids = [f"c{i}" for i in range(start, start + 5)]
+        store.upsert_embeddings(ids, vectors[start:start + 5], [f"text {i}" for i in range(start, start + 5)])
+        store.save()
+    store.upsert_embeddings(["c1"], vectors[39:40], ["replaced"])
+    store.delete(["c2", "missing"])
+    store.save()
+
+    reloaded = NumpyVectorStore.load(None, str(tmp_path / "store"))
+
+    assert reloaded.count() == 39
+    # Segments are merged as they are saved, so their number grows logarithmically
+    assert len(reloaded.segments) <= 4
+    assert reloaded.get(ids=["c1", "c2"]) == {"ids": ["c1"], "documents": ["replaced"], "metadatas": [{}]}
+    assert reloaded.get(limit=3, offset=2)["ids"] == ["c4", "c5", "c6"]
+    assert top_ids(reloaded, vectors[10:11], k=1) == [["c10"]]
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_faiss_store_matches_exact_search(tmp_path, index_type):
+    pytest.importorskip("faiss")
+    vectors = random_unit_vectors(1000, seed=5)
+    queries = random_unit_vectors(20, seed=6)
+    exact = make_store(tmp_path / "exact", vectors)
+    store = FaissVectorStore(None, str(tmp_path / index_type), index_type=index_type, nprobe=16)
+    store.upsert_embeddings([f"c{i}" for i in range(len(vectors))], vectors, [f"text {i}" for i in range(len(vectors))], [{"even": i % 2 == 0} for i in range(len(vectors))])
+
+    expected, found = top_ids(exact, queries, k=10), top_ids(store, queries, k=10)
+
+    recall = sum(len(set(a) & set(b)) for a, b in zip(expected, found)) / (10 * len(queries))
+    assert recall >= (1.0 if index_type == "flat" else 0.8)
+    filtered = top_ids(store, queries, k=5, search_filter={"even": False})
+    assert all(int(chunk_id[1:]) % 2 == 1 for hits in filtered for chunk_id in hits)
+    if index_type == "flat":
+        assert filtered == top_ids(exact, queries, k=5, search_filter={"even": False})
+
+
+def test_faiss_index_is_saved_and_reused(tmp_path):
+    pytest.importorskip("faiss")
+    vectors = random_unit_vectors(100, seed=7)
+    store = FaissVectorStore(None, str(tmp_path / "store"))
+    store.upsert_embeddings([f"c{i}" for i in range(100)], vectors, [f"text {i}" for i in range(100)])
+    top_ids(store, vectors[:1], k=1)
+    store.save()
+
+    reloaded = FaissVectorStore.load(None, str(tmp_path / "store"))
+    assert reloaded.index is not None
+    assert top_ids(reloaded, vectors[3:4], k=1) == [["c3"]]
+
+    reloaded.delete(["c3"])
+    assert reloaded.index is None
+    assert top_ids(reloaded, vectors[3:4], k=1) != [["c3"]]
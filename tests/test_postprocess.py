@@ -0,0 +1,45 @@
+import random
+import pytest
+from src.postprocess import spacy_polish, spacy_polish_stream
+
+ANSWERS = [
+    "A regular expression describes a set of strings.  It is matched by a finite automaton.\n\nSee section 2.1 for details!",
+    'Turing asked: "Can machines think?" He replaced the question with a game.\tThe game is the Turing test.',
+    "Embeddings map words to vectors (e.g. word2vec). Similar words end up close",
+    "One sentence only.",
+    "   ",
+]
+
+
+def split_tokens(text, mode, seed=0):
+    if mode == "chars":
+        return list(text)
+    if mode == "words":
+        return [word + " " for word in text.split(" ")[:-1]] + text.split(" ")[-1:]
+    rng, tokens, start = random.Random(seed), [], 0
+    while start < len(text):
+        end = start + rng.randint(1, 7)
+        tokens.append(text[start:end])
+        start = end
+    return tokens
+
+
+@pytest.mark.parametrize("mode", ["chars", "words", "random"])
+@pytest.mark.parametrize("answer", ANSWERS)
+def test_streamed_polish_matches_whole_answer_polish(answer, mode):
+    assert "".join(spacy_polish_stream(split_tokens(answer, mode))) == spacy_polish(answer)
+
+
+def test_completed_sentences_are_yielded_before_the_stream_ends():
+    consumed = []
+
+    def tokens():
+        for token in split_tokens(ANSWERS[0], "words"):
+            consumed.append(token)
+            yield token
+
+    stream = spacy_polish_stream(tokens())
+    first = next(stream)
+
+    assert first == "A regular expression describes a set of strings."
+    assert len(consumed) < len(split_tokens(ANSWERS[0], "words"))
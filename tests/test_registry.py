@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from src.registry import PipelineRegistry
+
+
+class CountingBuilder:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, pdf_files, **options):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append((tuple(pdf_files), options))
+            return f"chain {len(self.calls)}"
+
+
+def test_concurrent_sessions_share_one_build():
+    builder = CountingBuilder(delay=0.1)
+    registry = PipelineRegistry(builder=builder)
+    handles = []
+
+    threads = [threading.Thread(target=lambda: handles.append(registry.get(["a.pdf"], llm_backend="fake"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builder.calls) == 1
+    assert {handle.chain for handle in handles} == {"chain 1"}
+
+
+def test_configurations_are_keyed_by_files_and_options():
+    builder = CountingBuilder()
+    registry = PipelineRegistry(builder=builder)
+
+    first = registry.get(["b.pdf", "a.pdf"], llm_backend="fake", top_k=5)
+
+    assert registry.get(["a.pdf", "b.pdf"], top_k=5, llm_backend="fake") is first
+    assert registry.get(["a.pdf", "b.pdf"], llm_backend="fake", top_k=3) is not first
+    assert len(builder.calls) == 2
+
+
+def test_changed_corpus_reloads_in_the_background(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("first version", encoding="utf-8")
+    builder = CountingBuilder(delay=0.2)
+    registry = PipelineRegistry(builder=builder)
+    first = registry.get([str(path)])
+
+    path.write_text("second, longer version", encoding="utf-8")
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+
+    # The old pipeline keeps serving while the new one builds
+    assert registry.get([str(path)]) is first
+    deadline = time.monotonic() + 5
+    while registry.get([str(path)], reload_if_changed=False) is first and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert registry.get([str(path)]).chain == "chain 2"
+    assert len(builder.calls) == 2
+
+
+def test_list_and_dict_options_are_valid_keys():
+    builder = CountingBuilder()
+    registry = PipelineRegistry(builder=builder)
+    options = {"courses": ["nlp"], "search_filter": {"course": "nlp", "page": {"$gte": 2}}}
+
+    first = registry.get(["a.pdf"], **options)
+
+    assert registry.get(["a.pdf"], search_filter={"page": {"$gte": 2}, "course": "nlp"}, courses=["nlp"]) is first
+    assert registry.get(["a.pdf"], courses=["nlp", "automata"], search_filter=options["search_filter"]) is not first
+    assert registry.stats()[0]["options"] == options
+
+
+def test_reload_builds_into_its_own_directory(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("first version", encoding="utf-8")
+    live_dir = tmp_path / "index"
+    live_dir.mkdir()
+    (live_dir / "manifest.json").write_text("live", encoding="utf-8")
+
+    class DirectoryBuilder(CountingBuilder):
+        def __call__(self, pdf_files, **options):
+            persist_dir = options["chroma_persist_dir"]
+            # The rebuild starts from a copy of the live index and writes only to its own directory
+            assert (tmp_path / persist_dir).joinpath("manifest.json").exists()
+            (tmp_path / persist_dir / "manifest.json").write_text(f"built {len(self.calls)}", encoding="utf-8")
+            return super().__call__(pdf_files, **options)
+
+    builder = DirectoryBuilder()
+    registry = PipelineRegistry(builder=builder)
+    registry.get([str(path)], chroma_persist_dir=str(live_dir))
+
+    path.write_text("second, longer version", encoding="utf-8")
+    registry.reload([str(path)], chroma_persist_dir=str(live_dir))
+    handle = registry.get([str(path)], chroma_persist_dir=str(live_dir))
+
+    assert handle.chain == "chain 2"
+    assert handle.persist_dir.startswith(str(live_dir) + ".v")
+    assert builder.calls[1][1]["chroma_persist_dir"] == handle.persist_dir
+    assert (live_dir / "manifest.json").read_text(encoding="utf-8") == "built 0"
+    assert open(os.path.join(handle.persist_dir, "manifest.json"), encoding="utf-8").read() == "built 1"
@@ -0,0 +1,75 @@
+import time
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.rerank import CrossEncoderReranker, RerankingRetriever, length_buckets
+
+
+def overlap_scorer(pairs):
+    """
+    Scores a pair by the number of query words in the chunk.
+    """
+    return [len(set(query.lower().split()) & set(text.lower().split())) for query, text in pairs]
+
+
+def docs(*texts):
+    return [Document(page_content=text) for text in texts]
+
+
+class ListRetriever(BaseRetriever):
+    docs: list
+    filters: list = []
+
+    def _get_relevant_documents(self, query, *, run_manager, search_filter=None):
+        self.filters.append(search_filter)
+        return self.docs
+
+
+def test_length_buckets_group_similar_lengths():
+    texts = ["aaaa", "a", "aaaaaa", "aa", "aaaaa"]
+
+    assert length_buckets(texts, 2) == [[1, 3], [0, 4], [2]]
+
+
+def test_rerank_orders_by_score_and_keeps_dense_order_on_ties():
+    reranker = CrossEncoderReranker(batch_size=2, scorer=overlap_scorer)
+    candidates = docs("automata", "regular expressions", "regular languages", "regular expressions and automata")
+
+    ranked = reranker.rerank("regular expressions automata", candidates, k=3)
+
+    assert [doc.page_content for doc in ranked] == ["regular expressions and automata", "regular expressions", "automata"]
+    assert reranker.stats()["reranked"] == 1
+
+
+def test_rerank_falls_back_to_dense_order_over_budget():
+    def slow_scorer(pairs):
+        time.sleep(0.05)
+        return overlap_scorer(pairs)
+
+    reranker = CrossEncoderReranker(batch_size=1, latency_budget_ms=60, scorer=slow_scorer)
+    candidates = docs("automata", "regular expressions", "regular expressions and automata", "regex")
+
+    ranked = reranker.rerank("regular expressions automata", candidates, k=2)
+
+    assert ranked == candidates[:2]
+    assert reranker.stats()["fallbacks"] == 1
+
+
+def test_reranking_retriever_over_fetches_and_passes_filters():
+    base = ListRetriever(docs=docs("automata", "regular expressions", "regular expressions and automata"), filters=[])
+    retriever = RerankingRetriever(base_retriever=base, reranker=CrossEncoderReranker(scorer=overlap_scorer), k=1)
+
+    assert [doc.page_content for doc in retriever.invoke("regular expressions automata")] == ["regular expressions and automata"]
+    retriever.invoke("automata", search_filter={"course": "theory"})
+    assert base.filters == [None, {"course": "theory"}]
+
+
+def test_rerank_falls_back_when_the_first_batch_alone_overruns():
+    def slow_scorer(pairs):
+        time.sleep(0.05)
+        return overlap_scorer(pairs)
+
+    reranker = CrossEncoderReranker(batch_size=8, latency_budget_ms=20, scorer=slow_scorer)
+    candidates = docs("automata", "regular expressions", "regular expressions and automata")
+
+    assert reranker.rerank("regular expressions automata", candidates, k=2) == candidates[:2]
+    assert (reranker.stats()["fallbacks"], reranker.stats()["reranked"]) == (1, 0)
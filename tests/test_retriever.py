@@ -0,0 +1,79 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.bm25 import BM25Index
+from src.retriever import HybridRetriever, reciprocal_rank_fusion
+
+CHUNKS = {
+    "c1": ("Regular expressions such as a*b describe sets of strings.", {"course": "theory", "page": 1}),
+    "c2": ("A finite automaton accepts a regular language.", {"course": "theory", "page": 2}),
+    "c3": ("Word embeddings map words to dense vectors.", {"course": "nlp", "page": 1}),
+    "c4": ("Regular expressions are used for tokenization in NLP pipelines.", {"course": "nlp", "page": 3}),
+}
+
+
+@pytest.fixture
+def bm25():
+    index = BM25Index()
+    index.add(list(CHUNKS), [text for text, _ in CHUNKS.values()], [meta for _, meta in CHUNKS.values()])
+    return index
+
+
+class StaticRetriever(BaseRetriever):
+    docs: list
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.docs
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "b", "d"]], rrf_k=60)
+
+    # c (ranks 3 and 1) edges out b (ranks 2 and 2); a, ranked first once, beats d
+    assert fused == ["c", "b", "a", "d"]
+    assert reciprocal_rank_fusion([["x", "y"]]) == ["x", "y"]
+    assert reciprocal_rank_fusion([]) == []
+
+
+def test_bm25_ranks_exact_terms(bm25):
+    hits = bm25.search("a*b", k=2)
+
+    assert hits[0][0] == "c1"
+    assert [chunk_id for chunk_id, _ in bm25.search("regular expressions", k=4)][:2] in (["c1", "c4"], ["c4", "c1"])
+    assert bm25.search("unseen query terms") == []
+
+
+def test_bm25_filtered_search_scores_only_matching_chunks(bm25):
+    hits = bm25.search("regular expressions", k=1, search_filter={"course": "nlp"})
+
+    assert [chunk_id for chunk_id, _ in hits] == ["c4"]
+    assert bm25.search("regular", k=5, search_filter={"$and": [{"course": "theory"}, {"page": 2}]})[0][0] == "c2"
+
+
+def test_bm25_remove_and_round_trip(bm25, tmp_path):
+    bm25.remove(["c1"])
+    path = str(tmp_path / "bm25_index.json")
+    bm25.save(path, index_version="v1")
+
+    loaded = BM25Index.load(path)
+
+    assert loaded.index_version == "v1"
+    assert sorted(loaded.docs) == ["c2", "c3", "c4"]
+    assert loaded.search("a*b") == bm25.search("a*b")
+    assert loaded.search("regular expressions") == bm25.search("regular expressions")
+    assert len(BM25Index.load(str(tmp_path / "missing.json"))) == 0
+
+
+def test_hybrid_retriever_fuses_dense_and_keyword_results(bm25):
+    dense = StaticRetriever(docs=[
+        Document(page_content=CHUNKS["c3"][0], metadata=CHUNKS["c3"][1]),
+        Document(page_content=CHUNKS["c4"][0], metadata=CHUNKS["c4"][1]),
+    ])
+    retriever = HybridRetriever(dense_retriever=dense, keyword_index=bm25, k=2, fetch_k=4)
+
+    docs = retriever.invoke("regular expressions for tokenization")
+
+    # c4 is ranked by both legs; c3 (dense only, rank 1) and c1 (keyword only) follow
+    assert docs[0].page_content == CHUNKS["c4"][0]
+    assert len(docs) == 2
+    assert set(retriever.latency.summary()) >= {"dense", "sparse", "fusion"}
@@ -0,0 +1,72 @@
+import json
+import logging
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.retrievers import BaseRetriever
+from src.chain import get_semantic_rag_chain
+from src.context import ContextPacker
+from src.logger import ContextFilter, JsonFormatter, log_context
+from src.tracing import SPAN_METRICS, TracedChain, current_trace, span, start_trace
+
+
+class ListRetriever(BaseRetriever):
+    def _get_relevant_documents(self, query, *, run_manager):
+        return [Document(page_content="Regular expressions describe sets of strings.")]
+
+
+@span("polish")
+def polish(text):
+    return text.strip()
+
+
+def test_spans_are_recorded_in_the_active_trace():
+    with start_trace("What is a regex?", query_id="q1") as trace:
+        assert current_trace() is trace
+        with span("retrieve", k=5):
+            pass
+        polish(" answer ")
+        with pytest.raises(KeyError):
+            with span("generate"):
+                raise KeyError("boom")
+
+    assert current_trace() is None
+    spans = trace.as_dict()["spans"]
+    assert [s["name"] for s in spans] == ["retrieve", "polish", "generate"]
+    assert spans[0]["k"] == 5
+    assert spans[2]["error"] == "KeyError"
+    assert set(trace.totals()) == {"retrieve", "polish", "generate"}
+    assert SPAN_METRICS.summary()["polish"]["count"] >= 1
+
+
+def test_traced_chain_breaks_down_every_step(tmp_path):
+    chain = TracedChain(get_semantic_rag_chain(ListRetriever(), FakeListChatModel(responses=["A pattern."]), context_packer=ContextPacker()))
+
+    with start_trace("What is a regex?", query_id="q2", profile_dir=str(tmp_path)) as trace:
+        assert chain.invoke("What is a regex?") == "A pattern."
+        assert "".join(chain.stream("What is a regex?")) == "A pattern."
+
+    names = [s["name"] for s in trace.spans]
+    assert names.count("retrieve") == 2
+    assert names.count("llm") == 2
+    assert {"prompt", "prompt.pack", "llm.first_token"} <= set(names)
+    with open(tmp_path / "q2.json", "r", encoding="utf-8") as f:
+        profile = json.load(f)
+    assert profile["query_id"] == "q2"
+    assert profile["totals"].keys() == trace.totals().keys()
+
+
+def test_json_log_lines_carry_the_query_id():
+    token = log_context.set({"query_id": "q3"})
+    try:
+        record = logging.LogRecord("educational_rag", logging.INFO, __file__, 1, "answered", None, None)
+        ContextFilter().filter(record)
+        record.trace = {"total_ms": 12.5}
+    finally:
+        log_context.reset(token)
+
+    line = json.loads(JsonFormatter().format(record))
+
+    assert line["msg"] == "answered"
+    assert line["query_id"] == "q3"
+    assert line["trace"] == {"total_ms": 12.5}